@@ -1,4 +1,8 @@
-from project import app
+from project import create_app, typeahead
+
+app = create_app()
+# Build the loan form autocomplete before the first request
+typeahead.warm_up(app)
 
 
 if __name__ == '__main__':
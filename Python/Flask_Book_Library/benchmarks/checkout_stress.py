@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""
+Concurrent checkout stress test.
+
+Many threads race to loan a small pool of books through the test client.
+Every book must end up loaned at most once: the winning request gets a
+redirect, every other request for the same book must get a 409.
+
+Run with: python -m benchmarks.checkout_stress --threads 32 --attempts 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=50, help='number of books competed for')
+    parser.add_argument('--threads', type=int, default=16, help='number of concurrent client threads')
+    parser.add_argument('--attempts', type=int, default=2000, help='total checkout requests')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for book selection')
+    parser.add_argument('--write-queue', action='store_true', help='commit through the single-writer queue')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Work on a throwaway database file so the real one is never touched
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    os.environ['WRITE_QUEUE_ENABLED'] = '1' if args.write_queue else '0'
+
+    from project import create_app, db
+    from project.books.models import Book
+    from project.customers.models import Customer
+    from project.loans.models import Loan
+
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    try:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add(Customer(name='Stress Tester', city='City', age=30))
+            db.session.add_all([Book(name=f'Book {i}', author='Author', year_published=2000,
+                                     book_type='5days') for i in range(args.books)])
+            db.session.commit()
+
+        rng = random.Random(args.seed)
+        plan = [f'Book {rng.randrange(args.books)}' for _ in range(args.attempts)]
+        statuses = Counter()
+        lock = threading.Lock()
+        cursor = iter(plan)
+
+        def worker():
+            client = app.test_client()
+            local = Counter()
+            while True:
+                with lock:
+                    book_name = next(cursor, None)
+                if book_name is None:
+                    break
+                response = client.post('/loans/create', data={
+                    'customer_name': 'Stress Tester',
+                    'book_name': book_name,
+                    'loan_date': '2024-01-01',
+                    'return_date': '2024-01-10'
+                })
+                local[response.status_code] += 1
+            with lock:
+                statuses.update(local)
+
+        threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with app.app_context():
+            loans_per_book = Counter(book_id for (book_id,) in db.session.query(Loan.book_id))
+            on_loan = Book.query.filter_by(status='on_loan').count()
+    finally:
+        os.remove(path)
+
+    wins = statuses[302]
+    double_loans = sum(1 for count in loans_per_book.values() if count > 1)
+    requested = len(set(plan))
+    correct = double_loans == 0 and wins == len(loans_per_book) == on_loan == requested
+
+    print(f'attempts:      {args.attempts} ({args.threads} threads, {args.books} books)')
+    print(f'loans created: {wins}')
+    print(f'conflicts:     {statuses[409]}')
+    print(f'other:         {sum(n for code, n in statuses.items() if code not in (302, 409))} {dict(statuses)}')
+    print(f'double loans:  {double_loans}')
+    print(f'elapsed:       {elapsed:.2f}s')
+    print(f'throughput:    {args.attempts / elapsed:.1f} req/s')
+    print('result:        ' + ('OK' if correct else 'FAILED'))
+    return 0 if correct else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
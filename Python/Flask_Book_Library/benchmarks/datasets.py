@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""
+Deterministic synthetic datasets for the benchmarks.
+
+A dataset size sets the number of books and customers; half of the books
+are on loan, so there are half as many loans. The same size and seed always
+produce the same rows, ids included, and the rows pass the create forms'
+validation. Rows are written with multi-row INSERTs in batches.
+
+Build a database file once and reuse it (the benchmark suite copies it
+before every run):
+
+Run with: python -m benchmarks.datasets --size 1m --output bench-1m.sqlite
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+
+SIZES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+DEFAULT_SEED = 1234
+BATCH_SIZE = 10_000
+
+FIRST_NAMES = ['Anna', 'Jan', 'Maria', 'Piotr', 'Ewa', 'Tomasz', 'Olga', 'Marek', 'Zofia', 'Adam', 'Ida', 'Leon']
+LAST_NAMES = ['Nowak', 'Kowalski', 'Lewandowska', 'Wojcik', 'Kaminski', 'Zielinska', 'Mazur', 'Krawczyk']
+CITIES = ['Warsaw', 'Krakow', 'Gdansk', 'Poznan', 'Wroclaw', 'Lodz', 'Lublin', 'Szczecin']
+TITLE_WORDS = ['Silent', 'River', 'Glass', 'Winter', 'Garden', 'Empire', 'Shadow', 'Letters', 'North', 'Iron']
+BOOK_TYPES = ['2days', '5days', '10days']
+LOAN_START = datetime(2024, 1, 1)
+
+
+def row_counts(size):
+    """Rows per table for a size name or a plain number of books."""
+    books = SIZES[size] if size in SIZES else int(size)
+    return {'books': books, 'customers': books, 'loans': books // 2}
+
+
+def letters(number):
+    """Spell a number in letters (0 -> 'a', 26 -> 'ba') for names that only allow letters."""
+    text = ''
+    while True:
+        number, digit = divmod(number, 26)
+        text = chr(ord('a') + digit) + text
+        if not number:
+            return text
+
+
+def book_name(number):
+    return f'Book {number}'
+
+
+def customer_name(number):
+    return f'Customer {letters(number).capitalize()}'
+
+
+def generate_books(count, seed=DEFAULT_SEED, on_loan=0):
+    """Yield book rows; the first ``on_loan`` books are lent out."""
+    rng = random.Random(f'books-{seed}')
+    for number in range(count):
+        yield {
+            'id': number + 1,
+            'name': book_name(number),
+            'author': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'year_published': rng.randint(1900, 2024),
+            'book_type': rng.choice(BOOK_TYPES),
+            'status': 'on_loan' if number < on_loan else 'available',
+        }
+
+
+def generate_customers(count, seed=DEFAULT_SEED):
+    rng = random.Random(f'customers-{seed}')
+    for number in range(count):
+        yield {
+            'id': number + 1,
+            'name': customer_name(number),
+            'city': rng.choice(CITIES),
+            'age': rng.randint(16, 90),
+        }
+
+
+def generate_loans(count, customers, seed=DEFAULT_SEED):
+    """Yield one loan for each of the first ``count`` books, by random customers."""
+    rng = random.Random(f'loans-{seed}')
+    for number in range(count):
+        customer = rng.randrange(customers)
+        loan_date = LOAN_START + timedelta(days=rng.randrange(365))
+        yield {
+            'id': number + 1,
+            'customer_id': customer + 1,
+            'book_id': number + 1,
+            'customer_name': customer_name(customer),
+            'book_name': book_name(number),
+            'loan_date': loan_date,
+            'return_date': loan_date + timedelta(days=rng.choice([2, 5, 10])),
+        }
+
+
+def batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load(size, seed=DEFAULT_SEED, batch_size=BATCH_SIZE):
+    """Create the schema and fill it with the dataset. Needs an app context."""
+    from sqlalchemy import insert
+    from project import db
+    from project.books.models import Book
+    from project.customers.models import Customer
+    from project.loans.models import Loan
+
+    counts = row_counts(size)
+    db.drop_all()
+    db.create_all()
+    tables = [
+        (Book, generate_books(counts['books'], seed, on_loan=counts['loans'])),
+        (Customer, generate_customers(counts['customers'], seed)),
+        (Loan, generate_loans(counts['loans'], counts['customers'], seed)),
+    ]
+    with db.engine.begin() as connection:
+        for model, rows in tables:
+            for batch in batches(rows, batch_size):
+                connection.execute(insert(model.__table__), batch)
+    return counts
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', default='10k', help=f"dataset size: {', '.join(SIZES)} or a number of books")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='random seed')
+    parser.add_argument('--output', required=True, help='SQLite file to write (replaced if it exists)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    path = os.path.abspath(args.output)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    from project import create_app
+
+    app = create_app()
+    started = time.perf_counter()
+    with app.app_context():
+        counts = load(args.size, args.seed)
+    elapsed = time.perf_counter() - started
+
+    rows = sum(counts.values())
+    print(f"dataset:    {args.size} (seed {args.seed}) -> {path}")
+    print(f"rows:       {counts['books']} books, {counts['customers']} customers, {counts['loans']} loans")
+    print(f'elapsed:    {elapsed:.2f}s ({rows / elapsed:.0f} rows/s)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
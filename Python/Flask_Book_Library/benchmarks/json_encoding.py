@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+JSON response encoding: Flask's default provider against project.jsonprovider.
+
+Builds one /loans/json-shaped payload of --rows loans (two datetimes per
+row) and times the provider's response() — encoding plus building the
+response body — for Flask's DefaultJSONProvider, StdlibJSONProvider and,
+when orjson is installed, OrjsonProvider. The median and best time, body
+size and speed-up over Flask's provider are reported.
+
+Run with: python -m benchmarks.json_encoding --rows 100000 --runs 10
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from project import jsonprovider
+
+
+def make_payload(rows):
+    start = datetime(2024, 1, 1, 9, 30)
+    loans = [{
+        'id': number + 1,
+        'customer_name': f'Customer {number % 5000}',
+        'book_name': f'Book {number}',
+        'loan_date': start + timedelta(minutes=number),
+        'return_date': start + timedelta(days=14, minutes=number),
+        'original_author': f'Author {number % 800}',
+        'original_year_published': 1900 + number % 120,
+        'original_book_type': ('2days', '5days', '10days')[number % 3],
+    } for number in range(rows)]
+    return {'loans': loans, 'next_cursor': 'eyJpZCI6IDEwMDAwMH0', 'prev_cursor': None}
+
+
+def time_provider(provider, payload, runs):
+    samples = []
+    size = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        body = provider.response(payload).get_data()
+        samples.append(time.perf_counter() - started)
+        size = len(body)
+    return samples, size
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='loans in the payload')
+    parser.add_argument('--runs', type=int, default=10, help='timed encodings per provider')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    app = Flask(__name__)
+    providers = {'flask': DefaultJSONProvider(app), 'stdlib': jsonprovider.StdlibJSONProvider(app)}
+    if jsonprovider.orjson is not None:
+        providers['orjson'] = jsonprovider.OrjsonProvider(app)
+    else:
+        print('orjson is not installed; skipping OrjsonProvider')
+
+    payload = make_payload(args.rows)
+    print(f'{args.rows} rows, {args.runs} runs')
+    print(f"{'provider':<8} {'median ms':>10} {'best ms':>9} {'MB':>7} {'speed-up':>9}")
+    reference = None
+    for name, provider in providers.items():
+        # One unmeasured run warms up allocations
+        provider.response(payload)
+        samples, size = time_provider(provider, payload, args.runs)
+        median = statistics.median(samples)
+        reference = reference or median
+        print(f'{name:<8} {median * 1000:>10.1f} {min(samples) * 1000:>9.1f} {size / 1e6:>7.2f} {reference / median:>8.1f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Read throughput under a concurrent writer.
+
+Reader threads page through /books/json while one writer thread keeps
+editing books. The run is repeated for every reader count, so the output
+shows whether reads scale with workers or queue up behind the writer, and
+how many requests failed with "database is locked".
+
+Run with: python -m benchmarks.read_scaling --profile production --readers 1 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profile', default='production', help='FLASK_CONFIG profile to run under')
+    parser.add_argument('--books', type=int, default=2000, help='number of books in the table')
+    parser.add_argument('--readers', type=int, nargs='+', default=[1, 2, 4, 8], help='reader thread counts to try')
+    parser.add_argument('--duration', type=float, default=3.0, help='seconds per reader count')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Work on a throwaway database file so the real one is never touched
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    os.environ['FLASK_CONFIG'] = args.profile
+
+    from project import create_app, db
+    from project.books.models import Book
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    results = []
+    try:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add_all([Book(name=f'Book {i}', author='Author', year_published=2000,
+                                     book_type='5days') for i in range(args.books)])
+            db.session.commit()
+
+        for readers in args.readers:
+            stop = threading.Event()
+            counts = {'reads': 0, 'read_errors': 0, 'writes': 0, 'write_errors': 0}
+            lock = threading.Lock()
+
+            def reader():
+                client = app.test_client()
+                reads = errors = 0
+                while not stop.is_set():
+                    response = client.get('/books/json?limit=100')
+                    if response.status_code == 200:
+                        reads += 1
+                    else:
+                        errors += 1
+                with lock:
+                    counts['reads'] += reads
+                    counts['read_errors'] += errors
+
+            def writer():
+                client = app.test_client()
+                writes = errors = 0
+                while not stop.is_set():
+                    response = client.post(f'/books/{writes % args.books + 1}/edit', json={'author': f'Author {writes}'})
+                    if response.status_code == 200:
+                        writes += 1
+                    else:
+                        errors += 1
+                with lock:
+                    counts['writes'] += writes
+                    counts['write_errors'] += errors
+
+            threads = [threading.Thread(target=reader) for _ in range(readers)]
+            threads.append(threading.Thread(target=writer))
+            for thread in threads:
+                thread.start()
+            time.sleep(args.duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            results.append((readers, counts))
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    print(f'profile: {args.profile} ({args.books} books, {args.duration:.0f}s per run)')
+    print(f"{'readers':>8} {'reads/s':>10} {'writes/s':>10} {'errors':>8}")
+    for readers, counts in results:
+        errors = counts['read_errors'] + counts['write_errors']
+        print(f"{readers:>8} {counts['reads'] / args.duration:>10.1f} "
+              f"{counts['writes'] / args.duration:>10.1f} {errors:>8}")
+    failed = any(counts['read_errors'] or counts['write_errors'] for _, counts in results)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
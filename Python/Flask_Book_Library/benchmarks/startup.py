@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Cold start cost: import, app creation and the first request.
+
+Every run starts a fresh interpreter that imports the project, builds the
+app with create_app() and serves one /books/json request against a
+throwaway database. The median and best time of each phase are reported,
+together with the wall time of the whole process.
+
+Run with: python -m benchmarks.startup --runs 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+SETUP = """
+from project import create_app, db
+app = create_app()
+with app.app_context():
+    db.create_all()
+"""
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+from project import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get('/books/json')
+served = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_request': served - created,
+    'status': response.status_code,
+}))
+"""
+
+PHASES = ('import', 'create_app', 'first_request', 'process')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='number of cold starts')
+    parser.add_argument('--profile', default='production', help='FLASK_CONFIG profile to run under')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # Work on a throwaway database file so the real one is never touched
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + path, FLASK_CONFIG=args.profile)
+
+    samples = {phase: [] for phase in PHASES}
+    try:
+        subprocess.run([sys.executable, '-c', SETUP], cwd=root, env=env, check=True)
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, '-c', CHILD], cwd=root, env=env, check=True,
+                                    capture_output=True, text=True).stdout
+            elapsed = time.perf_counter() - started
+            timings = json.loads(output.strip().splitlines()[-1])
+            if timings.pop('status') != 200:
+                print('first request failed')
+                return 1
+            timings['process'] = elapsed
+            for phase in PHASES:
+                samples[phase].append(timings[phase])
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    print(f'cold starts: {args.runs} (profile {args.profile})')
+    print(f"{'phase':<14} {'median ms':>10} {'best ms':>10}")
+    for phase in PHASES:
+        print(f'{phase:<14} {statistics.median(samples[phase]) * 1000:>10.1f} {min(samples[phase]) * 1000:>10.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
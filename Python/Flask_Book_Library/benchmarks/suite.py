@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+"""
+Endpoint benchmark suite.
+
+Loads a synthetic dataset (see benchmarks/datasets.py) into a throwaway
+database and runs one scenario per endpoint: the JSON lists, detail
+lookups, creates, and loan checkout and return. Each scenario sends
+--requests requests from --threads client threads after a short warm-up
+and reports throughput and p50/p95/p99 latency. Results are written as
+JSON with --output.
+
+With --baseline the results are compared with an earlier results file:
+a scenario regresses when its throughput drops or its p95 latency grows by
+more than --tolerance (default 10%). The exit status is 1 on regressions
+or failed requests.
+
+Run with: python -m benchmarks.suite --dataset 100k --output results.json --baseline baseline.json
+Compare two stored results without running: python -m benchmarks.suite --compare results.json --baseline baseline.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from benchmarks import datasets
+
+
+def _scenarios(counts, seed):
+    """Return ``{name: make_request(rng, number)}``; ``number`` counts the scenario's requests from 0."""
+    books, customers, loans = counts['books'], counts['customers'], counts['loans']
+
+    return {
+        'books.list': lambda rng, n: ('GET', '/books/json?limit=50', {}),
+        'books.detail': lambda rng, n: ('GET', f'/loans/books/details/{datasets.book_name(rng.randrange(books))}', {}),
+        'books.edit_data': lambda rng, n: ('GET', f'/books/{rng.randrange(books) + 1}/edit-data', {}),
+        'books.create': lambda rng, n: ('POST', '/books/create', {'json': {
+            'name': f'Bench book {seed}-{n}', 'author': 'Bench Author', 'year_published': 2000, 'book_type': '5days',
+        }}),
+        'customers.list': lambda rng, n: ('GET', '/customers/json?limit=50', {}),
+        'customers.detail': lambda rng, n: ('GET', f'/loans/customers/details/{datasets.customer_name(rng.randrange(customers))}', {}),
+        'customers.create': lambda rng, n: ('POST', '/customers/create', {'data': {
+            'name': f'Bench {datasets.letters(n)}', 'city': 'Warsaw', 'age': 30,
+        }}),
+        'loans.list': lambda rng, n: ('GET', '/loans/json?limit=50', {}),
+        'loans.detail': lambda rng, n: ('GET', f'/loans/{rng.randrange(loans) + 1}/details', {}),
+        # Books after the lent-out ones are available, one per checkout
+        'loans.checkout': lambda rng, n: ('POST', '/loans/create', {'data': {
+            'customer_name': datasets.customer_name(rng.randrange(customers)), 'book_name': datasets.book_name(loans + n),
+            'loan_date': '2024-06-01', 'return_date': '2024-06-06',
+        }}),
+        # Every preloaded loan is returned at most once
+        'loans.return': lambda rng, n: ('POST', f'/loans/{n + 1}/delete', {}),
+    }
+
+
+# Requests each mutating scenario can make before it runs out of rows
+def _capacity(name, counts):
+    return {
+        'loans.checkout': counts['books'] - counts['loans'],
+        'loans.return': counts['loans'],
+    }.get(name)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput': round(count / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def run_scenario(app, make_request, requests, threads, seed):
+    """Send ``requests`` requests from ``threads`` clients; return the summary."""
+    lock = threading.Lock()
+    cursor = iter(range(requests))
+    latencies = []
+    errors = [0]
+
+    def worker(index):
+        client = app.test_client()
+        rng = random.Random(f'{seed}-{index}')
+        local, failed = [], 0
+        while True:
+            with lock:
+                number = next(cursor, None)
+            if number is None:
+                break
+            method, url, kwargs = make_request(rng, number)
+            started = time.perf_counter()
+            response = client.open(url, method=method, **kwargs)
+            local.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+def compare(results, baseline, tolerance):
+    """Return ``(rows, regressions)`` comparing every scenario present in both runs."""
+    rows, regressions = [], []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            rows.append((name, current, None, None, 'new'))
+            continue
+        throughput = _change(current['throughput'], previous['throughput'])
+        p95 = _change(current['p95_ms'], previous['p95_ms'])
+        regressed = (throughput is not None and throughput < -tolerance) or (p95 is not None and p95 > tolerance)
+        if regressed:
+            regressions.append(name)
+        rows.append((name, current, throughput, p95, 'REGRESSION' if regressed else 'ok'))
+    return rows, regressions
+
+
+def _change(current, previous):
+    return (current - previous) / previous if previous else None
+
+
+def _percent(change):
+    return '-' if change is None else f'{change * 100:+.1f}%'
+
+
+def print_results(results):
+    meta = results['meta']
+    print(f"dataset: {meta['dataset']} ({meta['rows']['books']} books, {meta['rows']['customers']} customers, "
+          f"{meta['rows']['loans']} loans), profile {meta['profile']}, {meta['threads']} threads")
+    print(f"{'scenario':<18} {'requests':>8} {'errors':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, summary in results['scenarios'].items():
+        print(f"{name:<18} {summary['requests']:>8} {summary['errors']:>6} {summary['throughput']:>9.1f} "
+              f"{summary['p50_ms']:>8.2f} {summary['p95_ms']:>8.2f} {summary['p99_ms']:>8.2f}")
+
+
+def print_comparison(rows, tolerance):
+    print(f'\ncompared with baseline (tolerance {tolerance * 100:.0f}%):')
+    print(f"{'scenario':<18} {'req/s':>9} {'change':>8} {'p95 ms':>8} {'change':>8}  result")
+    for name, current, throughput, p95, verdict in rows:
+        print(f"{name:<18} {current['throughput']:>9.1f} {_percent(throughput):>8} "
+              f"{current['p95_ms']:>8.2f} {_percent(p95):>8}  {verdict}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', default='10k', help=f"dataset size: {', '.join(datasets.SIZES)} or a number of books")
+    parser.add_argument('--dataset-file', help='prebuilt dataset from benchmarks.datasets (copied, never modified)')
+    parser.add_argument('--seed', type=int, default=datasets.DEFAULT_SEED, help='random seed for data and requests')
+    parser.add_argument('--profile', default='production', help='FLASK_CONFIG profile to run under')
+    parser.add_argument('--scenarios', nargs='+', help='scenarios to run (default: all)')
+    parser.add_argument('--requests', type=int, default=1000, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=50, help='unmeasured requests per scenario')
+    parser.add_argument('--threads', type=int, default=4, help='concurrent client threads')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--compare', help='compare this results file with --baseline instead of running')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed slowdown before flagging a regression')
+    return parser.parse_args()
+
+
+def run(args):
+    # Work on a throwaway database file so the real one is never touched
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    os.environ['FLASK_CONFIG'] = args.profile
+    # One JSON log line per request would be measured along with the request
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    from project import create_app
+
+    try:
+        if args.dataset_file:
+            shutil.copyfile(args.dataset_file, path)
+        app = create_app()
+        app.config['WTF_CSRF_ENABLED'] = False
+
+        with app.app_context():
+            if args.dataset_file:
+                from project.books.models import Book
+                from project.customers.models import Customer
+                from project.loans.models import Loan
+                counts = {'books': Book.query.count(), 'customers': Customer.query.count(),
+                          'loans': Loan.query.count()}
+            else:
+                counts = datasets.load(args.dataset, args.seed)
+
+        scenarios = _scenarios(counts, args.seed)
+        names = args.scenarios or list(scenarios)
+        unknown = set(names) - set(scenarios)
+        if unknown:
+            raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}; expected some of: {', '.join(scenarios)}")
+
+        results = {
+            'meta': {
+                'dataset': os.path.basename(args.dataset_file) if args.dataset_file else args.dataset,
+                'rows': counts,
+                'seed': args.seed,
+                'profile': args.profile,
+                'threads': args.threads,
+                'requests': args.requests,
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'started': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            },
+            'scenarios': {},
+        }
+        for name in names:
+            make_request = scenarios[name]
+            warmup, requests = args.warmup, args.requests
+            capacity = _capacity(name, counts)
+            if capacity is not None:
+                # Warm-up and measured requests both use up rows
+                warmup = min(warmup, capacity)
+                requests = min(requests, capacity - warmup)
+            run_scenario(app, make_request, warmup, args.threads, args.seed)
+            # Measured requests continue the numbering after the warm-up
+            measured = lambda rng, n: make_request(rng, n + warmup)
+            results['scenarios'][name] = run_scenario(app, measured, requests, args.threads, args.seed)
+
+        write_queue = app.extensions.get('write_queue')
+        if write_queue is not None:
+            write_queue.stop()
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    return results
+
+
+def main():
+    args = parse_args()
+    if args.compare:
+        if not args.baseline:
+            raise SystemExit('--compare needs --baseline')
+        with open(args.compare) as f:
+            results = json.load(f)
+    else:
+        results = run(args)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+
+    print_results(results)
+    failed = any(summary['errors'] for summary in results['scenarios'].values())
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ('dataset', 'profile', 'threads'):
+            if baseline.get('meta', {}).get(key) != results['meta'][key]:
+                print(f"\nwarning: baseline {key} is {baseline.get('meta', {}).get(key)!r}, this run used {results['meta'][key]!r}")
+        rows, regressions = compare(results, baseline, args.tolerance)
+        print_comparison(rows, args.tolerance)
+
+    if regressions:
+        print(f"\nregressions: {', '.join(regressions)}")
+    return 1 if failed or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+Sustained write throughput.
+
+Many threads create books as fast as they can through the test client.
+Run it with and without --write-queue to compare one commit per request
+with group commits from the single writer thread.
+
+Run with: python -m benchmarks.write_burst --threads 32 --writes 5000 --write-queue
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16, help='number of concurrent client threads')
+    parser.add_argument('--writes', type=int, default=2000, help='total create requests')
+    parser.add_argument('--profile', default='production', help='FLASK_CONFIG profile to run under')
+    parser.add_argument('--write-queue', action='store_true', help='commit through the single-writer queue')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Work on a throwaway database file so the real one is never touched
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    os.environ['FLASK_CONFIG'] = args.profile
+    os.environ['WRITE_QUEUE_ENABLED'] = '1' if args.write_queue else '0'
+
+    from project import create_app, db
+    from project.books.models import Book
+
+    app = create_app()
+
+    statuses = Counter()
+    try:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+
+        lock = threading.Lock()
+        cursor = iter(range(args.writes))
+
+        def worker():
+            client = app.test_client()
+            local = Counter()
+            while True:
+                with lock:
+                    number = next(cursor, None)
+                if number is None:
+                    break
+                response = client.post('/books/create', json={
+                    'name': f'Book {number}', 'author': 'Author', 'year_published': 2000, 'book_type': '5days'
+                })
+                local[response.status_code] += 1
+            with lock:
+                statuses.update(local)
+
+        threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with app.app_context():
+            created = Book.query.count()
+        write_queue = app.extensions.get('write_queue')
+        if write_queue is not None:
+            write_queue.stop()
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    correct = created == statuses[201] == args.writes
+    print(f"writes:        {args.writes} ({args.threads} threads, {'write queue' if args.write_queue else 'inline commits'})")
+    print(f'created:       {created}')
+    print(f'failed:        {args.writes - statuses[201]} {dict(statuses)}')
+    if write_queue is not None:
+        print(f'group commits: {write_queue.batches} ({write_queue.jobs / max(write_queue.batches, 1):.1f} writes each)')
+    print(f'elapsed:       {elapsed:.2f}s')
+    print(f'throughput:    {args.writes / elapsed:.1f} req/s')
+    print('result:        ' + ('OK' if correct else 'FAILED'))
+    return 0 if correct else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
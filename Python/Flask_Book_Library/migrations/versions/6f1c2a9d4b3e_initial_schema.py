@@ -0,0 +1,71 @@
+"""initial schema
+
+Revision ID: 6f1c2a9d4b3e
+Revises: 
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1c2a9d4b3e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('books',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=64), nullable=True),
+    sa.Column('author', sa.String(length=64), nullable=True),
+    sa.Column('year_published', sa.Integer(), nullable=True),
+    sa.Column('book_type', sa.String(length=20), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_books_name'), ['name'], unique=True)
+
+    op.create_table('customers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=64), nullable=True),
+    sa.Column('city', sa.String(length=64), nullable=True),
+    sa.Column('age', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_customers_name'), ['name'], unique=True)
+
+    op.create_table('Loans',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('customer_name', sa.String(length=64), nullable=False),
+    sa.Column('book_name', sa.String(length=64), nullable=False),
+    sa.Column('loan_date', sa.DateTime(), nullable=False),
+    sa.Column('return_date', sa.DateTime(), nullable=False),
+    sa.Column('original_author', sa.String(length=64), nullable=False),
+    sa.Column('original_year_published', sa.Integer(), nullable=False),
+    sa.Column('original_book_type', sa.String(length=64), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('Loans', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_Loans_loan_date'), ['loan_date'], unique=False)
+        batch_op.create_index(batch_op.f('ix_Loans_return_date'), ['return_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('Loans', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_Loans_return_date'))
+        batch_op.drop_index(batch_op.f('ix_Loans_loan_date'))
+
+    op.drop_table('Loans')
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_customers_name'))
+
+    op.drop_table('customers')
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_books_name'))
+
+    op.drop_table('books')
@@ -0,0 +1,55 @@
+"""link loans to customers and books by foreign key
+
+Revision ID: 8a7d3e52c910
+Revises: 6f1c2a9d4b3e
+Create Date: 2026-10-17 10:03:17.904561
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a7d3e52c910'
+down_revision = '6f1c2a9d4b3e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Loans', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('customer_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('book_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_Loans_customer_id'), ['customer_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_Loans_book_id'), ['book_id'], unique=False)
+        batch_op.create_foreign_key('fk_Loans_customer_id_customers', 'customers', ['customer_id'], ['id'], ondelete='SET NULL')
+        batch_op.create_foreign_key('fk_Loans_book_id_books', 'books', ['book_id'], ['id'])
+
+    # Loaned books used to be deleted from "books"; bring them back as on_loan rows
+    op.execute("""
+        INSERT INTO books (name, author, year_published, book_type, status)
+        SELECT book_name, MIN(original_author), MIN(original_year_published), MIN(original_book_type), 'on_loan'
+        FROM "Loans"
+        WHERE book_name NOT IN (SELECT name FROM books WHERE name IS NOT NULL)
+        GROUP BY book_name
+    """)
+    op.execute("""
+        UPDATE "Loans" SET
+            book_id = (SELECT books.id FROM books WHERE books.name = "Loans".book_name),
+            customer_id = (SELECT customers.id FROM customers WHERE customers.name = "Loans".customer_name)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('Loans', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_Loans_book_id'))
+        batch_op.drop_index(batch_op.f('ix_Loans_customer_id'))
+        batch_op.drop_column('book_id')
+        batch_op.drop_column('customer_id')
+
+    # Loaned books are removed from "books" again, as the old schema expects.
+    # The foreign keys are gone by now, so SQLite no longer refuses the delete.
+    op.execute("""
+        DELETE FROM books WHERE status = 'on_loan'
+        AND name IN (SELECT book_name FROM "Loans")
+    """)
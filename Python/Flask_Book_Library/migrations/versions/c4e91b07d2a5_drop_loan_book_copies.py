@@ -0,0 +1,40 @@
+"""drop the copied book columns from loans
+
+Revision ID: c4e91b07d2a5
+Revises: 8a7d3e52c910
+Create Date: 2026-10-17 11:26:52.471093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e91b07d2a5'
+down_revision = '8a7d3e52c910'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Loans', schema=None) as batch_op:
+        batch_op.alter_column('book_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('original_book_type')
+        batch_op.drop_column('original_year_published')
+        batch_op.drop_column('original_author')
+
+
+def downgrade():
+    with op.batch_alter_table('Loans', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('original_author', sa.String(length=64), nullable=False, server_default=''))
+        batch_op.add_column(sa.Column('original_year_published', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('original_book_type', sa.String(length=64), nullable=False, server_default=''))
+        batch_op.alter_column('book_id', existing_type=sa.Integer(), nullable=True)
+
+    # Copy the details back from the linked book rows
+    op.execute("""
+        UPDATE "Loans" SET
+            original_author = COALESCE((SELECT author FROM books WHERE books.id = "Loans".book_id), ''),
+            original_year_published = COALESCE((SELECT year_published FROM books WHERE books.id = "Loans".book_id), 0),
+            original_book_type = COALESCE((SELECT book_type FROM books WHERE books.id = "Loans".book_id), '')
+    """)
@@ -0,0 +1,46 @@
+"""full-text search index over book name and author
+
+Revision ID: e2b6f0a4c8d1
+Revises: c4e91b07d2a5
+Create Date: 2026-10-17 13:40:08.122734
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b6f0a4c8d1'
+down_revision = 'c4e91b07d2a5'
+branch_labels = None
+depends_on = None
+
+
+FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        name, author, content='books', content_rowid='id', tokenize='unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, name, author) VALUES (new.id, new.name, new.author);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, name, author) VALUES ('delete', old.id, old.name, old.author);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF name, author ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, name, author) VALUES ('delete', old.id, old.name, old.author);
+        INSERT INTO books_fts(rowid, name, author) VALUES (new.id, new.name, new.author);
+    END""",
+]
+
+
+def upgrade():
+    for statement in FTS_DDL:
+        op.execute(statement)
+    # Index the rows that already exist
+    op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS books_fts_au')
+    op.execute('DROP TRIGGER IF EXISTS books_fts_ad')
+    op.execute('DROP TRIGGER IF EXISTS books_fts_ai')
+    op.execute('DROP TABLE IF EXISTS books_fts')
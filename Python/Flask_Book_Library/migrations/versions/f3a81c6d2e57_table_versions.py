@@ -0,0 +1,45 @@
+"""per-table change versions kept by triggers
+
+Revision ID: f3a81c6d2e57
+Revises: e2b6f0a4c8d1
+Create Date: 2026-10-17 16:12:40.518273
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a81c6d2e57'
+down_revision = 'e2b6f0a4c8d1'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ['books', 'customers', 'Loans']
+NOW = "(julianday('now') - 2440587.5) * 86400.0"
+OPERATIONS = [('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE')]
+
+
+def upgrade():
+    op.create_table(
+        'table_versions',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('modified', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    for table in TABLES:
+        op.execute(f"INSERT INTO table_versions (name, version, modified) "
+                   f"VALUES ('{table}', random() & 1073741823, {NOW})")
+        for suffix, operation in OPERATIONS:
+            op.execute(f"""CREATE TRIGGER IF NOT EXISTS "{table}_version_{suffix}" AFTER {operation} ON "{table}" BEGIN
+                UPDATE table_versions SET version = version + 1, modified = {NOW} WHERE name = '{table}';
+            END""")
+
+
+def downgrade():
+    for table in TABLES:
+        for suffix, _ in OPERATIONS:
+            op.execute(f'DROP TRIGGER IF EXISTS "{table}_version_{suffix}"')
+    op.drop_table('table_versions')
@@ -1,25 +1,86 @@
 import os
+import click
 from flask import Flask
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from markupsafe import escape
+from flask_migrate import Migrate, stamp
+
+from project.config import load_config, apply_sqlite_pragmas
 
 # Database Setup
-app = Flask(__name__)
+db = SQLAlchemy()
+migrate = Migrate()
+
+migrations_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def create_app(config=None, **overrides):
+    """
+    Build the application for a configuration profile (default: FLASK_CONFIG).
+
+    Nothing touches the database here: the schema comes from ``flask db
+    upgrade`` or ``flask init-db``.
+    """
+    app = Flask(__name__)
+    load_config(app, config, **overrides)
+
+    db.init_app(app)
+    migrate.init_app(app, db, directory=migrations_dir)
+
+    # WAL journaling and the other pragmas on every new connection
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+
+    # ISO 8601 dates and bytes bodies for JSON responses (orjson when installed)
+    from project import jsonprovider
+    jsonprovider.init_app(app)
+
+    # JSON logs written by a background thread
+    from project import logs
+    logs.init_app(app)
 
-app.config['SECRET_KEY'] = 'supersecret' # To allow us to use forms
-app.config["TEMPLATES_AUTO_RELOAD"] = True
+    # In-memory name index for the loan form autocomplete
+    from project import typeahead
+    typeahead.init_app(app)
 
-basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///'+os.path.join(basedir, 'data.sqlite')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Read-through cache for single-row lookups
+    from project import cache
+    cache.init_app(app)
 
-db = SQLAlchemy(app)
-Migrate(app, db)
+    # Compiled-template cache and cached table-row fragments
+    from project import templating
+    templating.init_app(app)
+
+    # Optional single writer thread with group commit
+    from project import writer
+    writer.init_app(app)
+
+    # Per-endpoint request metrics served on /metrics
+    from project import metrics
+    metrics.init_app(app)
+
+    # Per-request query counts, slow-query log and N+1 warnings
+    from project import querylog
+    querylog.init_app(app)
+
+    app.after_request(set_csp)
+
+    # Register Blueprints
+    from project.core.views import core
+    from project.books.views import books
+    from project.customers.views import customers
+    from project.loans.views import loans
+
+    app.register_blueprint(core)
+    app.register_blueprint(books)
+    app.register_blueprint(customers)
+    app.register_blueprint(loans)
+
+    app.cli.add_command(init_db_command)
+    return app
 
 
 # Content Security Policy header
-@app.after_request
 def set_csp(response):
     response.headers['Content-Security-Policy'] = (
         "font-src 'self' https://stackpath.bootstrapcdn.com https://use.fontawesome.com data:; "
@@ -28,13 +89,14 @@ def set_csp(response):
     return response
 
 
-# Register Blueprints
-from project.core.views import core
-from project.books.views import books
-from project.customers.views import customers
-from project.loans.views import loans
-
-app.register_blueprint(core)
-app.register_blueprint(books)
-app.register_blueprint(customers)
-app.register_blueprint(loans)
\ No newline at end of file
+# Command to create the schema of a new database: flask init-db
+@click.command('init-db')
+@click.option('--drop', is_flag=True, help='Drop all tables first.')
+@with_appcontext
+def init_db_command(drop):
+    if drop:
+        db.drop_all()
+    db.create_all()
+    # The new schema is current, so later upgrades start from the latest revision
+    stamp(directory=migrations_dir)
+    click.echo('Initialized the database.')
@@ -0,0 +1,155 @@
+"""
+MessagePack and CBOR responses, picked with the ``Accept`` header.
+
+``/books/json``, ``/customers/json`` and ``/loans/json`` answer
+``Accept: application/msgpack`` or ``Accept: application/cbor`` with the
+same page in that encoding, and the ``/export`` endpoints stream the table
+as a MessagePack stream or a CBOR sequence. JSON stays the default, and
+``*/*`` or a browser's ``Accept`` still gets JSON.
+
+Binary rows are packed straight from the database row tuples: a page is
+``{"fields": [...], "<table>": [[...], ...], "next_cursor": ...,
+"prev_cursor": ...}`` with every row an array in ``fields`` order, and an
+export is the ``fields`` array followed by one array per row. Datetimes are
+native timestamps (the MessagePack timestamp extension, CBOR tag 1); the
+stored times are naive UTC and are sent as UTC.
+
+msgpack and cbor2 are optional. A client that accepts only an encoding
+whose library is not installed gets ``406 Not Acceptable``.
+"""
+
+import io
+from datetime import datetime, timezone
+
+from flask import current_app, request
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover - depends on the environment
+    cbor2 = None
+
+
+JSON = 'application/json'
+
+
+class NegotiationError(ValueError):
+    """Raised when the client only accepts encodings the server cannot produce."""
+
+
+class MsgpackCodec:
+    name = 'msgpack'
+    mimetype = 'application/msgpack'
+    # A MessagePack stream is the values one after the other
+    stream_mimetype = 'application/msgpack'
+    aliases = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+    @property
+    def available(self):
+        return msgpack is not None
+
+    @staticmethod
+    def _default(value):
+        if isinstance(value, datetime) and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        raise TypeError(f'Object of type {type(value).__name__} is not MessagePack serializable')
+
+    def dumps(self, obj):
+        return msgpack.packb(obj, default=self._default, datetime=True)
+
+    def stream_encoder(self):
+        """Return ``encode(values)``, packing each value of an iterable back to back."""
+        packer = msgpack.Packer(default=self._default, datetime=True)
+        return lambda values: b''.join(map(packer.pack, values))
+
+
+class CborCodec:
+    name = 'cbor'
+    mimetype = 'application/cbor'
+    # RFC 8742: CBOR data items one after the other
+    stream_mimetype = 'application/cbor-seq'
+    aliases = ('application/cbor',)
+
+    @property
+    def available(self):
+        return cbor2 is not None
+
+    def dumps(self, obj):
+        return cbor2.dumps(obj, timezone=timezone.utc, datetime_as_timestamp=True)
+
+    def stream_encoder(self):
+        buffer = io.BytesIO()
+        encoder = cbor2.CBOREncoder(buffer, timezone=timezone.utc, datetime_as_timestamp=True)
+
+        def encode(values):
+            for value in values:
+                encoder.encode(value)
+            data = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return data
+        return encode
+
+
+codecs = [MsgpackCodec(), CborCodec()]
+
+
+def negotiate(formats=None):
+    """
+    Return the name of the format the ``Accept`` header prefers: one of the
+    endpoint's own ``formats`` (a ``{name: mimetype}`` dict, JSON by
+    default; the first one when nothing matches) or an installed codec's.
+    """
+    formats = formats or {'json': JSON}
+    default = next(iter(formats))
+    accept = request.accept_mimetypes
+    if not accept:
+        return default
+
+    # Own formats first so that */* and equal qualities keep the current default
+    offered = {mimetype: name for name, mimetype in formats.items()}
+    for codec in codecs:
+        if codec.available:
+            offered.update(dict.fromkeys(codec.aliases, codec.name))
+
+    best = accept.best_match(list(offered))
+    if best is not None:
+        return offered[best]
+
+    wanted = [codec.name for codec in codecs
+              if not codec.available and any(accept.quality(alias) for alias in codec.aliases)]
+    if wanted:
+        raise NegotiationError(f"{', '.join(wanted)} encoding is not available; this server can send: "
+                               f"{', '.join(offered)}")
+    return default
+
+
+def find_codec(name):
+    """Return the codec called ``name`` (``msgpack`` or ``cbor``), or ``None`` for any other name."""
+    for codec in codecs:
+        if codec.name == name:
+            if not codec.available:
+                raise NegotiationError(f'{name} encoding is not available on this server')
+            return codec
+    return None
+
+
+def pack_rows(rows, fields):
+    # The fields are the leading columns of every row; slicing a row gives a plain tuple
+    count = len(fields)
+    return [row[:count] for row in rows]
+
+
+def page_response(codec, name, page, fields):
+    """Encode one page of plain rows as ``{"fields", name, "next_cursor", "prev_cursor"}``."""
+    payload = {
+        'fields': list(fields),
+        name: pack_rows(page.items, fields),
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    }
+    return current_app.response_class(codec.dumps(payload), mimetype=codec.mimetype)
@@ -1,4 +1,5 @@
-from project import db, app
+from sqlalchemy import DDL, event
+from project import db
 import re
 
 
@@ -23,5 +24,32 @@ class Book(db.Model):
         return f"Book(ID: {self.id}, Name: {self.name}, Author: {self.author}, Year Published: {self.year_published}, Type: {self.book_type}, Status: {self.status})"
 
 
-with app.app_context():
-    db.create_all()
\ No newline at end of file
+# Full-text index over name and author. It is an external-content FTS5 table:
+# it stores only the inverted index and triggers on "books" keep it in sync for
+# every write path (ORM, bulk inserts, raw SQL). Status flips do not touch the
+# indexed columns, so they do not re-index the row.
+FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        name, author, content='books', content_rowid='id', tokenize='unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, name, author) VALUES (new.id, new.name, new.author);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, name, author) VALUES ('delete', old.id, old.name, old.author);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF name, author ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, name, author) VALUES ('delete', old.id, old.name, old.author);
+        INSERT INTO books_fts(rowid, name, author) VALUES (new.id, new.name, new.author);
+    END""",
+]
+
+
+def _fts5_available(ddl, target, bind, **kw):
+    return bool(bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+
+for statement in FTS_DDL:
+    event.listen(Book.__table__, 'after_create',
+                 DDL(statement).execute_if(dialect='sqlite', callable_=_fts5_available))
+event.listen(Book.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS books_fts').execute_if(dialect='sqlite'))
@@ -1,29 +1,80 @@
-from flask import render_template, Blueprint, request, redirect, url_for, jsonify
-from project import db
+import logging
+from flask import Blueprint, request, redirect, url_for, jsonify
+from sqlalchemy.dialects.sqlite import insert
 from project.books.models import Book
 from project.books.forms import CreateBook
+from project.pagination import paginate, parse_limit, PaginationError
+from project.binary import NegotiationError, find_codec, negotiate, page_response
+from project.export import export_table
+from project.listing import render_list
+from project.bulk import batch_size, batched, iter_json_records, request_names, validate_record, BulkError
+from project.books.search import search_books
+from project.changes import record
+from project.versioning import conditional
+from project.cache import get_cache
+from project.fields import parse_fields, select_fields, rows_data, row_data, FieldsError
+from project.writer import write
 from markupsafe import escape
 
+logger = logging.getLogger(__name__)
+
 # Blueprint for books
 books = Blueprint('books', __name__, template_folder='templates', url_prefix='/books')
 
+# Fields of a book returned when ?fields= is not given
+BOOK_FIELDS = ('name', 'author', 'year_published', 'book_type')
+
 
-# Route to display books in HTML
+# Route to display books in HTML, one page at a time (or all of them, streamed, with ?all=1)
 @books.route('/', methods=['GET'])
 def list_books():
-    # Fetch all books from the database
-    books = Book.query.all()
-    print('Books page accessed')
-    return render_template('books.html', books=books)
+    logger.info('Books page accessed')
+    return render_list('books.html', 'books', Book, {'name': Book.name})
 
-# Route to fetch books in JSON format
+# Route to fetch books in JSON format, one keyset page at a time
 @books.route('/json', methods=['GET'])
+@conditional('books')
 def list_books_json():
-    # Fetch all books from the database and convert to JSON
-    books = Book.query.all()
-    # Create a list of dictionaries representing each book with the required fields
-    book_list = [{'name': book.name, 'author': book.author, 'year_published': book.year_published, 'book_type': book.book_type} for book in books]
-    return jsonify(books=book_list)
+    try:
+        codec = find_codec(negotiate())
+        fields = parse_fields(Book.__table__, BOOK_FIELDS)
+        # Only the requested columns (and the cursor keys) are read, as plain rows
+        statement = select_fields(Book.__table__, fields, Book.id, Book.name)
+        page = paginate(statement, Book.id, {'name': Book.name})
+    except (FieldsError, PaginationError) as e:
+        return jsonify({'error': str(e)}), 400
+    except NegotiationError as e:
+        return jsonify({'error': str(e)}), 406
+    if codec:
+        # MessagePack / CBOR rows are packed straight from the row tuples
+        return page_response(codec, 'books', page, fields)
+    book_list = rows_data(page.items, fields)
+    return jsonify(books=book_list, next_cursor=page.next_cursor, prev_cursor=page.prev_cursor)
+
+
+# Route to search books by name and author, best match first
+@books.route('/search', methods=['GET'])
+def search_books_json():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+    try:
+        limit = parse_limit(default=20, maximum=100)
+        offset = int(request.args.get('offset', 0))
+    except (PaginationError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    if offset < 0:
+        return jsonify({'error': 'offset must not be negative'}), 400
+
+    results = search_books(query, limit + 1, offset)
+    next_offset = offset + limit if len(results) > limit else None
+    return jsonify(books=results[:limit], next_offset=next_offset)
+
+
+# Route to stream every book as NDJSON or CSV
+@books.route('/export', methods=['GET'])
+def export_books():
+    return export_table('books', [Book.id, Book.name, Book.author, Book.year_published, Book.book_type, Book.status])
 
 
 # Route to create a new book
@@ -37,44 +88,112 @@ def create_book():
         book_type=escape(data['book_type'])
     )
     try:
-        db.session.add(new_book)
-        db.session.commit()
-        print('Book added successfully')
+        write(lambda session: session.add(new_book))
+        logger.info('Book added successfully')
         return jsonify({'message': 'Book created successfully'}), 201
     except Exception as e:
-        db.session.rollback()
-        print('Error creating book')
+        logger.exception('Error creating book')
         return jsonify({'error': f'Error creating book: {str(e)}'}), 500
 
+# Route to create many books at once from a JSON array or NDJSON body
+@books.route('/bulk', methods=['POST'])
+def create_books_bulk():
+    try:
+        size = batch_size()
+        records = iter_json_records()
+        results = []
+        for batch in batched(records, size):
+            results.extend(_insert_book_batch(batch))
+    except BulkError as e:
+        return jsonify({'error': str(e)}), 400
+
+    summary = {status: sum(1 for r in results if r['status'] == status)
+               for status in ('created', 'conflict', 'invalid', 'error')}
+    logger.info('Bulk book import: %d created', summary['created'])
+    return jsonify(summary=summary, results=results)
+
+
+def _insert_book_batch(batch):
+    # Validate every record and keep the first occurrence of each name
+    results = {}
+    rows = {}
+    for index, item, error in batch:
+        if error:
+            results[index] = {'index': index, 'status': 'invalid', 'errors': {'record': [error]}}
+            continue
+        data, errors = validate_record(CreateBook, item)
+        if errors:
+            results[index] = {'index': index, 'status': 'invalid', 'errors': errors}
+            continue
+        name = str(escape(data['name']))
+        if name in rows:
+            results[index] = {'index': index, 'status': 'conflict', 'error': 'Duplicate book name in request'}
+            continue
+        rows[name] = (index, {
+            'name': name,
+            'author': str(escape(data['author'])),
+            'year_published': data['year_published'],
+            'book_type': str(escape(data['book_type'])),
+            'status': 'available'
+        })
+
+    if rows:
+        # One multi-row INSERT per batch; names already taken are skipped by the unique index
+        statement = (insert(Book).on_conflict_do_nothing(index_elements=['name'])
+                     .returning(Book.id, Book.name)
+                     .execution_options(changes_recorded=True))
+        def insert_rows(session):
+            created = {name: book_id for book_id, name in session.execute(statement, [row for _, row in rows.values()])}
+            for name, book_id in created.items():
+                record(session, 'books', 'insert', book_id, rows[name][1])
+            return created
+
+        try:
+            created = write(insert_rows)
+        except Exception as e:
+            logger.exception('Error creating books')
+            created = None
+            for index, _ in rows.values():
+                results[index] = {'index': index, 'status': 'error', 'error': f'Error creating book: {str(e)}'}
+
+        if created is not None:
+            for name, (index, _) in rows.items():
+                if name in created:
+                    results[index] = {'index': index, 'status': 'created', 'id': created[name]}
+                else:
+                    results[index] = {'index': index, 'status': 'conflict', 'error': 'Book name already exists'}
+
+    return [results[index] for index in sorted(results)]
+
 # Route to update an existing book
 @books.route('/<int:book_id>/edit', methods=['POST'])
 def edit_book(book_id):
-    # Get the book with the given ID
-    book = Book.query.get(book_id)
-    
-    # Check if the book exists
-    if not book:
-        print('Book not found')
-        return jsonify({'error': 'Book not found'}), 404
+    # Get data from the request as JSON
+    data = request.get_json()
+
+    def update_book(session):
+        # Get the book with the given ID
+        book = session.get(Book, book_id)
+        if not book:
+            return False
 
-    try:
-        # Get data from the request as JSON
-        data = request.get_json()
-        
         # Update book details with escaping
         book.name = escape(data.get('name', book.name))
         book.author = escape(data.get('author', book.author))
         book.year_published = data.get('year_published', book.year_published)
         book.book_type = escape(data.get('book_type', book.book_type))
-        
-        # Commit the changes to the database
-        db.session.commit()
-        print('Book edited successfully')
+        return True
+
+    try:
+        # Check if the book exists
+        if not write(update_book):
+            logger.info('Book not found')
+            return jsonify({'error': 'Book not found'}), 404
+        logger.info('Book edited successfully')
         return jsonify({'message': 'Book updated successfully'})
     except Exception as e:
         # Handle any exceptions
-        db.session.rollback()
-        print('Error updating book')
+        logger.exception('Error updating book')
         return jsonify({'error': f'Error updating book: {str(e)}'}), 500
 
 
@@ -82,19 +201,19 @@ def edit_book(book_id):
 @books.route('/<int:book_id>/edit-data', methods=['GET'])
 def get_book_for_edit(book_id):
     # Get the book with the given ID
-    book = Book.query.get(book_id)
+    book = get_cache().get_by_id(Book, book_id)
     
     # Check if the book exists
     if not book:
-        print('Book not found')
+        logger.info('Book not found')
         return jsonify({'success': False, 'error': 'Book not found'}), 404
 
     # Create a dictionary representing the book data
     book_data = {
-        'name': book.name,
-        'author': book.author,
-        'year_published': book.year_published,
-        'book_type': book.book_type
+        'name': book['name'],
+        'author': book['author'],
+        'year_published': book['year_published'],
+        'book_type': book['book_type']
     }
     
     return jsonify({'success': True, 'book': book_data})
@@ -103,38 +222,59 @@ def get_book_for_edit(book_id):
 # Route to delete a book
 @books.route('/<int:book_id>/delete', methods=['POST'])
 def delete_book(book_id):
-    book = Book.query.get(book_id)
-    if not book:
-        print('Book not found')
-        return jsonify({'error': 'Book not found'}), 404
+    def remove_book(session):
+        book = session.get(Book, book_id)
+        if not book:
+            return 'missing'
+        # A loaned book is referenced by its loan and cannot be removed
+        if book.status == 'on_loan':
+            return 'on_loan'
+        # Delete the book from the database
+        session.delete(book)
+        return 'deleted'
 
     try:
-        # Delete the book from the database
-        db.session.delete(book)
-        db.session.commit()
-        print('Book deleted successfully')
+        outcome = write(remove_book)
+        if outcome == 'missing':
+            logger.info('Book not found')
+            return jsonify({'error': 'Book not found'}), 404
+        if outcome == 'on_loan':
+            logger.info('Book is on loan')
+            return jsonify({'error': 'Book is on loan'}), 409
+        logger.info('Book deleted successfully')
         return redirect(url_for('books.list_books'))
     except Exception as e:
         # Handle any exceptions, such as database errors
-        db.session.rollback()
-        print('Error deleting book')
+        logger.exception('Error deleting book')
         return jsonify({'error': f'Error deleting book: {str(e)}'}), 500
 
 
 # Route to get book details based on book name
 @books.route('/details/<string:book_name>', methods=['GET'])
 def get_book_details(book_name):
+        try:
+            fields = parse_fields(Book.__table__, BOOK_FIELDS)
+        except FieldsError as e:
+            return jsonify({'error': str(e)}), 400
         # Find the book by its name
-        book = Book.query.filter_by(name=book_name).first()
+        book = get_cache().get_by_name(Book, book_name)
 
         if book:
-            book_data = {
-                'name': book.name,
-                'author': book.author,
-                'year_published': book.year_published,
-                'book_type': book.book_type
-            }
-            return jsonify(book=book_data)
+            return jsonify(book=row_data(book, fields))
         else:
-            print('Book not found')
-            return jsonify({'error': 'Book not found'}), 404
\ No newline at end of file
+            logger.info('Book not found')
+            return jsonify({'error': 'Book not found'}), 404
+
+
+# Route to get the details of many books at once: ?names=a&names=b or POST {"names": [...]}
+@books.route('/details', methods=['GET', 'POST'])
+def get_books_details():
+    try:
+        names = request_names()
+        fields = parse_fields(Book.__table__, BOOK_FIELDS)
+    except (BulkError, FieldsError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    found = get_cache().get_many_by_name(Book, names)
+    book_data = {name: row_data(book, fields) for name, book in found.items()}
+    return jsonify(books=book_data, missing=[name for name in names if name not in found])
@@ -0,0 +1,115 @@
+"""
+Helpers shared by the bulk ingestion endpoints.
+
+Records are read incrementally from the request body, validated with the
+same WTForms classes the single-record views use and handed to the caller
+in fixed-size batches, so a large upload never has to sit in memory whole.
+"""
+
+import json
+from itertools import islice
+
+from flask import current_app, request
+from werkzeug.datastructures import MultiDict
+
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-seq')
+DEFAULT_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 10000
+DEFAULT_MAX_NAMES = 500
+
+
+class BulkError(ValueError):
+    """Raised when a bulk request body or its parameters are unusable."""
+
+
+def batch_size():
+    default = current_app.config.get('BULK_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    raw = request.args.get('batch_size')
+    if raw is None:
+        return default
+    try:
+        size = int(raw)
+    except ValueError:
+        raise BulkError('batch_size must be an integer')
+    if size < 1:
+        raise BulkError('batch_size must be at least 1')
+    return min(size, MAX_BATCH_SIZE)
+
+
+def request_names():
+    """
+    Return the names of a batch lookup, without duplicates.
+
+    They come from ``?names=a&names=b`` or, for POST, a JSON body
+    ``{"names": [...]}``; at most ``BATCH_LOOKUP_MAX_NAMES`` per request.
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True)
+        names = data.get('names') if isinstance(data, dict) else None
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            raise BulkError('Body must be a JSON object with a "names" list of strings')
+    else:
+        names = request.args.getlist('names')
+    if not names:
+        raise BulkError('At least one name is required')
+    limit = current_app.config.get('BATCH_LOOKUP_MAX_NAMES', DEFAULT_MAX_NAMES)
+    if len(names) > limit:
+        raise BulkError(f'At most {limit} names per request')
+    return list(dict.fromkeys(names))
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_json_records():
+    """
+    Yield ``(index, record, error)`` for every record in the request body.
+
+    The body is either a JSON array or NDJSON (one object per line, selected
+    by the Content-Type). NDJSON is parsed line by line straight off the
+    request stream; a line that is not valid JSON is reported, not fatal.
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        index = 0
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield index, json.loads(line), None
+            except ValueError:
+                yield index, None, 'Invalid JSON'
+            index += 1
+        return
+
+    records = request.get_json(silent=True)
+    if not isinstance(records, list):
+        raise BulkError('Request body must be a JSON array or NDJSON')
+    for index, record in enumerate(records):
+        yield index, record, None
+
+
+def validate_record(form_class, record):
+    """
+    Validate one record against the rules of ``form_class``.
+
+    Returns ``(data, errors)``; ``data`` holds the coerced field values and
+    is only meaningful when ``errors`` is empty.
+    """
+    if not isinstance(record, dict):
+        return None, {'record': ['Record must be an object']}
+
+    formdata = MultiDict({key: str(value) for key, value in record.items() if value is not None})
+    form = form_class(formdata=formdata, meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+    data = form.data
+    data.pop('submit', None)
+    return data, {}
@@ -0,0 +1,287 @@
+"""
+Read-through cache of single rows for the detail and edit-data endpoints.
+
+Rows are cached as plain dicts of column values, under their id and (for
+tables with a unique ``name``) under their name. Lookups go through an
+in-process LRU bounded by size and TTL, then an optional shared backend,
+and only then the database; whatever is loaded fills both tiers.
+
+Committed changes (see :mod:`project.changes`) delete the affected keys;
+a table-wide change drops the whole table. A fill that raced with an
+invalidation, in this process or (through the token below) another one, is
+not stored.
+
+With a shared backend, every invalidation also replaces the table's token
+(the ``<table>:token`` key) there. Local entries remember the token they
+were filled under and a local hit is only used while the token is
+unchanged, so an edit in one process reaches the local tier of all the
+others; the shared keys themselves are deleted directly. Without a shared
+backend a process only follows its own commits. Other writers without a
+shared backend, and writes that bypass every cache (a plain sqlite3
+shell), show up once the TTL expires.
+
+A shared backend is any object with::
+
+    get(key) -> value or None
+    set(key, value, ttl)
+    delete(*keys)
+    clear(namespace)   # drop every key starting with "<namespace>:"
+
+:class:`LocalBackend` implements it in memory for tests and single-host
+setups.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import select
+
+from project import db
+from project.changes import subscribe
+
+
+DEFAULT_SIZE = 1024
+DEFAULT_TTL = 60
+
+
+class LRUCache:
+    """A thread-safe LRU mapping whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, max_size=DEFAULT_SIZE, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale = 0
+
+    def get(self, key, valid=None):
+        """Return the value under ``key``; one that ``valid(value)`` rejects is dropped as stale."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if valid is not None and not valid(value):
+                del self._entries[key]
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self, namespace=None):
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                return
+            prefix = f'{namespace}:'
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'stale': self.stale,
+        }
+
+
+class LocalBackend:
+    """In-memory stand-in for a shared backend such as Redis or memcached."""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None or entry[1] <= self._clock():
+                return None
+            # Hand out copies, as a networked backend would
+            return dict(entry[0])
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._values[key] = (dict(value), self._clock() + ttl)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._values.pop(key, None)
+
+    def clear(self, namespace):
+        prefix = f'{namespace}:'
+        with self._lock:
+            for key in [key for key in self._values if key.startswith(prefix)]:
+                del self._values[key]
+
+
+class EntityCache:
+    """Row lookups by id or unique name through the local and shared tiers."""
+
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+        # Bumped on every invalidation so that racing fills are dropped
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def _load(self, model, column, value):
+        row = db.session.execute(select(*model.__table__.columns).where(column == value)).mappings().first()
+        return dict(row) if row is not None else None
+
+    def _token(self, table):
+        """The table's current token in the shared backend (None without one)."""
+        if self.shared is None:
+            return None
+        entry = self.shared.get(f'{table}:token')
+        return entry['token'] if entry is not None else None
+
+    def _cached(self, table, key, token):
+        entry = self.local.get(key, lambda entry: entry[0] == token)
+        if entry is not None:
+            return entry[1]
+        if self.shared is not None:
+            row = self.shared.get(key)
+            if row is not None:
+                self.local.set(key, (token, row))
+                return row
+        return None
+
+    def _store(self, table, generation, token, rows):
+        with self._lock:
+            # An invalidation since the read, here or in another process, may have made these rows stale
+            if self._generations.get(table, 0) != generation or self._token(table) != token:
+                return
+            for row in rows:
+                keys = [f"{table}:id:{row['id']}"]
+                if 'name' in row:
+                    keys.append(f"{table}:name:{row['name']}")
+                for key in keys:
+                    self.local.set(key, (token, row))
+                    if self.shared is not None:
+                        self.shared.set(key, row, self.local.ttl)
+
+    def _get(self, model, key, column, value):
+        table = model.__table__.name
+        token = self._token(table)
+        row = self._cached(table, key, token)
+        if row is not None:
+            return row
+
+        generation = self._generations.get(table, 0)
+        row = self._load(model, column, value)
+        if row is not None:
+            self._store(table, generation, token, [row])
+        return row
+
+    def get_by_id(self, model, id):
+        return self._get(model, f'{model.__table__.name}:id:{id}', model.__table__.c.id, id)
+
+    def get_by_name(self, model, name):
+        return self._get(model, f'{model.__table__.name}:name:{name}', model.__table__.c.name, name)
+
+    def get_many_by_name(self, model, names):
+        """Return ``{name: row}`` for the names that exist, loading the uncached ones with one ``IN`` query."""
+        table = model.__table__.name
+        token = self._token(table)
+        found = {}
+        for name in names:
+            row = self._cached(table, f'{table}:name:{name}', token)
+            if row is not None:
+                found[name] = row
+
+        wanted = [name for name in dict.fromkeys(names) if name not in found]
+        if wanted:
+            generation = self._generations.get(table, 0)
+            statement = select(*model.__table__.columns).where(model.__table__.c.name.in_(wanted))
+            rows = [dict(row) for row in db.session.execute(statement).mappings()]
+            self._store(table, generation, token, rows)
+            found.update((row['name'], row) for row in rows)
+        return found
+
+    def invalidate(self, change):
+        with self._lock:
+            self._generations[change.table] = self._generations.get(change.table, 0) + 1
+            if change.id is None:
+                self.local.clear(change.table)
+                if self.shared is not None:
+                    self.shared.clear(change.table)
+                    self._publish(change.table)
+                return
+            keys = [f'{change.table}:id:{change.id}']
+            for name in {change.values.get('name'), change.previous.get('name')}:
+                if name is not None:
+                    keys.append(f'{change.table}:name:{name}')
+            self.local.delete(*keys)
+            if self.shared is not None:
+                self.shared.delete(*keys)
+                self._publish(change.table)
+
+    def _publish(self, table):
+        # A fresh random token, so concurrent writers can never set the same one twice
+        # and the local entries of every other process stop matching
+        self.shared.set(f'{table}:token', {'token': os.urandom(8).hex()}, self.local.ttl)
+
+    def stats(self):
+        stats = self.local.stats()
+        stats['shared'] = type(self.shared).__name__ if self.shared is not None else None
+        return stats
+
+
+def init_app(app, shared=None):
+    local = LRUCache(
+        max_size=app.config.get('ENTITY_CACHE_SIZE', DEFAULT_SIZE),
+        ttl=app.config.get('ENTITY_CACHE_TTL', DEFAULT_TTL),
+    )
+    app.extensions['entity_cache'] = EntityCache(local, shared)
+
+
+def get_cache():
+    return current_app.extensions['entity_cache']
+
+
+@subscribe
+def _on_commit(changes):
+    cache = current_app.extensions.get('entity_cache')
+    if cache:
+        for change in changes:
+            cache.invalidate(change)
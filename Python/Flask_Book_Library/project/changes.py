@@ -0,0 +1,100 @@
+"""
+Commit-time change notifications for in-process caches and indexes.
+
+Rows changed through the ORM are collected from the session on every flush
+and handed to the subscribers only once the transaction commits; a rollback
+throws them away. Bulk Core statements (``session.execute(insert(...))``)
+are reported as a table-wide change unless the caller records the affected
+rows itself with :func:`record` and marks the statement with
+``execution_options(changes_recorded=True)``.
+
+Subscribers run right after the commit and must not issue SQL.
+"""
+
+from sqlalchemy import event, inspect
+
+from project import db
+
+
+_subscribers = []
+
+
+class Change:
+    """One committed row change, or a table-wide change when ``id`` is None."""
+
+    __slots__ = ('table', 'op', 'id', 'values', 'previous')
+
+    def __init__(self, table, op, id=None, values=None, previous=None):
+        self.table = table
+        self.op = op
+        self.id = id
+        # Column values after the change (before it, for deletes)
+        self.values = values or {}
+        # Old values of the columns that changed, for updates
+        self.previous = previous or {}
+
+    def __repr__(self):
+        return f"Change({self.table}, {self.op}, id={self.id})"
+
+
+def subscribe(callback):
+    """Call ``callback(changes)`` with the list of changes of every commit."""
+    _subscribers.append(callback)
+    return callback
+
+
+def record(session, table, op, id=None, values=None, previous=None):
+    """Queue a change made outside the unit of work (e.g. a Core UPDATE)."""
+    session.info.setdefault('pending_changes', []).append(Change(table, op, id, values, previous))
+
+
+def _row_values(state):
+    # Read from the instance dict so collecting never triggers a lazy load
+    return {prop.key: state.dict.get(prop.key) for prop in state.mapper.column_attrs}
+
+
+def _previous_values(state):
+    previous = {}
+    for prop in state.mapper.column_attrs:
+        deleted = state.attrs[prop.key].history.deleted
+        if deleted:
+            previous[prop.key] = deleted[0]
+    return previous
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_flush(session, flush_context):
+    for op, objects in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objects:
+            state = inspect(obj)
+            previous = _previous_values(state) if op == 'update' else None
+            if op == 'update' and not previous:
+                continue
+            # New rows get their identity key only after the flush; read the id instead
+            identity = state.mapper.primary_key_from_instance(obj)[0]
+            record(session, state.mapper.persist_selectable.name, op, identity, _row_values(state), previous)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _collect_bulk(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if orm_execute_state.execution_options.get('changes_recorded'):
+        return
+    statement = orm_execute_state.statement
+    op = 'insert' if orm_execute_state.is_insert else 'update' if orm_execute_state.is_update else 'delete'
+    record(orm_execute_state.session, statement.table.name, op)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _dispatch(session):
+    changes = session.info.pop('pending_changes', None)
+    if not changes:
+        return
+    for callback in _subscribers:
+        callback(changes)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard(session):
+    session.info.pop('pending_changes', None)
@@ -0,0 +1,142 @@
+"""
+Configuration profiles and SQLite engine setup.
+
+The profile is picked with the ``FLASK_CONFIG`` environment variable
+(``development`` by default, ``production`` or ``testing``). Every profile
+reads ``DATABASE_URL`` and ``SECRET_KEY`` from the environment, and pool
+sizes can be overridden with ``DB_POOL_SIZE``, ``DB_MAX_OVERFLOW`` and
+``DB_POOL_TIMEOUT``. ``WRITE_QUEUE_ENABLED=1`` turns on the single-writer
+queue, and ``LOG_LEVEL`` sets the level of the JSON logs.
+
+SQLite connections get the profile's ``SQLITE_PRAGMAS`` as soon as they are
+opened. WAL journaling lets readers keep going while a writer holds the
+lock, and ``busy_timeout`` makes a blocked writer wait instead of failing
+with "database is locked". ``foreign_keys`` makes SQLite itself enforce
+the loan -> book / customer references, not only the ORM.
+"""
+
+import os
+
+from sqlalchemy import event
+
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+# Logged on every page load
+page_view_messages = ['Homepage accessed', 'Books page accessed', 'Customers page accessed', 'Loans page accessed']
+
+
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'supersecret') # To allow us to use forms
+    TEMPLATES_AUTO_RELOAD = True
+    # Keep compiled templates on disk between worker starts (see project/templating.py)
+    JINJA_BYTECODE_CACHE = os.environ.get('JINJA_BYTECODE_CACHE', '0') == '1'
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 20000))
+
+    # JSON encoder: auto, orjson or stdlib (see project/jsonprovider.py)
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')
+
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///'+os.path.join(basedir, 'data.sqlite'))
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool, used for file databases only
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+
+    # Send every write through one thread that commits them in groups (see project/writer.py)
+    WRITE_QUEUE_ENABLED = os.environ.get('WRITE_QUEUE_ENABLED', '0') == '1'
+    WRITE_QUEUE_MAX_BATCH = int(os.environ.get('WRITE_QUEUE_MAX_BATCH', 64))
+    WRITE_QUEUE_TIMEOUT = int(os.environ.get('WRITE_QUEUE_TIMEOUT', 30))
+
+    # SQL instrumentation (see project/querylog.py)
+    SQL_SLOW_QUERY_MS = float(os.environ.get('SQL_SLOW_QUERY_MS', 100))
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 5))
+    SQL_SERVER_TIMING = os.environ.get('SQL_SERVER_TIMING', '1') == '1'
+
+    # Structured logging (see project/logs.py)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    # Fraction of the records kept for the noisiest messages
+    LOG_SAMPLE_RATES = dict.fromkeys(page_view_messages, float(os.environ.get('LOG_PAGE_VIEW_SAMPLE_RATE', 1.0)))
+
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        # NORMAL is durable against application crashes in WAL mode; only a power loss can drop the last commits
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        # Negative sizes are in KiB: a 20 MB page cache per connection
+        'cache_size': -20000,
+        'mmap_size': 64 * 1024 * 1024,
+        # SQLite leaves foreign keys unenforced unless each connection asks for it
+        'foreign_keys': 'ON',
+    }
+
+
+class DevelopmentConfig(Config):
+    pass
+
+
+class ProductionConfig(Config):
+    # Templates only change with a deploy
+    TEMPLATES_AUTO_RELOAD = False
+    JINJA_BYTECODE_CACHE = os.environ.get('JINJA_BYTECODE_CACHE', '1') == '1'
+
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+
+    SQLITE_PRAGMAS = dict(Config.SQLITE_PRAGMAS, cache_size=-64000, mmap_size=256 * 1024 * 1024)
+
+    LOG_SAMPLE_RATES = dict.fromkeys(page_view_messages, float(os.environ.get('LOG_PAGE_VIEW_SAMPLE_RATE', 0.1)))
+
+
+class TestingConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+
+    # Every app gets its own private in-memory database
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite:///:memory:')
+
+    # Durability does not matter for throwaway test data
+    SQLITE_PRAGMAS = dict(Config.SQLITE_PRAGMAS, synchronous='OFF')
+
+
+profiles = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+
+def load_config(app, name=None, **overrides):
+    """Load the named profile (default: ``FLASK_CONFIG``) and ``overrides`` into ``app.config``."""
+    name = name or os.environ.get('FLASK_CONFIG', 'development')
+    if name not in profiles:
+        raise ValueError(f"Unknown config profile '{name}', expected one of: {', '.join(profiles)}")
+    app.config.from_object(profiles[name])
+    app.config.update(overrides)
+
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite') and ':memory:' not in uri and uri != 'sqlite://':
+        # In-memory databases use a single-connection pool that takes no sizing
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': app.config['DB_POOL_SIZE'],
+            'max_overflow': app.config['DB_MAX_OVERFLOW'],
+            'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+        }
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run ``PRAGMA name = value`` for every pragma on each new connection."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+        finally:
+            cursor.close()
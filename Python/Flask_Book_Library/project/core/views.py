@@ -1,4 +1,9 @@
-from flask import render_template, Blueprint
+import logging
+from flask import render_template, Blueprint, Response, jsonify
+from project.cache import get_cache
+from project.metrics import get_registry, CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
 
 
 # Blueprint for core
@@ -8,5 +13,17 @@ core = Blueprint('core', __name__, template_folder='templates', static_folder='s
 # Route to homepage
 @core.route('/')
 def index():
-    print('Homepage accessed')
+    logger.info('Homepage accessed')
     return render_template('index.html')
+
+
+# Route to inspect the entity cache counters
+@core.route('/cache/stats')
+def cache_stats():
+    return jsonify(get_cache().stats())
+
+
+# Route to expose request metrics in the Prometheus text format
+@core.route('/metrics')
+def metrics():
+    return Response(get_registry().render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,88 @@
+"""
+Streaming CSV import of customers with upsert semantics.
+
+The CSV is read row by row, each row is validated with the CreateCustomer
+rules and valid rows are written with ``INSERT ... ON CONFLICT(name) DO
+UPDATE`` in fixed-size batches, one transaction per batch. Only a bounded
+number of row errors is kept, so memory does not grow with the file.
+"""
+
+import csv
+
+from markupsafe import escape
+from sqlalchemy.dialects.sqlite import insert
+
+from project.writer import write
+from project.bulk import BulkError, DEFAULT_BATCH_SIZE, validate_record
+from project.customers.forms import CreateCustomer
+from project.customers.models import Customer
+
+
+REQUIRED_COLUMNS = ('name', 'city', 'age')
+MAX_REPORTED_ERRORS = 100
+
+
+def _upsert(rows):
+    statement = insert(Customer)
+    statement = statement.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'city': statement.excluded.city, 'age': statement.excluded.age}
+    )
+
+    def upsert_rows(session):
+        session.execute(statement, rows)
+
+    # One write per batch, so each batch commits on its own
+    write(upsert_rows)
+
+
+def import_customers_csv(lines, batch_size=DEFAULT_BATCH_SIZE, max_errors=MAX_REPORTED_ERRORS):
+    """
+    Import customers from an iterable of CSV text lines.
+
+    Returns a report with the number of rows read, upserted and rejected,
+    plus the first ``max_errors`` row errors keyed by CSV line number.
+    """
+    reader = csv.DictReader(lines)
+    header = [column.strip().lower() for column in reader.fieldnames or []]
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise BulkError(f"CSV is missing required columns: {', '.join(missing)}")
+    reader.fieldnames = header
+
+    report = {'processed': 0, 'upserted': 0, 'invalid': 0, 'failed': 0, 'errors': []}
+
+    def add_error(line, errors):
+        if len(report['errors']) < max_errors:
+            report['errors'].append({'line': line, 'errors': errors})
+
+    def flush(batch):
+        try:
+            _upsert([row for _, row in batch])
+            report['upserted'] += len(batch)
+        except Exception as e:
+            report['failed'] += len(batch)
+            add_error(batch[0][0], {'batch': [f'Error importing customers: {str(e)}']})
+
+    batch = []
+    for record in reader:
+        report['processed'] += 1
+        line = reader.line_num
+        data, errors = validate_record(CreateCustomer, {column: record.get(column) for column in REQUIRED_COLUMNS})
+        if errors:
+            report['invalid'] += 1
+            add_error(line, errors)
+            continue
+
+        batch.append((line, {
+            'name': str(escape(data['name'])),
+            'city': str(escape(data['city'])),
+            'age': data['age']
+        }))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+
+    if batch:
+        flush(batch)
+    return report
@@ -1,4 +1,4 @@
-from project import db, app
+from project import db
 
 
 # Customer model
@@ -16,7 +16,3 @@ class Customer(db.Model):
 
     def __repr__(self):
         return f"Customer(ID: {self.id}, Name: {self.name}, City: {self.city}, Age: {self.age})"
-
-
-with app.app_context():
-    db.create_all()
@@ -1,26 +1,58 @@
-from flask import render_template, Blueprint, request, redirect, url_for, jsonify
-from project import db
+import csv
+import logging
+import io
+import click
+from flask import Blueprint, request, redirect, url_for, jsonify
 from project.customers.models import Customer
 from project.customers.forms import CreateCustomer
+from project.pagination import paginate, PaginationError
+from project.binary import NegotiationError, find_codec, negotiate, page_response
+from project.export import export_table
+from project.listing import render_list
+from project.bulk import batch_size, BulkError
+from project.customers.importer import import_customers_csv
+from project.cache import get_cache
+from project.fields import parse_fields, select_fields, rows_data, FieldsError
+from project.writer import write
+from project.versioning import conditional
 from markupsafe import escape
 
+logger = logging.getLogger(__name__)
+
 # Blueprint for customers
-customers = Blueprint('customers', __name__, template_folder='templates', url_prefix='/customers')
+customers = Blueprint('customers', __name__, template_folder='templates', url_prefix='/customers', cli_group=None)
 
-# Route to display customers in HTML
+# Route to display customers in HTML, one page at a time (or all of them, streamed, with ?all=1)
 @customers.route('/', methods=['GET'])
 def list_customers():
-    customers = Customer.query.all()
-    print('Customers page accessed')
-    return render_template('customers.html', customers=customers)
+    logger.info('Customers page accessed')
+    return render_list('customers.html', 'customers', Customer, {'name': Customer.name})
 
-# Route to fetch customers in JSON format
+# Route to fetch customers in JSON format, one keyset page at a time
 @customers.route('/json', methods=['GET'])
+@conditional('customers')
 def list_customers_json():
-    # Fetch all customers from the database and convert to JSON
-    customers = Customer.query.all()
-    customer_list = [{'name': customer.name, 'city': customer.city, 'age': customer.age} for customer in customers]
-    return jsonify(customers=customer_list)
+    try:
+        codec = find_codec(negotiate())
+        fields = parse_fields(Customer.__table__, ('name', 'city', 'age'))
+        # Only the requested columns (and the cursor keys) are read, as plain rows
+        statement = select_fields(Customer.__table__, fields, Customer.id, Customer.name)
+        page = paginate(statement, Customer.id, {'name': Customer.name})
+    except (FieldsError, PaginationError) as e:
+        return jsonify({'error': str(e)}), 400
+    except NegotiationError as e:
+        return jsonify({'error': str(e)}), 406
+    if codec:
+        # MessagePack / CBOR rows are packed straight from the row tuples
+        return page_response(codec, 'customers', page, fields)
+    customer_list = rows_data(page.items, fields)
+    return jsonify(customers=customer_list, next_cursor=page.next_cursor, prev_cursor=page.prev_cursor)
+
+
+# Route to stream every customer as NDJSON or CSV
+@customers.route('/export', methods=['GET'])
+def export_customers():
+    return export_table('customers', [Customer.id, Customer.name, Customer.city, Customer.age])
 
 
 # Route to create a new customer
@@ -33,81 +65,117 @@ def create_customer():
         age=data['age']
     )
     try:
-        db.session.add(new_customer)
-        db.session.commit()
-        print('Customer added successfully')
+        write(lambda session: session.add(new_customer))
+        logger.info('Customer added successfully')
         return jsonify({'message': 'Customer created successfully'}), 201
     except Exception as e:
-        db.session.rollback()
-        print('Error creating customer')
+        logger.exception('Error creating customer')
         return jsonify({'error': f'Error creating customer: {str(e)}'}), 500
 
+# Route to import (create or update) customers from an uploaded CSV file
+@customers.route('/import', methods=['POST'])
+def import_customers():
+    # Accept either a multipart upload or a raw text/csv body
+    upload = request.files.get('file')
+    raw = upload.stream if upload else io.BufferedReader(request.stream)
+    lines = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+    try:
+        report = import_customers_csv(lines, batch_size=batch_size())
+    except (BulkError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'error': f'Error importing customers: {str(e)}'}), 400
+    finally:
+        lines.detach()
+
+    logger.info('Customer import: %d upserted, %d invalid', report['upserted'], report['invalid'])
+    return jsonify(report)
+
+
+# Command to import customers from a CSV file: flask import-customers customers.csv
+@customers.cli.command('import-customers')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=500, show_default=True, help='Rows per INSERT ... ON CONFLICT batch.')
+def import_customers_command(path, batch_size):
+    with open(path, encoding='utf-8-sig', newline='') as lines:
+        try:
+            report = import_customers_csv(lines, batch_size=batch_size)
+        except BulkError as e:
+            raise click.ClickException(str(e))
+
+    click.echo(f"Processed {report['processed']} rows: {report['upserted']} upserted, "
+               f"{report['invalid']} invalid, {report['failed']} failed")
+    for error in report['errors']:
+        click.echo(f"  line {error['line']}: {error['errors']}", err=True)
+
+
 # Route to fetch customer data for editing
 @customers.route('/<int:customer_id>/edit-data', methods=['GET'])
 def edit_customer_data(customer_id):
     # Get the customer with the given ID
-    customer = Customer.query.get(customer_id)
+    customer = get_cache().get_by_id(Customer, customer_id)
 
     if customer:
         # Convert customer data to a dictionary
         customer_data = {
-            'name': customer.name,
-            'city': customer.city,
-            'age': customer.age
+            'name': customer['name'],
+            'city': customer['city'],
+            'age': customer['age']
         }
         return jsonify({'success': True, 'customer': customer_data}), 200
     else:
-        print('Customer not found')
+        logger.info('Customer not found')
         return jsonify({'error': 'Customer not found'}), 404
 
 
 # Route to update an existing customer
 @customers.route('/<int:customer_id>/edit', methods=['POST'])
 def edit_customer(customer_id):
-    # Get the customer with the given ID
-    customer = Customer.query.get(customer_id)
-
-    # Check if the customer exists
-    if not customer:
-        print('Customer not found')
-        return jsonify({'error': 'Customer not found'}), 404
-
     try:
         # Get data from the request
         data = request.form
-
-        # Update customer details with escaping
-        customer.name = escape(data['name'])
-        customer.city = escape(data['city'])
-        customer.age = data['age']
-
-        # Commit the changes to the database
-        db.session.commit()
-        print('Customer updated succesfully')
+        name, city, age = escape(data['name']), escape(data['city']), data['age']
+
+        def update_customer(session):
+            # Get the customer with the given ID
+            customer = session.get(Customer, customer_id)
+            if not customer:
+                return False
+
+            # Update customer details with escaping
+            customer.name = name
+            customer.city = city
+            customer.age = age
+            return True
+
+        # Check if the customer exists
+        if not write(update_customer):
+            logger.info('Customer not found')
+            return jsonify({'error': 'Customer not found'}), 404
+        logger.info('Customer updated succesfully')
         return jsonify({'message': 'Customer updated successfully'})
     except Exception as e:
         # Handle any exceptions
-        db.session.rollback()
-        print('Error updating customer')
+        logger.exception('Error updating customer')
         return jsonify({'error': f'Error updating customer: {str(e)}'}), 500
 
 
 # Route to delete a customer
 @customers.route('/<int:customer_id>/delete', methods=['POST'])
 def delete_customer(customer_id):
-    customer = Customer.query.get(customer_id)
-    if not customer:
-        print('Customer not found')
-        return jsonify({'error': 'Customer not found'}), 404
+    def remove_customer(session):
+        customer = session.get(Customer, customer_id)
+        if not customer:
+            return False
+        # Delete the customer from the database
+        session.delete(customer)
+        return True
 
     try:
-        # Delete the customer from the database
-        db.session.delete(customer)
-        db.session.commit()
-        print('Customer deleted successfully')
+        if not write(remove_customer):
+            logger.info('Customer not found')
+            return jsonify({'error': 'Customer not found'}), 404
+        logger.info('Customer deleted successfully')
         return redirect(url_for('customers.list_customers'))
     except Exception as e:
         # Handle any exceptions, such as database errors
-        db.session.rollback()
-        print('Error deleting customer')
+        logger.exception('Error deleting customer')
         return jsonify({'error': f'Error deleting customer: {str(e)}'}), 500
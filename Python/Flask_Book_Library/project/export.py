@@ -0,0 +1,100 @@
+"""
+Streaming NDJSON / CSV export of whole tables.
+
+Rows are read as plain column tuples with ``yield_per`` so they never enter
+the ORM identity map, and are written out chunk by chunk through a generator
+response, so worker memory stays flat no matter how big the table gets.
+
+``?format=msgpack`` / ``?format=cbor`` (or an ``Accept`` header asking for
+them, see :mod:`project.binary`) stream the field names followed by one
+array per row, packed straight from the row tuples.
+"""
+
+import csv
+import io
+import json
+from datetime import date
+
+from flask import Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import select
+
+from project import db
+from project.binary import NegotiationError, codecs, find_codec, negotiate
+
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _iter_chunks(statement, chunk_size):
+    result = db.session.execute(statement.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        yield rows
+
+
+def _ndjson_chunks(statement, fields, chunk_size):
+    for rows in _iter_chunks(statement, chunk_size):
+        yield ''.join(json.dumps(dict(zip(fields, row)), default=_json_default) + '\n' for row in rows)
+
+
+def _csv_chunks(statement, fields, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for rows in _iter_chunks(statement, chunk_size):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when the table is empty
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _binary_chunks(codec, statement, fields, chunk_size):
+    encode = codec.stream_encoder()
+    yield encode([fields])
+    for rows in _iter_chunks(statement, chunk_size):
+        yield encode(map(tuple, rows))
+
+
+def export_table(name, columns):
+    """Stream ``columns`` of a table as NDJSON, CSV, MessagePack or CBOR depending on ``?format=`` or ``Accept``."""
+    fmt = request.args.get('format')
+    negotiated = fmt is None
+    try:
+        if negotiated:
+            fmt = negotiate(EXPORT_FORMATS)
+        codec = find_codec(fmt)
+    except NegotiationError as e:
+        return jsonify({'error': str(e)}), 406
+    if codec is None and fmt not in EXPORT_FORMATS:
+        allowed = list(EXPORT_FORMATS) + [binary.name for binary in codecs]
+        return jsonify({'error': f"Invalid format. Allowed values: {', '.join(allowed)}"}), 400
+
+    chunk_size = current_app.config.get('EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    fields = [column.key for column in columns]
+    # Primary key order keeps the output stable between runs
+    statement = select(*columns).order_by(columns[0])
+    if codec:
+        chunks = _binary_chunks(codec, statement, fields, chunk_size)
+        mimetype = codec.stream_mimetype
+    else:
+        chunks = (_csv_chunks if fmt == 'csv' else _ndjson_chunks)(statement, fields, chunk_size)
+        mimetype = EXPORT_FORMATS[fmt]
+
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={name}.{fmt}'
+    if negotiated:
+        # Without ?format= the body depends on Accept
+        response.vary.add('Accept')
+    return response
@@ -0,0 +1,48 @@
+"""
+Sparse fieldsets: ``?fields=name,author`` on the JSON read endpoints.
+
+Any column of the table can be asked for; without ``fields`` an endpoint
+returns its usual set. The list endpoints turn the fields into a Core
+``select()`` of just those columns (plus the sort key the page cursors
+need), so rows come back as plain tuples: no ORM objects, no identity map
+and no unused columns. The detail endpoints read whole rows through the
+entity cache and only trim the response.
+"""
+
+from flask import request
+from sqlalchemy import select
+
+
+class FieldsError(ValueError):
+    """Raised when ``fields`` names a column the table does not have."""
+
+
+def parse_fields(table, default):
+    """Return the field names asked for in ``?fields=``, or ``default``."""
+    raw = request.args.get('fields', '')
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    if not names:
+        return list(default)
+    unknown = [name for name in names if name not in table.c]
+    if unknown:
+        raise FieldsError(f"Invalid fields: {', '.join(unknown)}. Allowed values: {', '.join(table.c.keys())}")
+    return list(dict.fromkeys(names))
+
+
+def select_fields(table, fields, *required):
+    """
+    Select the ``fields`` columns of ``table`` first, then any ``required``
+    column (such as a sort key) that is not among them.
+    """
+    columns = [table.c[name] for name in fields]
+    columns += [column for column in required if column.key not in fields]
+    return select(*columns)
+
+
+def rows_data(rows, fields):
+    # The fields are the leading columns of every row
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def row_data(row, fields):
+    return {name: row[name] for name in fields}
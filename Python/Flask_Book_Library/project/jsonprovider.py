@@ -0,0 +1,122 @@
+"""
+JSON encoding for ``jsonify`` and every dict or list returned by a view.
+
+With orjson installed the app encodes with :class:`OrjsonProvider`: the
+response body is the ``bytes`` orjson writes into its own buffer, with the
+trailing newline appended by orjson, so no ``str`` is built and encoded
+again. Without orjson, :class:`StdlibJSONProvider` encodes with the
+standard library and gives the same output.
+
+Both differ from Flask's default provider in three ways:
+
+- dates and datetimes are ISO 8601 (``2024-01-01T00:00:00``), like the
+  export and the loan form, instead of RFC 822 HTTP dates;
+- keys keep the order the views build them in instead of being sorted;
+- non-ASCII text is written as UTF-8 instead of ``\\u`` escapes.
+
+``JSON_PROVIDER`` picks the provider: ``auto`` (default: orjson when it is
+installed), ``orjson`` or ``stdlib``.
+"""
+
+import dataclasses
+import decimal
+import uuid
+from datetime import date, time
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Standard library encoding with ISO 8601 dates and unsorted keys."""
+
+    default = staticmethod(_default)
+    ensure_ascii = False
+    sort_keys = False
+
+    def _pretty(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def dumps(self, obj, **kwargs):
+        # Compact unless indented, like orjson
+        if kwargs.get('indent') is None:
+            kwargs.setdefault('separators', (',', ':'))
+        return super().dumps(obj, **kwargs)
+
+    def dumpb(self, obj):
+        """Serialize ``obj`` to UTF-8 bytes."""
+        return self.dumps(obj).encode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self._pretty():
+            body = self.dumps(obj, indent=2).encode()
+        else:
+            body = self.dumpb(obj)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    """orjson encoding; output matches :class:`StdlibJSONProvider`."""
+
+    def _options(self):
+        # Datetimes, dates, UUIDs and dataclasses are native to orjson
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # json.dumps options such as indent or separators have no orjson equivalent
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def dumpb(self, obj):
+        return orjson.dumps(obj, default=self.default, option=self._options())
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        options = self._options() | orjson.OPT_APPEND_NEWLINE
+        if self._pretty():
+            options |= orjson.OPT_INDENT_2
+        body = orjson.dumps(obj, default=self.default, option=options)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+providers = {
+    'orjson': OrjsonProvider,
+    'stdlib': StdlibJSONProvider,
+}
+
+
+def init_app(app):
+    name = app.config.get('JSON_PROVIDER', 'auto')
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'stdlib'
+    if name not in providers:
+        raise ValueError(f"Unknown JSON_PROVIDER '{name}', expected one of: auto, {', '.join(providers)}")
+    if name == 'orjson' and orjson is None:
+        raise RuntimeError("JSON_PROVIDER is 'orjson' but orjson is not installed")
+    app.json = providers[name](app)
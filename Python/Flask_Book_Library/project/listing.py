@@ -0,0 +1,61 @@
+"""
+Paginated and streamed HTML list pages.
+
+By default a list page shows one keyset page (see :mod:`project.pagination`)
+with a page-size selector and previous / next links. ``?all=1`` shows every
+row instead: the rows are read from the database in chunks while the
+template is being rendered with ``stream_template``, and the output is sent
+as it is produced, so the browser starts painting the table before the last
+rows have been fetched and worker memory stays flat.
+"""
+
+from flask import Response, abort, current_app, render_template, request, stream_template
+from sqlalchemy import select
+
+from project import db
+from project.pagination import paginate, PaginationError
+
+
+PAGE_SIZES = (25, 50, 100, 200, 500)
+DEFAULT_CHUNK_SIZE = 500
+# Bytes collected before a piece of the page is sent
+FLUSH_SIZE = 16 * 1024
+
+
+def _iter_rows(model, chunk_size):
+    # Plain rows keep the ORM identity map out of a full-table render
+    statement = select(*model.__table__.columns).order_by(*model.__table__.primary_key.columns)
+    result = db.session.execute(statement.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        yield from rows
+
+
+def _buffered(pieces):
+    # Jinja yields every text fragment separately; send them in fewer, larger writes
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= FLUSH_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def render_list(template_name, rows_name, model, sort_columns, **context):
+    """Render one page of ``model`` rows as ``rows_name``, or stream all of them with ``?all=1``."""
+    if request.args.get('all') == '1':
+        chunk_size = current_app.config.get('LIST_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+        context[rows_name] = _iter_rows(model, chunk_size)
+        pieces = stream_template(template_name, page=None, page_sizes=PAGE_SIZES, **context)
+        return Response(_buffered(pieces), mimetype='text/html')
+
+    try:
+        page = paginate(model.query, model.id, sort_columns)
+    except PaginationError as e:
+        abort(400, str(e))
+    context[rows_name] = page.items
+    return render_template(template_name, page=page, page_sizes=PAGE_SIZES, **context)
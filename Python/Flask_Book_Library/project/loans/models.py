@@ -1,4 +1,4 @@
-from project import db , app
+from project import db
 
 
 # Loan model
@@ -6,26 +6,28 @@ class Loan(db.Model):
     __tablename__ = 'Loans'
 
     id = db.Column(db.Integer, primary_key=True)
+    # Customers are linked when they exist; the name is kept as entered on the loan
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id', ondelete='SET NULL'), index=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('books.id'), nullable=False, index=True)
     customer_name = db.Column(db.String(64), nullable=False)
     book_name = db.Column(db.String(64), nullable=False)
-    loan_date = db.Column(db.DateTime, nullable=False)
-    return_date = db.Column(db.DateTime, nullable=False)
-    original_author = db.Column(db.String(64), nullable=False)
-    original_year_published = db.Column(db.Integer, nullable=False)
-    original_book_type = db.Column(db.String(64), nullable=False)
+    loan_date = db.Column(db.DateTime, nullable=False, index=True)
+    return_date = db.Column(db.DateTime, nullable=False, index=True)
 
-    def __init__(self, customer_name, book_name, loan_date, return_date, original_author, original_year_published, original_book_type):
+    customer = db.relationship('Customer', backref=db.backref('loans', lazy='dynamic'))
+    book = db.relationship('Book', backref=db.backref('loans', lazy='dynamic'))
+
+    def __init__(self, customer_name, book_name, loan_date, return_date, book=None, customer=None, book_id=None):
+        # Link by object or, when only the id is known, by foreign key
+        if book is not None:
+            self.book = book
+        else:
+            self.book_id = book_id
+        self.customer = customer
         self.customer_name = customer_name
         self.book_name = book_name
         self.loan_date = loan_date
         self.return_date = return_date
-        self.original_author = original_author
-        self.original_year_published = original_year_published
-        self.original_book_type = original_book_type
 
     def __repr__(self):
         return f"Customer: {self.customer_name}, Book: {self.book_name}, Loan Date: {self.loan_date}, Return Date: {self.return_date}"
-
-
-with app.app_context():
-    db.create_all()
\ No newline at end of file
@@ -1,23 +1,61 @@
+import logging
 from flask import render_template, Blueprint, request, redirect, url_for, jsonify
-from project import db
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
 from project.loans.models import Loan
 from project.loans.forms import CreateLoan
 from project.books.models import Book
 from project.customers.models import Customer
+from project.pagination import paginate, parse_limit, PaginationError
+from project.binary import NegotiationError, find_codec, negotiate, page_response
+from project.export import export_table
+from project.bulk import request_names, BulkError
+from project.listing import render_list
+from project.changes import record
+from project.typeahead import get_index
+from project.versioning import conditional
+from project.cache import get_cache
+from project.fields import parse_fields, select_fields, rows_data, row_data, FieldsError
+from project.writer import write
 from markupsafe import escape
 
+logger = logging.getLogger(__name__)
+
 
 # Blueprint for loans
 loans = Blueprint('loans', __name__, template_folder='templates', url_prefix='/loans')
 
+# Related rows that can be embedded in loan responses with ?expand=
+EXPANSIONS = {'book': Loan.book, 'customer': Loan.customer}
+
+# Fields returned when ?fields= is not given
+LOAN_FIELDS = ('id', 'customer_id', 'book_id', 'customer_name', 'book_name', 'loan_date', 'return_date')
+BOOK_FIELDS = ('id', 'name', 'author', 'year_published', 'book_type', 'status')
+CUSTOMER_FIELDS = ('id', 'name', 'city', 'age')
+
+
+def _parse_expand():
+    names = {name.strip() for name in request.args.get('expand', '').split(',') if name.strip()}
+    unknown = names - set(EXPANSIONS)
+    if unknown:
+        raise ValueError(f"Invalid expand: {', '.join(sorted(unknown))}. Allowed values: {', '.join(EXPANSIONS)}")
+    return names
+
+
+def _loan_data(loan, expand=(), fields=LOAN_FIELDS):
+    loan_data = {name: getattr(loan, name) for name in fields}
+    if 'book' in expand:
+        loan_data['book'] = {name: getattr(loan.book, name) for name in BOOK_FIELDS} if loan.book else None
+    if 'customer' in expand:
+        loan_data['customer'] = {name: getattr(loan.customer, name) for name in CUSTOMER_FIELDS} if loan.customer else None
+    return loan_data
+
 
 # Route to provide book and customer data in JSON format
 @loans.route('/books/json', methods=['GET'])
 def list_books_json():
-    # Fetch all books from the database
-    books = Book.query.all()
-    # Create a list of book names
-    book_list = [{'name': book.name} for book in books]
+    # Names of the books that can still be loaned, from the in-memory index
+    book_list = [{'name': name} for name in get_index('books').all()]
     # Return book data in JSON format
     return jsonify({'books': book_list})
 
@@ -25,23 +63,40 @@ def list_books_json():
 # Route to list all customers
 @loans.route('/customers/json', methods=['GET'])
 def list_customers_json():
-
-    # Fetch all customers from the database
-    customers = Customer.query.all()
-    # Create a list of customer names
-    customer_list = [{'name': customer.name} for customer in customers]
+    # Customer names from the in-memory index
+    customer_list = [{'name': name} for name in get_index('customers').all()]
     # Return customer data in JSON format
     return jsonify({'customers': customer_list})
 
 
-# Route to list all loans
+# Route to autocomplete available book names by prefix
+@loans.route('/books/search', methods=['GET'])
+def search_books_json():
+    try:
+        limit = parse_limit(default=10, maximum=50)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    names = get_index('books').search(request.args.get('q', ''), limit)
+    return jsonify({'books': [{'name': name} for name in names]})
+
+
+# Route to autocomplete customer names by prefix
+@loans.route('/customers/search', methods=['GET'])
+def search_customers_json():
+    try:
+        limit = parse_limit(default=10, maximum=50)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    names = get_index('customers').search(request.args.get('q', ''), limit)
+    return jsonify({'customers': [{'name': name} for name in names]})
+
+
+# Route to list loans, one page at a time (or all of them, streamed, with ?all=1)
 @loans.route('/', methods=['GET'])
 def list_loans():
-    # Fetch all loans from the database
-    loans = Loan.query.all()
-    # Render the loans.html template with the loans
-    print('Loans page accessed')
-    return render_template('loans.html', loans=loans, form=CreateLoan())
+    logger.info('Loans page accessed')
+    return render_list('loans.html', 'loans', Loan, {'loan_date': Loan.loan_date, 'return_date': Loan.return_date},
+                       form=CreateLoan())
 
 
 # Route to handle loan creation form
@@ -57,167 +112,221 @@ def create_loan():
         loan_date = form.loan_date.data
         return_date = form.return_date.data
 
-        # Check if the book is available
-        book = Book.query.filter_by(name=book_name, status='available').first()
-        if not book:
-            print('Error. Book not available for loan.')
-            return jsonify({'error': 'Book not available for loan.'}), 400
-
-        try:
-            # Create a new loan and store original book details
+        def checkout(session):
+            # Compare-and-set: only one concurrent request can flip the book to on_loan
+            book_id = session.execute(
+                update(Book)
+                .where(Book.name == book_name, Book.status == 'available')
+                .values(status='on_loan')
+                .returning(Book.id)
+                .execution_options(synchronize_session=False, changes_recorded=True)
+            ).scalar()
+            if book_id is None:
+                return None
+
+            record(session, 'books', 'update', book_id,
+                   {'name': book_name, 'status': 'on_loan'}, {'status': 'available'})
+
+            # Link the loan to the customer record when there is one
+            customer = session.query(Customer).filter_by(name=customer_name).first()
+
+            # Create the loan in the same transaction
             new_loan = Loan(
+                customer=customer,
+                book_id=book_id,
                 customer_name=escape(customer_name),
                 book_name=escape(book_name),
                 loan_date=loan_date,
-                return_date=return_date,
-                original_author=escape(book.author),
-                original_year_published=book.year_published,
-                original_book_type=escape(book.book_type)
+                return_date=return_date
             )
+            session.add(new_loan)
+            return book_id
 
-            # Add the new loan to the database
-            db.session.add(new_loan)
-            db.session.commit()
-            print('Loan added successfully')
-
-            # Remove the book from the database
-            db.session.delete(book)
-            db.session.commit()
+        try:
+            if write(checkout) is None:
+                if Book.query.filter_by(name=book_name).first():
+                    logger.warning('Error. Book is already on loan.')
+                    return jsonify({'error': 'Book is already on loan.'}), 409
+                logger.warning('Error. Book not available for loan.')
+                return jsonify({'error': 'Book not available for loan.'}), 400
+            logger.info('Loan added successfully')
 
             # Redirect to the list of loans
             return redirect(url_for('loans.list_loans'))
         except Exception as e:
-            db.session.rollback()
             error_message = f'Error creating loan: {str(e)}'
-            # Log the error message
-            print('Error creating loan:', error_message)
+            logger.exception('Error creating loan')
             return jsonify({'error': error_message}), 500
 
     # GET request, render the form
-    print('GET request, render the form')
+    logger.debug('GET request, render the form')
     return render_template('loans.html', form=form)
 
 
-# Route to get loan data in JSON format
+# Route to get loan data in JSON format, one keyset page at a time
 @loans.route('/json', methods=['GET'])
+@conditional('Loans')
 def list_loans_json():
-    # Fetch all loans from the database
-    loans = Loan.query.all()
+    try:
+        codec = find_codec(negotiate())
+        fields = parse_fields(Loan.__table__, LOAN_FIELDS[1:])
+        # Only the requested columns (and the cursor keys) are read, as plain rows
+        statement = select_fields(Loan.__table__, fields, Loan.id, Loan.loan_date, Loan.return_date)
+        page = paginate(statement, Loan.id, {'loan_date': Loan.loan_date, 'return_date': Loan.return_date})
+    except (FieldsError, PaginationError) as e:
+        return jsonify({'error': str(e)}), 400
+    except NegotiationError as e:
+        return jsonify({'error': str(e)}), 406
+    if codec:
+        # MessagePack / CBOR rows are packed straight from the row tuples
+        return page_response(codec, 'loans', page, fields)
     # Create a list of loan details
-    loan_list = [{'customer_name': loan.customer_name, 'book_name': loan.book_name,
-                  'loan_date': loan.loan_date, 'return_date': loan.return_date} for loan in loans]
+    loan_list = rows_data(page.items, fields)
     # Return loan data in JSON format
-    return jsonify(loans=loan_list)
+    return jsonify(loans=loan_list, next_cursor=page.next_cursor, prev_cursor=page.prev_cursor)
+
+
+# Route to fetch everything the loans page shows, one keyset page of loans with their book and customer
+@loans.route('/page-data', methods=['GET'])
+@conditional('Loans', 'books', 'customers')
+def get_page_data():
+    # The book and customer come from the same query through LEFT OUTER JOINs
+    query = Loan.query.options(joinedload(Loan.book), joinedload(Loan.customer))
+    try:
+        page = paginate(query, Loan.id, {'loan_date': Loan.loan_date, 'return_date': Loan.return_date})
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    loan_list = [_loan_data(loan, EXPANSIONS) for loan in page.items]
+    return jsonify(loans=loan_list, next_cursor=page.next_cursor, prev_cursor=page.prev_cursor)
+
+
+# Route to stream every loan as NDJSON or CSV
+@loans.route('/export', methods=['GET'])
+def export_loans():
+    return export_table('loans', [Loan.id, Loan.customer_name, Loan.book_name, Loan.loan_date, Loan.return_date])
 
 
 # Route to get customer data by name in JSON format
 @loans.route('/customers/details/<string:customer_name>', methods=['GET'])
 def get_customer_details(customer_name):
+    try:
+        fields = parse_fields(Customer.__table__, CUSTOMER_FIELDS)
+    except FieldsError as e:
+        return jsonify({'error': str(e)}), 400
     # Find the customer by their name
-    customer = Customer.query.filter_by(name=customer_name).first()
+    customer = get_cache().get_by_name(Customer, customer_name)
 
     if customer:
-        # Create a dictionary with customer details
-        customer_data = {
-            'id': customer.id,
-            'name': customer.name,
-            'city': customer.city,
-            'age': customer.age
-        }
-        # Return customer data in JSON format
-        return jsonify(customer=customer_data)
+        # Return the customer data in JSON format
+        return jsonify(customer=row_data(customer, fields))
     else:
-        print('Customer not found')
+        logger.info('Customer not found')
         return jsonify({'error': 'Customer not found'}), 404
 
 
+# Route to get the details of many customers at once: ?names=a&names=b or POST {"names": [...]}
+@loans.route('/customers/details', methods=['GET', 'POST'])
+def get_customers_details():
+    try:
+        names = request_names()
+        fields = parse_fields(Customer.__table__, CUSTOMER_FIELDS)
+    except (BulkError, FieldsError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    found = get_cache().get_many_by_name(Customer, names)
+    customer_data = {name: row_data(customer, fields) for name, customer in found.items()}
+    return jsonify(customers=customer_data, missing=[name for name in names if name not in found])
+
+
 # Route to delete a loan
 @loans.route('/<int:loan_id>/delete', methods=['POST'])
 def delete_loan(loan_id):
-    loan = Loan.query.get(loan_id)
-    if not loan:
-        print('Loan not found')
-        return jsonify({'error': 'Loan not found'}), 404
+    def return_book(session):
+        loan = session.get(Loan, loan_id)
+        if not loan:
+            return False
+
+        # Return the book and end the loan in one transaction
+        book_name = session.execute(
+            update(Book)
+            .where(Book.id == loan.book_id, Book.status == 'on_loan')
+            .values(status='available')
+            .returning(Book.name)
+            .execution_options(synchronize_session=False, changes_recorded=True)
+        ).scalar()
+        if book_name is not None:
+            record(session, 'books', 'update', loan.book_id,
+                   {'name': book_name, 'status': 'available'}, {'status': 'on_loan'})
+        session.delete(loan)
+        return True
 
     try:
-        # Retrieve the book associated with the loan
-        book = Book(
-            name=escape(loan.book_name),
-            author=escape(loan.original_author),
-            year_published=loan.original_year_published,
-            book_type=escape(loan.original_book_type),
-            status='available'  
-        )
-
-        # Add the book to the database
-        db.session.add(book)
-
-        # Delete the loan from the database
-        db.session.delete(loan)
-        db.session.commit()
-        print('Loan deleted successfully')
+        if not write(return_book):
+            logger.info('Loan not found')
+            return jsonify({'error': 'Loan not found'}), 404
+        logger.info('Loan deleted successfully')
         # Redirect to the list of loans
         return redirect(url_for('loans.list_loans'))
     except Exception as e:
-        db.session.rollback()
         error_message = f'Error deleting loan: {str(e)}'
-        print('Error deleting loan:', error_message)  # Log the error message
+        logger.exception('Error deleting loan')
         return jsonify({'error': error_message}), 500
 
 
-# Route to fetch loan details by ID
+# Route to fetch loan details by ID, with its book and customer when asked for with ?expand=book,customer
 @loans.route('/<int:loan_id>/details', methods=['GET'])
 def get_loan_details(loan_id):
+    try:
+        expand = _parse_expand()
+        fields = parse_fields(Loan.__table__, LOAN_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if expand:
+        # One joined query for the loan and the expanded rows
+        loan = (Loan.query.options(*[joinedload(EXPANSIONS[name]) for name in sorted(expand)])
+                .filter(Loan.id == loan_id).first())
+        if not loan:
+            logger.info('Loan not found')
+            return jsonify({'error': 'Loan not found'}), 404
+        return jsonify(loan=_loan_data(loan, expand, fields))
+
     # Find the loan by ID
-    loan = Loan.query.get(loan_id)
+    loan = get_cache().get_by_id(Loan, loan_id)
 
     if loan:
-        # Create a dictionary with loan details
-        loan_data = {
-            'id': loan.id,
-            'customer_name': loan.customer_name,
-            'book_name': loan.book_name,
-            'loan_date': loan.loan_date,
-            'return_date': loan.return_date
-        }
         # Return loan data in JSON format
-        return jsonify(loan=loan_data)
+        return jsonify(loan=row_data(loan, fields))
     else:
-        print('Loan not found')
+        logger.info('Loan not found')
         return jsonify({'error': 'Loan not found'}), 404
 
 
 # Route to get book details by name in JSON format
 @loans.route('/books/details/<string:book_name>', methods=['GET'])
 def get_book_details(book_name):
-    # Check if the book is in the "loans" database
-    loaned_book = Loan.query.filter_by(book_name=book_name).first()
-
-    if loaned_book:
-        # Book is in "loans" database, return its details
-        book_data = {
-            'id': loaned_book.id,
-            'name': loaned_book.book_name,
-            'author': loaned_book.original_author,
-            'year_published': loaned_book.original_year_published,
-            'book_type': loaned_book.original_book_type
-        }
-        return jsonify(book=book_data)
+    try:
+        fields = parse_fields(Book.__table__, BOOK_FIELDS)
+    except FieldsError as e:
+        return jsonify({'error': str(e)}), 400
+    # Loaned books keep their row, so a single lookup on the unique name is enough
+    book = get_cache().get_by_name(Book, book_name)
+
+    if book:
+        return jsonify(book=row_data(book, fields))
     else:
-        # Book not found in "loans" database, proceed to check "books" database
-        book = Book.query.filter_by(name=book_name).first()
-
-        if book:
-            # Book found in "books" database, return its details
-            book_data = {
-                'id': book.id,
-                'name': book.name,
-                'author': book.author,
-                'year_published': book.year_published,
-                'book_type': book.book_type
-            }
-            return jsonify(book=book_data)
-        else:
-            # Book not found in both "loans" and "books" databases
-            print('Book not found')
-            return jsonify({'error': 'Book not found'}), 404
+        logger.info('Book not found')
+        return jsonify({'error': 'Book not found'}), 404
+
+
+# Route to get the details of many books at once: ?names=a&names=b or POST {"names": [...]}
+@loans.route('/books/details', methods=['GET', 'POST'])
+def get_books_details():
+    try:
+        names = request_names()
+        fields = parse_fields(Book.__table__, BOOK_FIELDS)
+    except (BulkError, FieldsError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    found = get_cache().get_many_by_name(Book, names)
+    book_data = {name: row_data(book, fields) for name, book in found.items()}
+    return jsonify(books=book_data, missing=[name for name in names if name not in found])
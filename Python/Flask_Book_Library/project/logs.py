@@ -0,0 +1,170 @@
+"""
+Structured, non-blocking logging.
+
+Records from the ``project`` loggers are put on a bounded queue and a
+background listener thread writes them to stdout as one JSON object per
+line. The logging thread only renders the message and enqueues it: if the
+queue is full the record is dropped and counted rather than waiting on the
+output.
+
+Records logged while serving a request carry its ``request_id`` (taken from
+an incoming ``X-Request-ID`` header or generated, and echoed back), the
+``endpoint`` and the ``latency_ms`` so far. Every request also ends with a
+``Request completed`` record from ``project.access``.
+
+High-volume messages can be sampled with ``LOG_SAMPLE_RATES``, a mapping of
+message to the fraction of records kept.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+
+DEFAULT_QUEUE_SIZE = 10000
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+access_logger = logging.getLogger('project.access')
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as one line of JSON."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach request id, endpoint and elapsed time, in the thread that logs."""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.endpoint = request.endpoint
+            started = g.get('request_started')
+            if started is not None and not hasattr(record, 'latency_ms'):
+                record.latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of the records of selected messages."""
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+
+    def filter(self, record):
+        rate = self.rates.get(record.msg)
+        return rate is None or random.random() < rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """A queue handler that never waits: records that do not fit are dropped."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Render the message now; formatting to JSON happens on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler = None
+_listener = None
+_sampling = SamplingFilter()
+
+
+def configure(level='INFO', sample_rates=None, queue_size=DEFAULT_QUEUE_SIZE, stream=None):
+    """Route the ``project`` loggers through the queue; later calls only update level and sampling."""
+    global _handler, _listener
+    logger = logging.getLogger('project')
+    logger.setLevel(level)
+    _sampling.rates = dict(sample_rates or {})
+    if _handler is not None:
+        return _handler
+
+    log_queue = queue.Queue(queue_size)
+    _handler = DroppingQueueHandler(log_queue)
+    _handler.addFilter(_sampling)
+    _handler.addFilter(RequestContextFilter())
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger.addHandler(_handler)
+    # The JSON lines are the output; do not repeat them through the root logger
+    logger.propagate = False
+    return _handler
+
+
+def dropped():
+    """Number of records dropped because the queue was full."""
+    return _handler.dropped if _handler is not None else 0
+
+
+def init_app(app):
+    configure(
+        level=app.config.get('LOG_LEVEL', 'INFO'),
+        sample_rates=app.config.get('LOG_SAMPLE_RATES'),
+        queue_size=app.config.get('LOG_QUEUE_SIZE', DEFAULT_QUEUE_SIZE),
+    )
+    app.before_request(_start)
+    app.after_request(_finish)
+
+
+def _start():
+    g.request_started = time.perf_counter()
+    # A caller-supplied id ties our records to theirs; cap its length
+    g.request_id = request.headers.get('X-Request-ID', '')[:128] or uuid.uuid4().hex
+
+
+def _finish(response):
+    response.headers.setdefault('X-Request-ID', g.get('request_id', ''))
+    access_logger.info('Request completed', extra={
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+    })
+    return response
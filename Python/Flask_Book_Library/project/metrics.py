@@ -0,0 +1,231 @@
+"""
+Request metrics in the Prometheus text format.
+
+Every request is counted per endpoint, method and status, its latency and
+response size go into histograms, and an in-flight gauge tracks the
+requests being served. ``/metrics`` renders everything, plus the entity
+cache and write queue counters.
+
+Recording takes no lock: each thread updates its own shard and only the
+scrape adds the shards up. Shards of finished threads are folded into one
+retired shard when a new thread registers, so short-lived threads do not
+pile up.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+from flask import current_app, g, request
+
+from project import logs
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Shard:
+    """Metric values written by one thread."""
+
+    __slots__ = ('owner', 'values', 'histograms')
+
+    def __init__(self, owner):
+        self.owner = owner
+        # (name, labels) -> number, for counters and gauges
+        self.values = {}
+        # (name, labels) -> [bucket counts..., sum, count]
+        self.histograms = {}
+
+    def merge(self, other):
+        for key, value in list(other.values.items()):
+            self.values[key] = self.values.get(key, 0) + value
+        for key, series in list(other.histograms.items()):
+            mine = self.histograms.setdefault(key, [0] * len(series))
+            for i, value in enumerate(series):
+                mine[i] += value
+
+
+class Registry:
+    """Counters, gauges and histograms aggregated from per-thread shards."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard(None)
+        self._lock = threading.Lock()
+
+    def counter(self, name, help):
+        self._metrics[name] = ('counter', help, None)
+
+    def gauge(self, name, help):
+        self._metrics[name] = ('gauge', help, None)
+
+    def histogram(self, name, help, buckets):
+        self._metrics[name] = ('histogram', help, tuple(buckets))
+
+    def collector(self, callback):
+        """Register ``callback()`` returning ``[(name, type, help, [(labels, value), ...])]`` at scrape time."""
+        self._collectors.append(callback)
+        return callback
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            pass
+        shard = _Shard(threading.current_thread())
+        with self._lock:
+            for old in [old for old in self._shards if not old.owner.is_alive()]:
+                self._retired.merge(old)
+                self._shards.remove(old)
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    def inc(self, name, labels=(), value=1):
+        values = self._shard().values
+        key = (name, labels)
+        values[key] = values.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        series = histograms.get(key)
+        if series is None:
+            buckets = self._metrics[name][2]
+            series = histograms[key] = [0] * (len(buckets) + 3)
+        # Counts per bucket (the last one is +Inf), then sum and count
+        series[bisect_left(self._metrics[name][2], value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def snapshot(self):
+        total = _Shard(None)
+        with self._lock:
+            total.merge(self._retired)
+            for shard in self._shards:
+                total.merge(shard)
+        return total
+
+    def render(self):
+        total = self.snapshot()
+        lines = []
+        for name, (kind, help, buckets) in self._metrics.items():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'histogram':
+                for (metric, labels), series in sorted(total.histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets + ('+Inf',), series):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_labels(labels + (("le", bound),))} {cumulative}')
+                    lines.append(f'{name}_sum{_labels(labels)} {series[-2]}')
+                    lines.append(f'{name}_count{_labels(labels)} {series[-1]}')
+            else:
+                for (metric, labels), value in sorted(total.values.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_labels(labels)} {value}')
+
+        for callback in self._collectors:
+            for name, kind, help, samples in callback():
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def create_registry():
+    """Return a registry declaring the request metrics and the extension collectors."""
+    registry = Registry()
+    registry.counter('http_requests_total', 'HTTP requests by endpoint, method and status.')
+    registry.gauge('http_requests_in_flight', 'HTTP requests currently being served.')
+    registry.histogram('http_request_duration_seconds', 'HTTP request latency.', LATENCY_BUCKETS)
+    registry.histogram('http_response_size_bytes', 'HTTP response body size, when known.', SIZE_BUCKETS)
+    registry.collector(_cache_samples)
+    registry.collector(_write_queue_samples)
+    registry.collector(_log_samples)
+    return registry
+
+
+def init_app(app):
+    app.extensions['metrics'] = create_registry()
+
+    app.before_request(_start)
+    app.after_request(_record_response)
+    app.teardown_request(_finish)
+
+
+def get_registry():
+    return current_app.extensions['metrics']
+
+
+def _endpoint():
+    # Unmatched URLs share one label so that scanners cannot blow up the series count
+    return request.endpoint or 'unmatched'
+
+
+def _start():
+    g.metrics_started = time.perf_counter()
+    get_registry().inc('http_requests_in_flight', (('endpoint', _endpoint()),))
+
+
+def _record_response(response):
+    g.metrics_status = response.status_code
+    if response.content_length is not None:
+        get_registry().observe('http_response_size_bytes', (('endpoint', _endpoint()),), response.content_length)
+    return response
+
+
+def _finish(exc):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    registry = get_registry()
+    endpoint = (('endpoint', _endpoint()),)
+    status = g.pop('metrics_status', 500)
+    registry.inc('http_requests_in_flight', endpoint, -1)
+    registry.inc('http_requests_total', endpoint + (('method', request.method), ('status', str(status))))
+    registry.observe('http_request_duration_seconds', endpoint, time.perf_counter() - started)
+
+
+def _cache_samples():
+    cache = current_app.extensions.get('entity_cache')
+    if cache is None:
+        return []
+    stats = cache.stats()
+    return [
+        (f'entity_cache_{name}_total', 'counter', f'Entity cache {name}.', [((), stats[name])])
+        for name in ('hits', 'misses', 'evictions', 'expirations', 'stale')
+    ] + [('entity_cache_size', 'gauge', 'Rows held in the entity cache.', [((), stats['size'])])]
+
+
+def _write_queue_samples():
+    write_queue = current_app.extensions.get('write_queue')
+    if write_queue is None:
+        return []
+    return [
+        ('write_queue_commits_total', 'counter', 'Group commits made by the writer thread.', [((), write_queue.batches)]),
+        ('write_queue_jobs_total', 'counter', 'Writes committed by the writer thread.', [((), write_queue.jobs)]),
+    ]
+
+
+def _log_samples():
+    return [('log_records_dropped_total', 'counter', 'Log records dropped because the log queue was full.',
+             [((), logs.dropped())])]
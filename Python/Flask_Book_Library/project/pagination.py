@@ -0,0 +1,141 @@
+"""
+Keyset (cursor) pagination for the JSON list endpoints.
+
+Pages are addressed by the sort key of the last (or first) row the client
+has seen instead of an OFFSET, so fetching page 1000 costs the same index
+seek as fetching page 1.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import DateTime, Select, tuple_
+
+from project import db
+
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class PaginationError(ValueError):
+    """Raised when the limit, sort or cursor parameters are invalid."""
+
+
+class Page:
+    """One page of results plus the cursors needed to move around."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def encode_cursor(sort, values):
+    # Cursors are opaque to clients: base64 of the sort name and key values
+    payload = {'s': sort, 'k': [v.isoformat() if isinstance(v, datetime) else v for v in values]}
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor, sort, columns):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = payload['k']
+        cursor_sort = payload['s']
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise PaginationError('Invalid cursor')
+
+    if cursor_sort != sort or not isinstance(values, list) or len(values) != len(columns):
+        raise PaginationError('Cursor does not match the requested sort order')
+
+    decoded = []
+    for column, value in zip(columns, values):
+        if value is not None and isinstance(column.type, DateTime):
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise PaginationError('Invalid cursor')
+        decoded.append(value)
+    return decoded
+
+
+def parse_limit(default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    raw = request.args.get('limit')
+    if raw is None:
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be at least 1')
+    return min(limit, maximum)
+
+
+def paginate(query, primary_key, sort_columns):
+    """
+    Apply keyset pagination from the request arguments to ``query``.
+
+    ``sort_columns`` maps the public sort names accepted in ``?sort=`` to
+    columns; prefix a name with ``-`` to sort descending. The primary key is
+    always appended as a tie-breaker so the sort key is unique.
+
+    ``query`` is an ORM query or a Core ``select()``; a select must include
+    the primary key and the sort columns, and its page holds plain rows.
+    """
+    limit = parse_limit()
+    after = request.args.get('after')
+    before = request.args.get('before')
+    if after and before:
+        raise PaginationError('Use either after or before, not both')
+
+    sort = request.args.get('sort', 'id')
+    descending = sort.startswith('-')
+    sort_name = sort.lstrip('-')
+    if sort_name == 'id':
+        columns = [primary_key]
+    elif sort_name in sort_columns:
+        columns = [sort_columns[sort_name], primary_key]
+    else:
+        allowed = ', '.join(['id'] + sorted(sort_columns))
+        raise PaginationError(f'Invalid sort. Allowed values: {allowed}')
+
+    key = tuple_(*columns) if len(columns) > 1 else columns[0]
+    backwards = bool(before)
+    # Walking backwards is the same scan in the opposite direction
+    reverse = descending != backwards
+
+    cursor = after or before
+    if cursor:
+        values = decode_cursor(cursor, sort, columns)
+        bound = tuple_(*values) if len(values) > 1 else values[0]
+        query = query.filter(key < bound if reverse else key > bound)
+
+    query = query.order_by(*[column.desc() if reverse else column.asc() for column in columns])
+    if isinstance(query, Select):
+        items = db.session.execute(query.limit(limit + 1)).all()
+    else:
+        items = query.limit(limit + 1).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+    if backwards:
+        items.reverse()
+
+    def cursor_for(item):
+        return encode_cursor(sort, [getattr(item, column.key) for column in columns])
+
+    next_cursor = prev_cursor = None
+    if items:
+        if backwards:
+            next_cursor = cursor_for(items[-1])
+            prev_cursor = cursor_for(items[0]) if has_more else None
+        else:
+            next_cursor = cursor_for(items[-1]) if has_more else None
+            prev_cursor = cursor_for(items[0]) if after else None
+
+    return Page(items, next_cursor, prev_cursor)
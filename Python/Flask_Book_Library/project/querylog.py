@@ -0,0 +1,139 @@
+"""
+Per-request SQL accounting, slow-query log and N+1 detection.
+
+Cursor events on the app's engine count and time every statement. Inside a
+request the totals are kept on ``g``, reported in a ``Server-Timing``
+header (``db;dur=<ms>;desc="<n> queries"``) and added to the ``sql_*``
+metrics of the endpoint.
+
+Statements slower than ``SQL_SLOW_QUERY_MS`` are logged to the
+``project.sql`` logger with the shape of their parameters (types and
+batch size, never the values). A statement run with
+``SQL_N_PLUS_ONE_THRESHOLD`` or more different parameter sets in one
+request is reported as a likely N+1 query.
+"""
+
+import logging
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+from project import db
+
+
+DEFAULT_SLOW_QUERY_MS = 100
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+
+logger = logging.getLogger('project.sql')
+
+
+class RequestQueries:
+    """Statements run while serving one request."""
+
+    __slots__ = ('count', 'duration', 'parameters', 'repeated')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # statement -> distinct parameter sets seen, up to the N+1 threshold
+        self.parameters = {}
+        # statements that reached the threshold
+        self.repeated = []
+
+
+def parameter_shape(parameters):
+    """Describe bound parameters by type, e.g. ``(str, int)`` or ``500 x (str, int)``."""
+    if isinstance(parameters, list):
+        if not parameters:
+            return '[]'
+        return f'{len(parameters)} x {parameter_shape(parameters[0])}'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{key}: {type(value).__name__}' for key, value in parameters.items()) + '}'
+    if isinstance(parameters, tuple):
+        return '(' + ', '.join(type(value).__name__ for value in parameters) + ')'
+    return type(parameters).__name__
+
+
+def init_app(app):
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+    registry = app.extensions.get('metrics')
+    if registry is not None:
+        registry.counter('sql_queries_total', 'SQL statements run per endpoint.')
+        registry.counter('sql_query_seconds_total', 'Time spent in SQL statements per endpoint.')
+        registry.counter('sql_n_plus_one_total', 'Statements repeated with different parameters in one request.')
+
+    app.before_request(_start)
+    app.after_request(_report)
+
+
+def _start():
+    g.queries = RequestQueries()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute never runs for a statement that raised; drop its start time here
+    connection = exception_context.connection
+    if connection is not None and exception_context.execution_context is not None:
+        started = connection.info.get('query_started')
+        if started:
+            started.pop()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    if not has_app_context():
+        return
+    in_request = has_request_context()
+    # Statements from the writer thread or the CLI have no request to charge
+    queries = g.get('queries') if in_request else None
+    config = current_app.config
+
+    if elapsed * 1000 >= config.get('SQL_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS):
+        logger.warning('Slow query (%.1f ms) in %s: %s | parameters: %s', elapsed * 1000,
+                       request.endpoint if in_request else '-', ' '.join(statement.split()), parameter_shape(parameters))
+
+    if queries is None:
+        return
+    queries.count += 1
+    queries.duration += elapsed
+
+    threshold = config.get('SQL_N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+    seen = queries.parameters.setdefault(statement, set())
+    if len(seen) < threshold:
+        seen.add(repr(parameters))
+        if len(seen) == threshold:
+            queries.repeated.append(statement)
+
+
+def _report(response):
+    queries = g.pop('queries', None)
+    if queries is None:
+        return response
+
+    endpoint = request.endpoint or 'unmatched'
+    for statement in queries.repeated:
+        logger.warning('Possible N+1 query in %s: ran with %d+ different parameters: %s', endpoint,
+                       current_app.config.get('SQL_N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD),
+                       ' '.join(statement.split()))
+
+    registry = current_app.extensions.get('metrics')
+    if registry is not None and queries.count:
+        labels = (('endpoint', endpoint),)
+        registry.inc('sql_queries_total', labels, queries.count)
+        registry.inc('sql_query_seconds_total', labels, queries.duration)
+        if queries.repeated:
+            registry.inc('sql_n_plus_one_total', labels, len(queries.repeated))
+
+    if current_app.config.get('SQL_SERVER_TIMING', True):
+        response.headers.add('Server-Timing', f'db;dur={queries.duration * 1000:.2f};desc="{queries.count} queries"')
+    return response
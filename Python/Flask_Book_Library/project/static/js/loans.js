@@ -13,52 +13,103 @@ const filterLoans = (searchTerm) => {
 };
 
 
-// Function to fetch and log book data
-const fetchBooks = () => {
-    return axios.get('/loans/books/json')
+// Function to fetch available book names starting with a prefix
+const searchBooks = (prefix) => {
+    return axios.get('/loans/books/search', { params: { q: prefix, limit: 10 } })
         .then(response => {
-            console.log('Books API response:', response.data.books);
-            return response.data.books;  // Return books for further processing
+            return response.data.books;
         })
         .catch(error => {
-            console.error('Error fetching books:', error);
+            console.error('Error searching books:', error);
+            return [];
         });
 };
 
 
-// Function to fetch and log customer data
-const fetchCustomers = () => {
-    return axios.get('/loans/customers/json')
+// Function to fetch customer names starting with a prefix
+const searchCustomers = (prefix) => {
+    return axios.get('/loans/customers/search', { params: { q: prefix, limit: 10 } })
         .then(response => {
-            console.log('Customers API response:', response.data.customers);
             return response.data.customers;
         })
         .catch(error => {
-            console.error('Error fetching customers:', error);
+            console.error('Error searching customers:', error);
+            return [];
         });
 };
 
 
-// Function to fetch customer details based on customer name
-const fetchCustomerDetails = (customerName) => {
-    return axios.get(`/loans/customers/details/${customerName}`)
+// Function to fetch one page of loans with their books and customers in a single request
+const fetchPageData = (params = {}) => {
+    return axios.get('/loans/page-data', { params: params })
         .then(response => {
-            return response.data.customer;
+            return response.data;
         })
         .catch(error => {
-            console.error('Error fetching customer details:', error);
+            console.error('Error fetching loans page data:', error);
+            throw error;
         });
 };
 
 
-// Function to fetch book details based on book name
-const fetchBookDetails = (bookName) => {
-    return axios.get(`/loans/books/details/${bookName}`)
-        .then(response => {
-            return response.data.book;
+// Names are stored HTML-escaped; decode them so they show as the server-rendered rows do
+const decodeHtml = (html) => {
+    return new DOMParser().parseFromString(html, 'text/html').documentElement.textContent;
+};
+
+
+// Function to build one row of the loans table, matching _loan_row.html
+const buildLoanRow = (loan) => {
+    const row = document.createElement('tr');
+    const cells = [
+        decodeHtml(loan.customer_name),
+        decodeHtml(loan.book_name),
+        loan.loan_date.replace('T', ' '),
+        loan.return_date.replace('T', ' '),
+    ];
+    cells.forEach(text => {
+        const cell = document.createElement('td');
+        cell.textContent = text;
+        row.appendChild(cell);
+    });
+
+    const actions = document.createElement('td');
+    const button = document.createElement('button');
+    button.className = 'btn btn-danger btn-sm delete-button';
+    button.dataset.loanId = loan.id;
+    button.textContent = 'End Loan';
+    actions.appendChild(button);
+    row.appendChild(actions);
+    return row;
+};
+
+
+// Function to redraw the current page of the loans table from /loans/page-data
+const refreshLoans = () => {
+    const pageParams = new URLSearchParams(window.location.search);
+    // The streamed "show all" view has no page to fetch
+    if (pageParams.get('all') === '1') {
+        window.location.reload();
+        return Promise.resolve();
+    }
+
+    const params = {};
+    ['limit', 'after', 'before', 'sort'].forEach(name => {
+        if (pageParams.has(name)) {
+            params[name] = pageParams.get(name);
+        }
+    });
+    return fetchPageData(params)
+        .then(data => {
+            const tableBody = document.getElementById('loansTableBody');
+            tableBody.replaceChildren(...data.loans.map(buildLoanRow));
+            const searchInput = document.getElementById('searchInput');
+            if (searchInput && searchInput.value) {
+                filterLoans(searchInput.value.toLowerCase());
+            }
         })
-        .catch(error => {
-            console.error('Error fetching book details:', error);
+        .catch(() => {
+            window.location.reload();
         });
 };
 
@@ -81,27 +132,43 @@ const populateDropdown = (elementId, data) => {
 };
 
 
+// Function to fill a datalist with suggestions while the user types
+const setupTypeahead = (inputId, search) => {
+    const input = document.getElementById(inputId);
+    if (!input) {
+        return;
+    }
+
+    let timer = null;
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        // Wait for a short pause in typing before asking the server
+        timer = setTimeout(() => {
+            const prefix = input.value;
+            search(prefix).then(items => {
+                // Ignore answers for a prefix the user has already changed
+                if (input.value === prefix) {
+                    populateDropdown(`${inputId}_options`, items);
+                }
+            });
+        }, 150);
+    });
+};
+
+
 // Function to handle loan submission
 const handleLoanSubmission = (event) => {
-    const loanDate = new Date(document.getElementById('loan_date').value);
-    const returnDate = new Date(document.getElementById('return_date').value);
-
-    const formData = {
-        customer_name: document.getElementById('customer_name').value,
-        book_name: document.getElementById('book_name').value,
-        loan_date: loanDate.toISOString(),
-        return_date: returnDate.toISOString(),
-        csrf_token: document.getElementById('csrf_token').value
-    };
-
-    fetchCustomerDetails(formData.customer_name)
-        .then(customerDetails => {
-            formData.customer_details = customerDetails;
-            // Use axios to make an AJAX POST request
-            return axios.post('/loans/create', formData);
-        })
-        .then(response => {
+    // Send the form without leaving the page, then redraw the table
+    event.preventDefault();
+    const form = event.target;
+
+    // The form's own fields: names, YYYY-MM-DD dates and the CSRF token, as a normal submit sends them
+    axios.post('/loans/create', new FormData(form))
+        .then(() => {
             console.log('Loan added successfully!');
+            $('#addLoanModal').modal('hide');
+            form.reset();
+            return refreshLoans();
         })
         .catch(error => {
             console.error('Error adding loan:', error.response ? error.response.data : error.message);
@@ -110,47 +177,13 @@ const handleLoanSubmission = (event) => {
 };
 
 
-// Function to fetch loan details based on loan ID
-const fetchLoanDetails = (loanId) => {
-    return axios.get(`/loans/${loanId}/details`)
-        .then(response => {
-            const loanDetails = response.data.loan;
-
-            // Fetch book details based on book name
-            return fetchBookDetails(loanDetails.book_name)
-                .then(bookDetails => {
-                    loanDetails.book_details = bookDetails;
-                    return loanDetails;
-                });
-        })
-        .catch(error => {
-            console.error('Error fetching loan details:', error);
-            throw error; 
-        });
-};
-
-
 // Function to handle deleting a loan
 const deleteLoan = (loanId) => {
-    fetchLoanDetails(loanId)
-        .then(loanDetails => {
-            const bookDetails = {
-                name: loanDetails.book_name,
-                author: loanDetails.original_author,
-                year_published: loanDetails.original_year_published,
-                book_type: loanDetails.original_book_type
-            };
-
-            // Delete the loan and return the book to the books database
-            return axios.post(`/loans/${loanId}/delete`, bookDetails);
-        })
+    // End the loan; the server makes the book available again
+    axios.post(`/loans/${loanId}/delete`)
         .then(() => {
             alert('Loan deleted successfully.');
-            const deletedLoanRow = document.getElementById(`loan-${loanId}`);
-            if (deletedLoanRow) {
-                deletedLoanRow.remove();
-            }
-            window.location.reload();
+            refreshLoans();
         })
         .catch(error => {
             console.error('Error deleting loan:', error);
@@ -161,9 +194,9 @@ const deleteLoan = (loanId) => {
 
 // Function to ensure DOM is fully loaded
 const setupEventListeners = () => {
-    const addLoanButton = document.getElementById('addLoanButton');
-    if (addLoanButton) {
-        addLoanButton.addEventListener('click', handleLoanSubmission);
+    const addLoanForm = document.getElementById('addLoanForm');
+    if (addLoanForm) {
+        addLoanForm.addEventListener('submit', handleLoanSubmission);
     }
 
     const searchInput = document.getElementById('searchInput');
@@ -174,29 +207,23 @@ const setupEventListeners = () => {
         });
     }
 
-    const deleteButtons = document.querySelectorAll('.delete-button');
-    deleteButtons.forEach(button => {
-        button.addEventListener('click', () => {
+    // One listener on the table body also covers rows redrawn by refreshLoans
+    const tableBody = document.getElementById('loansTableBody');
+    if (tableBody) {
+        tableBody.addEventListener('click', (event) => {
+            const button = event.target.closest('.delete-button');
+            if (!button) {
+                return;
+            }
             const loanId = button.dataset.loanId;
             console.log('Delete button clicked for loan ID:', loanId);
             deleteLoan(loanId);
         });
-    });
+    }
 };
 
 
-// Fetch books and populate the book dropdown
-fetchBooks()
-    .then(function (books) {
-        populateDropdown('book_name', books);
-    })
-    .then(function () {
-        return fetchCustomers();  // Fetch customers after books
-    })
-    .then(function (customers) {
-        populateDropdown('customer_name', customers);
-    })
-    .then(function () {
-        // Setup event listeners after fetching data
-        setupEventListeners();
-    });
+// Suggestions are fetched on demand, so the page needs no name lists up front
+setupTypeahead('book_name', searchBooks);
+setupTypeahead('customer_name', searchCustomers);
+setupEventListeners();
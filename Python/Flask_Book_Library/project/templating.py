@@ -0,0 +1,83 @@
+"""
+Template compilation cache and cached table-row fragments.
+
+With ``JINJA_BYTECODE_CACHE`` on, compiled templates are kept on disk
+(``JINJA_BYTECODE_CACHE_DIR``, or a private per-user directory in the
+system temp dir), so a new worker loads them instead of compiling them
+again. Production also turns ``TEMPLATES_AUTO_RELOAD`` off, which saves a
+stat call per template per render.
+
+The list pages render every table row through ``row_fragment(template,
+table, row)``, which caches the rendered ``<tr>`` under a hash of the
+template name and the row's column values, exactly as the page read them.
+An edited row hashes differently and is rendered again, while every other
+row comes from the cache; the old fragment simply ages out of the LRU.
+Because the key is built from the data itself, a change made by another
+worker, ``flask import-customers`` or any other SQLite client can never
+be served from a stale fragment, and nothing has to be tracked per row.
+"""
+
+import hashlib
+
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from sqlalchemy import inspect
+
+from project.cache import LRUCache
+
+
+DEFAULT_SIZE = 20000
+DEFAULT_TTL = 3600
+
+
+def row_values(row):
+    """The column values of an ORM object or a plain result row, in column order."""
+    if hasattr(row, '_mapping'):
+        return tuple(row)
+    return tuple(getattr(row, prop.key) for prop in inspect(row).mapper.column_attrs)
+
+
+class FragmentCache:
+    """Rendered row fragments keyed by table, template and a hash of the row's values."""
+
+    def __init__(self, fragments):
+        self.fragments = fragments
+
+    def key(self, template_name, table, row):
+        digest = hashlib.blake2b(repr(row_values(row)).encode('utf-8'), digest_size=16).hexdigest()
+        return f'{table}:{template_name}:{digest}'
+
+    def render(self, template_name, table, row):
+        key = self.key(template_name, table, row)
+        html = self.fragments.get(key)
+        if html is not None:
+            return html
+
+        html = Markup(current_app.jinja_env.get_template(template_name).render(row=row))
+        self.fragments.set(key, html)
+        return html
+
+    def stats(self):
+        return self.fragments.stats()
+
+
+def init_app(app):
+    if app.config.get('JINJA_BYTECODE_CACHE'):
+        # Without a directory Jinja uses a private per-user directory in the temp dir
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config.get('JINJA_BYTECODE_CACHE_DIR'))
+
+    app.extensions['fragment_cache'] = FragmentCache(LRUCache(
+        max_size=app.config.get('FRAGMENT_CACHE_SIZE', DEFAULT_SIZE),
+        ttl=app.config.get('FRAGMENT_CACHE_TTL', DEFAULT_TTL),
+    ))
+    app.add_template_global(row_fragment)
+
+
+def get_fragments():
+    return current_app.extensions['fragment_cache']
+
+
+def row_fragment(template_name, table, row):
+    """Render ``template_name`` for one row (available as ``row``), from the cache when possible."""
+    return get_fragments().render(template_name, table, row)
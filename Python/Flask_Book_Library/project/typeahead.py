@@ -0,0 +1,186 @@
+"""
+In-memory prefix index of book and customer names for the loan form.
+
+Each index is a sorted list of ``(casefolded name, name)`` pairs, so a
+prefix lookup is one binary search plus a short scan. The served app builds
+the indexes at startup (see ``app.py``); :func:`create_app` itself never
+touches the database, so an app without a schema yet loads them on first use.
+
+Commits made in this process update the index in place (see
+:mod:`project.changes`). Writes from other workers, ``flask
+import-customers`` or any other SQLite client are caught by comparing the
+table's version in ``table_versions`` (see :mod:`project.versioning`) before
+every search, the same one-row primary-key read conditional GET does; when
+it moved by more than this process's own changes the index is reloaded. A
+table-wide change, such as a bulk upsert, also marks the index for a reload.
+"""
+
+import threading
+from bisect import bisect_left
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from project import db
+from project.changes import subscribe
+
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+class NameIndex:
+    """A sorted, case-insensitive set of names supporting prefix search."""
+
+    def __init__(self, loader, table=None):
+        # loader() returns every name that belongs in the index
+        self._loader = loader
+        # The table whose version in table_versions tells when to reload
+        self._table = table
+        self._entries = []
+        self._version = None
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        if self._table is None:
+            return None
+        from project import versioning
+        try:
+            versions, _ = versioning.snapshot((self._table,))
+        except OperationalError:
+            # A database from before the table_versions migration: follow this process only
+            db.session.rollback()
+            return None
+        return versions[0]
+
+    def _ensure_loaded(self):
+        # Read the version first: a commit in between only makes the next check reload again
+        version = self._current_version()
+        if self._stale or version != self._version:
+            entries = sorted((name.casefold(), name) for name in self._loader() if name)
+            self._entries = entries
+            self._version = version
+            self._stale = False
+
+    def load(self):
+        with self._lock:
+            self._ensure_loaded()
+
+    def advance(self, count):
+        """Account for ``count`` rows this process changed and already applied with add/discard."""
+        with self._lock:
+            if self._version is not None:
+                self._version += count
+
+    def invalidate(self):
+        with self._lock:
+            self._stale = True
+
+    def add(self, name):
+        with self._lock:
+            if self._stale or not name:
+                return
+            entry = (name.casefold(), name)
+            position = bisect_left(self._entries, entry)
+            if position == len(self._entries) or self._entries[position] != entry:
+                self._entries.insert(position, entry)
+
+    def discard(self, name):
+        with self._lock:
+            if self._stale or not name:
+                return
+            entry = (name.casefold(), name)
+            position = bisect_left(self._entries, entry)
+            if position < len(self._entries) and self._entries[position] == entry:
+                del self._entries[position]
+
+    def search(self, prefix, limit=DEFAULT_LIMIT):
+        key = prefix.casefold()
+        with self._lock:
+            self._ensure_loaded()
+            position = bisect_left(self._entries, (key,))
+            matches = []
+            for folded, name in self._entries[position:position + limit]:
+                if not folded.startswith(key):
+                    break
+                matches.append(name)
+            return matches
+
+    def all(self):
+        with self._lock:
+            self._ensure_loaded()
+            return [name for _, name in self._entries]
+
+
+def _available_book_names():
+    from project.books.models import Book
+    return db.session.scalars(select(Book.name).where(Book.status == 'available')).all()
+
+
+def _customer_names():
+    from project.customers.models import Customer
+    return db.session.scalars(select(Customer.name)).all()
+
+
+def init_app(app):
+    app.extensions['typeahead'] = {
+        'books': NameIndex(_available_book_names, 'books'),
+        'customers': NameIndex(_customer_names, 'customers'),
+    }
+
+
+def warm_up(app):
+    """Build the indexes now instead of on the first search; skipped while the schema is missing."""
+    with app.app_context():
+        try:
+            for index in app.extensions['typeahead'].values():
+                index.load()
+        except OperationalError:
+            db.session.rollback()
+        finally:
+            db.session.remove()
+
+
+def get_index(name):
+    return current_app.extensions['typeahead'][name]
+
+
+def _apply_book_change(index, change):
+    # Only available books are offered for a new loan
+    old = dict(change.values, **change.previous)
+    if change.op in ('update', 'delete') and old.get('status') == 'available':
+        index.discard(old.get('name'))
+    if change.op in ('insert', 'update') and change.values.get('status') == 'available':
+        index.add(change.values.get('name'))
+
+
+def _apply_customer_change(index, change):
+    if change.op in ('update', 'delete'):
+        index.discard(change.previous.get('name', change.values.get('name')))
+    if change.op in ('insert', 'update'):
+        index.add(change.values.get('name'))
+
+
+@subscribe
+def _on_commit(changes):
+    indexes = current_app.extensions.get('typeahead')
+    if not indexes:
+        return
+    counts = {}
+    for change in changes:
+        if change.table == 'books':
+            index, apply = indexes['books'], _apply_book_change
+        elif change.table == 'customers':
+            index, apply = indexes['customers'], _apply_customer_change
+        else:
+            continue
+        if change.id is None:
+            index.invalidate()
+        else:
+            apply(index, change)
+            # Every changed row fired one version trigger
+            counts[index] = counts.get(index, 0) + 1
+    for index, count in counts.items():
+        index.advance(count)
@@ -0,0 +1,129 @@
+"""
+Per-table change versions and HTTP conditional GET.
+
+Every table a JSON list reads has a row in ``table_versions`` holding a
+version number and the time of its last change. Triggers on the table bump
+the row on every insert, update and delete, so writes from any process —
+another worker, ``flask import-customers``, a plain sqlite3 shell — change
+the version. Views decorated with :func:`conditional` look the versions up
+with one primary-key query, derive a strong ETag and a Last-Modified date
+from them, and answer a matching ``If-None-Match`` (or, without one,
+``If-Modified-Since``) with 304 before running the view.
+
+Versions start at a random number, so a database that is dropped and
+created again never hands out a tag it already issued. Because the
+versions live in the database, every worker issues the same tags.
+
+HTTP dates have one-second resolution, so a change later in the same
+second would keep the same date. While the last change is in the current
+second no Last-Modified is sent and ``If-Modified-Since`` is not answered
+with 304; the ETag still is.
+"""
+
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Response, current_app, request
+from sqlalchemy import DDL, event, select
+from sqlalchemy.exc import OperationalError
+
+from project import db
+from project.books.models import Book
+from project.customers.models import Customer
+from project.loans.models import Loan
+
+
+table_versions = db.Table(
+    'table_versions',
+    db.Column('name', db.String(64), primary_key=True),
+    db.Column('version', db.Integer, nullable=False),
+    # Unix time of the last change, with sub-second precision
+    db.Column('modified', db.Float, nullable=False),
+)
+
+VERSIONED_TABLES = [Book.__table__, Customer.__table__, Loan.__table__]
+
+NOW = "(julianday('now') - 2440587.5) * 86400.0"
+
+
+def trigger_ddl(table):
+    """The statements creating the triggers that bump ``table``'s version."""
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS "{table}_version_{suffix}" AFTER {operation} ON "{table}" BEGIN
+            UPDATE table_versions SET version = version + 1, modified = {NOW} WHERE name = '{table}';
+        END"""
+        for suffix, operation in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE'))
+    ]
+
+
+def seed_sql(table):
+    return (f"INSERT OR IGNORE INTO table_versions (name, version, modified) "
+            f"VALUES ('{table}', random() & 1073741823, {NOW})")
+
+
+for _table in VERSIONED_TABLES:
+    event.listen(table_versions, 'after_create', DDL(seed_sql(_table.name)).execute_if(dialect='sqlite'))
+    for _statement in trigger_ddl(_table.name):
+        event.listen(_table, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+
+def snapshot(tables):
+    """Return ``(versions, modified)``: the versions of ``tables`` and the Unix time of their last change."""
+    statement = (select(table_versions.c.name, table_versions.c.version, table_versions.c.modified)
+                 .where(table_versions.c.name.in_(tables)))
+    rows = {name: (version, modified) for name, version, modified in db.session.execute(statement)}
+    versions = tuple(rows.get(table, (0, 0.0))[0] for table in tables)
+    modified = max(rows.get(table, (0, 0.0))[1] for table in tables)
+    return versions, modified
+
+
+def conditional(*tables):
+    """
+    Make a GET view revalidatable against the versions of ``tables``.
+
+    The ETag also covers the query string and the ``Accept`` header, so every
+    page, parameter set and encoding (see :mod:`project.binary`) of the same
+    endpoint gets its own tag.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Read before the view: a concurrent commit can only make the tag older than the data
+            try:
+                versions, modified = snapshot(tables)
+            except OperationalError:
+                # A database from before the table_versions migration: serve without validators
+                db.session.rollback()
+                return view(*args, **kwargs)
+
+            variant_key = f"{request.full_path}\n{request.headers.get('Accept', '')}"
+            variant = hashlib.blake2b(variant_key.encode('utf-8'), digest_size=6).hexdigest()
+            etag = f"{'.'.join(map(str, versions))}-{variant}"
+            last_modified = datetime.fromtimestamp(int(modified), timezone.utc)
+            # Another change this second would get the same HTTP date
+            settled = int(modified) < int(time.time())
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = settled and since is not None and last_modified <= since
+
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.vary.add('Accept')
+            if settled:
+                response.last_modified = last_modified
+            # Clients may keep the response but must revalidate it before reuse
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
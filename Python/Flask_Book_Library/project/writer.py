@@ -0,0 +1,148 @@
+"""
+Single-writer queue with group commit.
+
+Mutating views describe their change as a job, a function taking the
+session, and hand it to :func:`write`. By default the job runs inline in
+the request's session and is committed right away. With
+``WRITE_QUEUE_ENABLED`` set, jobs go to one writer thread instead. The
+thread takes whatever jobs are queued (up to ``WRITE_QUEUE_MAX_BATCH``),
+runs each in its own SAVEPOINT and commits them all in one transaction:
+one lock acquisition and one fsync for the whole group.
+
+A job that raises only rolls back its own savepoint, and the changes it
+queued for the change feed are dropped, so the other jobs in the group
+still commit. If the group commit itself fails, every job in it fails.
+
+Jobs must not commit or roll back, and must return plain values rather
+than ORM objects: the writer's session is closed once the group is done.
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+
+from flask import current_app
+
+from project import db
+
+
+DEFAULT_MAX_BATCH = 64
+DEFAULT_TIMEOUT = 30
+
+
+class WriteQueue:
+    """A writer thread that commits queued jobs in groups."""
+
+    def __init__(self, app, max_batch=DEFAULT_MAX_BATCH, timeout=DEFAULT_TIMEOUT):
+        self.app = app
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.batches = 0
+        self.jobs = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Commit the jobs already queued, then stop the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def submit(self, job):
+        future = Future()
+        self.start()
+        self._queue.put((job, future))
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            # Everything that queued up during the previous commit joins this group
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit_group(batch)
+            if stopping:
+                return
+
+    def _commit_group(self, batch):
+        with self.app.app_context():
+            session = db.session
+            results = []
+            try:
+                if db.engine.dialect.name == 'sqlite':
+                    # Take the write lock up front; a deferred transaction could fail to upgrade later
+                    session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+                for job, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    pending = session.info.setdefault('pending_changes', [])
+                    recorded = len(pending)
+                    try:
+                        with session.begin_nested():
+                            result = job(session)
+                    except Exception as e:
+                        del pending[recorded:]
+                        future.set_exception(e)
+                    else:
+                        results.append((future, result))
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for future, result in results:
+                    future.set_result(result)
+                self.batches += 1
+                self.jobs += len(results)
+            finally:
+                db.session.remove()
+
+
+def init_app(app):
+    previous = app.extensions.pop('write_queue', None)
+    if previous is not None:
+        previous.stop()
+    if app.config.get('WRITE_QUEUE_ENABLED'):
+        app.extensions['write_queue'] = WriteQueue(
+            app,
+            max_batch=app.config.get('WRITE_QUEUE_MAX_BATCH', DEFAULT_MAX_BATCH),
+            timeout=app.config.get('WRITE_QUEUE_TIMEOUT', DEFAULT_TIMEOUT),
+        )
+
+
+def write(job):
+    """Run ``job(session)`` in a committed transaction and return its result."""
+    write_queue = current_app.extensions.get('write_queue')
+    if write_queue is not None:
+        # On timeout the job may still commit later
+        return write_queue.submit(job).result(write_queue.timeout)
+
+    try:
+        result = job(db.session)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result
@@ -0,0 +1,48 @@
+"""
+Tests for the application factory and the init-db command.
+"""
+
+import unittest
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, text
+from project import create_app, db
+
+
+class AppFactoryTestCase(unittest.TestCase):
+    """Test that apps are independent and only init-db creates the schema"""
+
+    def test_create_app_does_not_touch_the_schema(self):
+        app = create_app('testing')
+        with app.app_context():
+            self.assertEqual(inspect(db.engine).get_table_names(), [])
+
+    def test_apps_are_independent(self):
+        first, second = create_app('testing'), create_app('testing', SECRET_KEY='other')
+        self.assertEqual(second.config['SECRET_KEY'], 'other')
+        self.assertIsNot(first.extensions['entity_cache'], second.extensions['entity_cache'])
+
+        with first.app_context():
+            db.create_all()
+        with second.app_context():
+            self.assertEqual(inspect(db.engine).get_table_names(), [])
+
+    def test_init_db_creates_and_stamps_the_schema(self):
+        app = create_app('testing')
+        result = app.test_cli_runner().invoke(args=['init-db'])
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        with app.app_context():
+            tables = set(inspect(db.engine).get_table_names())
+            self.assertTrue({'books', 'customers', 'Loans', 'alembic_version'} <= tables)
+            revision = db.session.execute(text('SELECT version_num FROM alembic_version')).scalar()
+
+        migrate = app.extensions['migrate']
+        config = migrate.migrate.get_config(migrate.directory)
+        self.assertEqual(revision, ScriptDirectory.from_config(config).get_current_head())
+
+        client = app.test_client()
+        self.assertEqual(client.get('/books/json').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Tests for looking up many books and customers by name in one request.
+"""
+
+import unittest
+from project import create_app, db
+from project.books.models import Book
+from project.customers.models import Customer
+
+
+app = create_app('testing')
+
+
+class BatchLookupTestCase(unittest.TestCase):
+    """Test the batch detail endpoints"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['BATCH_LOOKUP_MAX_NAMES'] = 5
+        self.client = app.test_client()
+        app.extensions['entity_cache'].local.clear()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([Book(name=f'Book {i}', author='Author', year_published=2000 + i, book_type='5days')
+                                for i in range(4)])
+            db.session.add_all([Customer(name=name, city='Warsaw', age=30) for name in ('Anna', 'Jan')])
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_names_in_query_string(self):
+        response = self.client.get('/books/details?names=Book 1&names=Nope&names=Book 3')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(sorted(data['books']), ['Book 1', 'Book 3'])
+        self.assertEqual(data['books']['Book 3']['year_published'], 2003)
+        self.assertEqual(data['missing'], ['Nope'])
+        self.assertIn('desc="1 queries"', response.headers['Server-Timing'])
+
+    def test_names_in_json_body(self):
+        response = self.client.post('/loans/books/details', json={'names': ['Book 0', 'Book 2', 'Book 0']})
+        data = response.get_json()
+        self.assertEqual(data['books']['Book 2']['status'], 'available')
+        self.assertEqual(data['missing'], [])
+
+        response = self.client.post('/loans/customers/details', json={'names': ['Jan', 'Ewa']})
+        data = response.get_json()
+        self.assertEqual(data['customers']['Jan']['city'], 'Warsaw')
+        self.assertEqual(data['missing'], ['Ewa'])
+
+    def test_cached_names_are_not_queried_again(self):
+        self.client.get('/loans/books/details/Book 1')
+        response = self.client.get('/loans/books/details?names=Book 1&names=Book 2')
+        self.assertIn('desc="1 queries"', response.headers['Server-Timing'])
+        response = self.client.get('/loans/books/details?names=Book 1&names=Book 2')
+        self.assertIn('desc="0 queries"', response.headers['Server-Timing'])
+        self.assertEqual(len(response.get_json()['books']), 2)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get('/books/details').status_code, 400)
+        self.assertEqual(self.client.post('/books/details', json={'names': 'Book 1'}).status_code, 400)
+        too_many = '&'.join(f'names=Book {i}' for i in range(6))
+        response = self.client.get(f'/loans/customers/details?{too_many}')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('At most 5 names', response.get_json()['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
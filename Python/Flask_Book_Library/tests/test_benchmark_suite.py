@@ -0,0 +1,61 @@
+"""
+Tests for the synthetic datasets and the regression check of the benchmark suite.
+"""
+
+import unittest
+from benchmarks import datasets, suite
+
+
+class DatasetTestCase(unittest.TestCase):
+    """Test the synthetic data generator"""
+
+    def test_rows_are_deterministic(self):
+        first = list(datasets.generate_loans(50, customers=100, seed=7))
+        self.assertEqual(first, list(datasets.generate_loans(50, customers=100, seed=7)))
+        self.assertNotEqual(first, list(datasets.generate_loans(50, customers=100, seed=8)))
+
+    def test_rows_are_unique_and_valid(self):
+        customers = list(datasets.generate_customers(1000))
+        self.assertEqual(len({c['name'] for c in customers}), 1000)
+        # The loan form only accepts letters in customer names
+        for customer in customers:
+            self.assertRegex(customer['name'], r'^[a-zA-Z\s\-\.]+$')
+
+        books = list(datasets.generate_books(10, on_loan=4))
+        self.assertEqual([b['status'] for b in books], ['on_loan'] * 4 + ['available'] * 6)
+
+    def test_row_counts(self):
+        self.assertEqual(datasets.row_counts('100k'), {'books': 100000, 'customers': 100000, 'loans': 50000})
+        self.assertEqual(datasets.row_counts('300')['loans'], 150)
+
+
+class SuiteTestCase(unittest.TestCase):
+    """Test the latency summary and the baseline comparison"""
+
+    def test_percentiles(self):
+        values = [i / 1000 for i in range(1, 101)]
+        summary = suite.summarize(values, errors=0, elapsed=2.0)
+        self.assertEqual(summary['throughput'], 50.0)
+        self.assertEqual(summary['p50_ms'], 50.0)
+        self.assertEqual(summary['p95_ms'], 95.0)
+        self.assertEqual(summary['p99_ms'], 99.0)
+
+    def test_regressions_are_flagged(self):
+        baseline = {'scenarios': {
+            'books.list': {'throughput': 1000.0, 'p95_ms': 10.0},
+            'books.create': {'throughput': 500.0, 'p95_ms': 10.0},
+            'loans.list': {'throughput': 800.0, 'p95_ms': 10.0},
+        }}
+        results = {'scenarios': {
+            'books.list': {'throughput': 950.0, 'p95_ms': 10.5},
+            'books.create': {'throughput': 400.0, 'p95_ms': 10.0},
+            'loans.list': {'throughput': 800.0, 'p95_ms': 12.0},
+            'loans.detail': {'throughput': 900.0, 'p95_ms': 5.0},
+        }}
+        rows, regressions = suite.compare(results, baseline, tolerance=0.10)
+        self.assertEqual(regressions, ['books.create', 'loans.list'])
+        self.assertEqual({name: verdict for name, *_, verdict in rows}['loans.detail'], 'new')
+
+
+if __name__ == '__main__':
+    unittest.main()
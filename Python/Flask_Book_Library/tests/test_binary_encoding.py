@@ -0,0 +1,164 @@
+"""
+Tests for MessagePack / CBOR content negotiation on the JSON lists and exports.
+"""
+
+import io
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+from project import binary, create_app, db
+from project.books.models import Book
+from project.customers.models import Customer
+from project.loans.models import Loan
+
+
+app = create_app('testing')
+
+MSGPACK = {'Accept': 'application/msgpack'}
+CBOR = {'Accept': 'application/cbor'}
+
+
+class BinaryEncodingTestCase(unittest.TestCase):
+    """Test Accept negotiation for /books/json, /customers/json, /loans/json and the exports"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['EXPORT_CHUNK_SIZE'] = 2
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            for i in range(3):
+                db.session.add(Book(name=f'Book {i}', author='Author', year_published=2000 + i, book_type='5days'))
+            db.session.add(Customer(name='Jan', city='Warsaw', age=30))
+            loaned = Book(name='Loaned', author='Author', year_published=2000, book_type='5days', status='on_loan')
+            db.session.add(Loan(customer_name='Jan', book_name='Loaned', loan_date=datetime(2024, 1, 1),
+                                return_date=datetime(2024, 1, 10), book=loaned))
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        app.config.pop('EXPORT_CHUNK_SIZE', None)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_json_stays_the_default(self):
+        """No Accept, */* and a browser Accept header all get JSON"""
+        for headers in ({}, {'Accept': '*/*'}, {'Accept': 'text/html,application/xhtml+xml,*/*;q=0.8'}):
+            response = self.client.get('/books/json', headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, 'application/json')
+
+    def test_etag_varies_with_accept(self):
+        """Each encoding gets its own ETag and the responses say they vary on Accept"""
+        plain = self.client.get('/books/json')
+        other = self.client.get('/books/json', headers={'Accept': 'application/json'})
+        self.assertIn('Accept', plain.headers['Vary'])
+        self.assertNotEqual(plain.headers['ETag'], other.headers['ETag'])
+
+        not_modified = self.client.get('/books/json', headers={'If-None-Match': plain.headers['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('Accept', not_modified.headers['Vary'])
+
+    def test_missing_library_is_not_acceptable(self):
+        """An encoding whose library is not installed is a 406, unless JSON is accepted too"""
+        with mock.patch.object(binary, 'msgpack', None):
+            response = self.client.get('/customers/json', headers=MSGPACK)
+            self.assertEqual(response.status_code, 406)
+            self.assertIn('msgpack', response.get_json()['error'])
+
+            response = self.client.get('/customers/json', headers={'Accept': 'application/msgpack, application/json;q=0.5'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, 'application/json')
+
+            response = self.client.get('/customers/export?format=msgpack')
+            self.assertEqual(response.status_code, 406)
+
+    def test_export_negotiates_its_own_formats(self):
+        """Accept picks CSV or NDJSON for the export when ?format= is not given"""
+        response = self.client.get('/loans/export', headers={'Accept': 'text/csv'})
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertIn('loans.csv', response.headers['Content-Disposition'])
+        self.assertIn('Accept', response.headers['Vary'])
+        self.assertTrue(response.get_data(as_text=True).startswith('id,customer_name,book_name'))
+
+        response = self.client.get('/loans/export', headers={'Accept': '*/*'})
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), 1)
+
+        # An explicit format does not depend on Accept
+        response = self.client.get('/loans/export?format=ndjson', headers={'Accept': 'text/csv'})
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertNotIn('Vary', response.headers)
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), 1)
+
+    def test_invalid_export_format(self):
+        """Unknown export formats list the binary ones too"""
+        response = self.client.get('/books/export?format=xml')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('msgpack', response.get_json()['error'])
+
+    @unittest.skipIf(binary.msgpack is None, 'msgpack is not installed')
+    def test_msgpack_page(self):
+        """A page is sent as field names plus one array per row"""
+        response = self.client.get('/loans/json', headers=MSGPACK)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/msgpack')
+
+        data = binary.msgpack.unpackb(response.data, timestamp=3)
+        self.assertEqual(data['fields'], ['customer_id', 'book_id', 'customer_name', 'book_name', 'loan_date', 'return_date'])
+        self.assertEqual(data['loans'], [[None, 4, 'Jan', 'Loaned', datetime(2024, 1, 1, tzinfo=timezone.utc),
+                                          datetime(2024, 1, 10, tzinfo=timezone.utc)]])
+        self.assertIsNone(data['next_cursor'])
+
+    @unittest.skipIf(binary.msgpack is None, 'msgpack is not installed')
+    def test_msgpack_page_with_fields_and_cursor(self):
+        """Sparse fieldsets and cursors work the same as with JSON"""
+        response = self.client.get('/books/json?fields=name&limit=2', headers={'Accept': 'application/x-msgpack'})
+        data = binary.msgpack.unpackb(response.data)
+        self.assertEqual(data['fields'], ['name'])
+        self.assertEqual(data['books'], [['Book 0'], ['Book 1']])
+
+        response = self.client.get(f"/books/json?fields=name&limit=2&after={data['next_cursor']}", headers=MSGPACK)
+        self.assertEqual(binary.msgpack.unpackb(response.data)['books'], [['Book 2'], ['Loaned']])
+
+    @unittest.skipIf(binary.cbor2 is None, 'cbor2 is not installed')
+    def test_cbor_page(self):
+        """CBOR pages carry the same data"""
+        response = self.client.get('/customers/json', headers=CBOR)
+        self.assertEqual(response.mimetype, 'application/cbor')
+        data = binary.cbor2.loads(response.data)
+        self.assertEqual(data['fields'], ['name', 'city', 'age'])
+        self.assertEqual(data['customers'], [['Jan', 'Warsaw', 30]])
+
+    @unittest.skipIf(binary.msgpack is None, 'msgpack is not installed')
+    def test_msgpack_export(self):
+        """The export streams the field names, then one array per row"""
+        response = self.client.get('/books/export', headers=MSGPACK)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'application/msgpack')
+        self.assertIn('books.msgpack', response.headers['Content-Disposition'])
+
+        values = list(binary.msgpack.Unpacker(io.BytesIO(response.data)))
+        self.assertEqual(values[0], ['id', 'name', 'author', 'year_published', 'book_type', 'status'])
+        self.assertEqual([row[1] for row in values[1:]], ['Book 0', 'Book 1', 'Book 2', 'Loaned'])
+
+    @unittest.skipIf(binary.cbor2 is None, 'cbor2 is not installed')
+    def test_cbor_export(self):
+        """?format=cbor streams a CBOR sequence"""
+        response = self.client.get('/loans/export?format=cbor')
+        self.assertEqual(response.mimetype, 'application/cbor-seq')
+        stream = io.BytesIO(response.data)
+        self.assertEqual(binary.cbor2.load(stream), ['id', 'customer_name', 'book_name', 'loan_date', 'return_date'])
+        self.assertEqual(binary.cbor2.load(stream), [1, 'Jan', 'Loaned', datetime(2024, 1, 1, tzinfo=timezone.utc),
+                                                    datetime(2024, 1, 10, tzinfo=timezone.utc)])
+
+
+if __name__ == '__main__':
+    unittest.main()
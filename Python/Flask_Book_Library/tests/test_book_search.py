@@ -0,0 +1,93 @@
+"""
+Tests for full-text book search through /books/search.
+"""
+
+import unittest
+from project import create_app, db
+from project.books.models import Book
+
+
+app = create_app('testing')
+
+
+class BookSearchTestCase(unittest.TestCase):
+    """Test ranked, prefix-matching search kept in sync with the books table"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                Book(name='Harry Potter', author='Rowling', year_published=1997, book_type='5days'),
+                Book(name='Dune', author='Frank Herbert', year_published=1965, book_type='10days'),
+                Book(name='Children of Dune', author='Frank Herbert', year_published=1976, book_type='10days'),
+                Book(name='The Hobbit', author='Harold Tolkien', year_published=1937, book_type='2days'),
+            ])
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def search(self, query):
+        response = self.client.get('/books/search', query_string={'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [book['name'] for book in response.get_json()['books']]
+
+    def test_prefix_match_on_name_and_author(self):
+        """Word prefixes match in both the name and the author"""
+        self.assertEqual(self.search('herb'), ['Dune', 'Children of Dune'])
+        self.assertEqual(self.search('har pot'), ['Harry Potter'])
+
+    def test_name_matches_rank_above_author_matches(self):
+        """A hit in the name ranks above a hit in the author"""
+        self.assertEqual(self.search('har'), ['Harry Potter', 'The Hobbit'])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Creating, renaming and deleting books updates the index"""
+        self.client.post('/books/create', json={
+            'name': 'Dune Messiah', 'author': 'Frank Herbert', 'year_published': 1969, 'book_type': '5days'
+        })
+        self.assertIn('Dune Messiah', self.search('messiah'))
+
+        with app.app_context():
+            book_id = Book.query.filter_by(name='The Hobbit').one().id
+        self.client.post(f'/books/{book_id}/edit', json={'name': 'There and Back Again'})
+        self.assertEqual(self.search('hobbit'), [])
+        self.assertEqual(self.search('there back'), ['There and Back Again'])
+
+        with app.app_context():
+            book_id = Book.query.filter_by(name='Harry Potter').one().id
+        self.client.post(f'/books/{book_id}/delete')
+        self.assertEqual(self.search('potter'), [])
+
+    def test_pagination(self):
+        """limit and next_offset page through the results"""
+        response = self.client.get('/books/search?q=dune&limit=1')
+        first = response.get_json()
+        self.assertEqual(len(first['books']), 1)
+        self.assertEqual(first['next_offset'], 1)
+
+        second = self.client.get(f"/books/search?q=dune&limit=1&offset={first['next_offset']}").get_json()
+        self.assertIsNone(second['next_offset'])
+        self.assertNotEqual(first['books'], second['books'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        """FTS5 operators in user input are treated as plain words"""
+        self.assertEqual(self.search('"dune'), ['Dune', 'Children of Dune'])
+        self.assertEqual(self.search('NEAR(dune'), [])
+
+    def test_missing_query(self):
+        """q is required"""
+        self.assertEqual(self.client.get('/books/search').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Tests for bulk book ingestion through /books/bulk.
+"""
+
+import json
+import unittest
+from project import create_app, db
+from project.books.models import Book
+
+
+app = create_app('testing')
+
+
+def book(name, **overrides):
+    record = {'name': name, 'author': 'Test Author', 'year_published': 2020, 'book_type': '5days'}
+    record.update(overrides)
+    return record
+
+
+class BulkBooksTestCase(unittest.TestCase):
+    """Test batched inserts and the per-row result report"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add(Book(name='Existing', author='Author', year_published=2000, book_type='5days'))
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_json_array_in_several_batches(self):
+        """All valid records are inserted regardless of the batch size"""
+        records = [book(f'Book {i}') for i in range(7)]
+        response = self.client.post('/books/bulk?batch_size=3', json=records)
+        self.assertEqual(response.status_code, 200)
+
+        data = response.get_json()
+        self.assertEqual(data['summary']['created'], 7)
+        self.assertEqual([r['index'] for r in data['results']], list(range(7)))
+        with app.app_context():
+            self.assertEqual(Book.query.count(), 8)
+
+    def test_ndjson_body(self):
+        """NDJSON bodies are parsed line by line, bad lines are reported"""
+        body = '\n'.join([json.dumps(book('First')), '{not json', '', json.dumps(book('Second'))])
+        response = self.client.post('/books/bulk', data=body, content_type='application/x-ndjson')
+
+        results = response.get_json()['results']
+        self.assertEqual([r['status'] for r in results], ['created', 'invalid', 'created'])
+
+    def test_validation_and_conflicts_are_reported_per_row(self):
+        """Invalid rows and duplicate names do not stop the rest of the batch"""
+        records = [
+            book('Existing'),
+            book('Fresh'),
+            book('Fresh'),
+            book('Bad Year', year_published=99),
+            book('<script>alert(1)</script>'),
+            'not an object',
+        ]
+        response = self.client.post('/books/bulk', json=records)
+        results = response.get_json()['results']
+
+        self.assertEqual([r['status'] for r in results],
+                         ['conflict', 'created', 'conflict', 'invalid', 'invalid', 'invalid'])
+        self.assertIn('year_published', results[3]['errors'])
+        self.assertIn('name', results[4]['errors'])
+
+    def test_rejects_non_array_body(self):
+        """A single JSON object is not a valid bulk body"""
+        response = self.client.post('/books/bulk', json=book('Single'))
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+Tests for ETag / Last-Modified revalidation of the JSON list endpoints.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from sqlalchemy import event, update
+from project import create_app, db
+from project.books.models import Book
+from project.versioning import table_versions
+
+
+app = create_app('testing')
+
+
+class ConditionalGetTestCase(unittest.TestCase):
+    """Test that unchanged lists are answered with 304 without querying"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add(Book(name='Dune', author='Frank Herbert', year_published=1965, book_type='10days'))
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def age_versions(self, seconds=60):
+        """Move the last change of every table ``seconds`` into the past"""
+        with app.app_context():
+            db.session.execute(update(table_versions).values(modified=table_versions.c.modified - seconds))
+            db.session.commit()
+
+    def test_matching_etag_returns_304_with_only_the_version_lookup(self):
+        first = self.client.get('/books/json')
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers['ETag']
+        self.assertIn('no-cache', first.headers['Cache-Control'])
+
+        statements = []
+        with app.app_context():
+            engine = db.engine
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            second = self.client.get('/books/json', headers={'If-None-Match': etag})
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b'')
+        self.assertEqual(second.headers['ETag'], etag)
+        self.assertEqual(len(statements), 1)
+        self.assertIn('FROM table_versions', statements[0])
+
+    def test_commit_changes_etag_of_its_table_only(self):
+        books_etag = self.client.get('/books/json').headers['ETag']
+        customers_etag = self.client.get('/customers/json').headers['ETag']
+
+        self.client.post('/books/create', json={
+            'name': 'Emma', 'author': 'Jane Austen', 'year_published': 1815, 'book_type': '5days'
+        })
+
+        response = self.client.get('/books/json', headers={'If-None-Match': books_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], books_etag)
+        self.assertEqual(len(response.get_json()['books']), 2)
+
+        response = self.client.get('/customers/json', headers={'If-None-Match': customers_etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_query_string_is_part_of_the_etag(self):
+        etag = self.client.get('/books/json?limit=1').headers['ETag']
+        self.assertNotEqual(self.client.get('/books/json?limit=2').headers['ETag'], etag)
+        response = self.client.get('/books/json?limit=2', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since(self):
+        self.age_versions()
+        last_modified = self.client.get('/loans/json').headers['Last-Modified']
+        response = self.client.get('/loans/json', headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get('/loans/json', headers={'If-Modified-Since': 'Thu, 01 Jan 1970 00:00:00 GMT'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_date_while_the_last_change_is_this_second(self):
+        """A change later in the same second would carry the same HTTP date"""
+        self.age_versions()
+        last_modified = self.client.get('/books/json').headers['Last-Modified']
+        self.client.post('/books/create', json={
+            'name': 'Emma', 'author': 'Jane Austen', 'year_published': 1815, 'book_type': '5days'
+        })
+
+        response = self.client.get('/books/json', headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response.headers)
+        # Even a date from the future does not validate a table changed this second
+        response = self.client.get('/books/json', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response.headers)
+
+    def test_writes_from_another_process_change_the_etag(self):
+        """Versions are kept by triggers, so writes that bypass the app are seen too"""
+        fd, path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        try:
+            file_app = create_app('testing', SQLALCHEMY_DATABASE_URI='sqlite:///' + path)
+            with file_app.app_context():
+                db.create_all()
+            client = file_app.test_client()
+            etag = client.get('/customers/json').headers['ETag']
+
+            connection = sqlite3.connect(path)
+            with connection:
+                connection.execute("INSERT INTO customers (name, city, age) VALUES ('Outside', 'Warsaw', 30)")
+            connection.close()
+
+            response = client.get('/customers/json', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([customer['name'] for customer in response.get_json()['customers']], ['Outside'])
+            with file_app.app_context():
+                db.engine.dispose()
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    def test_errors_are_not_tagged(self):
+        response = self.client.get('/books/json?limit=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('ETag', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Tests for configuration profiles and SQLite connection pragmas.
+"""
+
+import os
+import tempfile
+import unittest
+from flask import Flask
+from sqlalchemy import create_engine, text
+from project import create_app, db
+from project.config import load_config, apply_sqlite_pragmas, ProductionConfig
+
+
+app = create_app('testing')
+
+
+class ConfigProfileTestCase(unittest.TestCase):
+    """Test profile selection and pool options"""
+
+    def test_profiles(self):
+        for name in ('development', 'production', 'testing'):
+            config_app = Flask(__name__)
+            load_config(config_app, name)
+            self.assertEqual(config_app.config['SQLITE_PRAGMAS']['journal_mode'], 'WAL')
+        self.assertTrue(config_app.config['TESTING'])
+
+        with self.assertRaises(ValueError):
+            load_config(Flask(__name__), 'staging')
+
+    def test_pool_options_only_for_file_databases(self):
+        config_app = Flask(__name__)
+        load_config(config_app, 'production')
+        self.assertEqual(config_app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size'], ProductionConfig.DB_POOL_SIZE)
+
+        config_app = Flask(__name__)
+        load_config(config_app, 'production', SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+        self.assertNotIn('SQLALCHEMY_ENGINE_OPTIONS', config_app.config)
+
+
+class SQLitePragmaTestCase(unittest.TestCase):
+    """Test that pragmas are set on every new connection"""
+
+    def test_pragmas_on_connect(self):
+        fd, path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        engine = create_engine('sqlite:///' + path)
+        try:
+            apply_sqlite_pragmas(engine, {'journal_mode': 'WAL', 'busy_timeout': 1234, 'synchronous': 'NORMAL'})
+            with engine.connect() as connection:
+                self.assertEqual(connection.execute(text('PRAGMA journal_mode')).scalar(), 'wal')
+                self.assertEqual(connection.execute(text('PRAGMA busy_timeout')).scalar(), 1234)
+                self.assertEqual(connection.execute(text('PRAGMA synchronous')).scalar(), 1)
+        finally:
+            engine.dispose()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    def test_app_engine_uses_profile(self):
+        with app.app_context():
+            busy_timeout = db.session.execute(text('PRAGMA busy_timeout')).scalar()
+        self.assertEqual(busy_timeout, app.config['SQLITE_PRAGMAS']['busy_timeout'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Tests for the streaming customer CSV import (endpoint and CLI).
+"""
+
+import io
+import os
+import tempfile
+import unittest
+from project import create_app, db
+from project.customers.models import Customer
+
+
+app = create_app('testing')
+
+
+CSV_DATA = (
+    'name,city,age\n'
+    'Anna Nowak,Warsaw,30\n'
+    'Jan Kowalski,Krakow,41\n'
+    'Bad 123,Gdansk,20\n'
+    'Ewa Lis,Poznan,abc\n'
+    'Anna Nowak,Lodz,31\n'
+)
+
+
+class CustomerImportTestCase(unittest.TestCase):
+    """Test upserting customers from CSV"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add(Customer(name='Jan Kowalski', city='Old City', age=40))
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def assert_imported(self):
+        with app.app_context():
+            customers = {c.name: (c.city, c.age) for c in Customer.query.all()}
+        self.assertEqual(customers, {'Anna Nowak': ('Lodz', 31), 'Jan Kowalski': ('Krakow', 41)})
+
+    def test_raw_csv_body(self):
+        """A text/csv body is imported and existing names are updated"""
+        response = self.client.post('/customers/import?batch_size=2', data=CSV_DATA, content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+
+        report = response.get_json()
+        self.assertEqual(report['processed'], 5)
+        self.assertEqual(report['upserted'], 3)
+        self.assertEqual(report['invalid'], 2)
+        self.assertEqual([e['line'] for e in report['errors']], [4, 5])
+        self.assert_imported()
+
+    def test_multipart_upload(self):
+        """A CSV uploaded as a file field is imported"""
+        response = self.client.post('/customers/import', data={
+            'file': (io.BytesIO(CSV_DATA.encode('utf-8')), 'customers.csv')
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        self.assert_imported()
+
+    def test_missing_columns(self):
+        """A CSV without the required columns is rejected"""
+        response = self.client.post('/customers/import', data='name,age\nAnna,30\n', content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cli_command(self):
+        """flask import-customers imports a file from disk"""
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write(CSV_DATA)
+        try:
+            result = app.test_cli_runner().invoke(args=['import-customers', path, '--batch-size', '1'])
+        finally:
+            os.remove(path)
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('3 upserted, 2 invalid', result.output)
+        self.assert_imported()
+
+
+if __name__ == '__main__':
+    unittest.main()
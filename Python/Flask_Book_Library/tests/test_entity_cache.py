@@ -0,0 +1,216 @@
+"""
+Tests for the read-through entity cache behind the detail endpoints.
+"""
+
+import os
+import tempfile
+import unittest
+from sqlalchemy import event
+from project import create_app, db, cache
+from project.books.models import Book
+from project.customers.models import Customer
+from project.loans.models import Loan
+
+
+app = create_app('testing')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    """Test size and TTL bounds of the local tier"""
+
+    def test_least_recently_used_entry_is_evicted(self):
+        lru = cache.LRUCache(max_size=2, ttl=60)
+        lru.set('a', {'id': 1})
+        lru.set('b', {'id': 2})
+        lru.get('a')
+        lru.set('c', {'id': 3})
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), {'id': 1})
+        self.assertEqual(lru.stats()['evictions'], 1)
+        self.assertEqual((lru.hits, lru.misses), (2, 1))
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        lru = cache.LRUCache(max_size=10, ttl=5, clock=clock)
+        lru.set('a', {'id': 1})
+        clock.now = 4.9
+        self.assertIsNotNone(lru.get('a'))
+        clock.now = 5
+        self.assertIsNone(lru.get('a'))
+        self.assertEqual(lru.stats()['expirations'], 1)
+
+    def test_rejected_entries_are_stale(self):
+        lru = cache.LRUCache()
+        lru.set('a', ('token', {'id': 1}))
+        self.assertIsNone(lru.get('a', lambda entry: entry[0] == 'other'))
+        self.assertIsNone(lru.get('a'))
+        self.assertEqual(lru.stats()['stale'], 1)
+
+    def test_clear_namespace(self):
+        lru = cache.LRUCache()
+        lru.set('books:id:1', {})
+        lru.set('customers:id:1', {})
+        lru.clear('books')
+        self.assertEqual(len(lru), 1)
+
+
+class EntityCacheEndpointTestCase(unittest.TestCase):
+    """Test that detail endpoints are served from the cache and stay current"""
+
+    def setUp(self):
+        """Set up test client, database and an empty cache"""
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+        self.shared = cache.LocalBackend()
+        cache.init_app(app, shared=self.shared)
+
+        with app.app_context():
+            db.create_all()
+            book = Book(name='Dune', author='Frank Herbert', year_published=1965, book_type='10days')
+            customer = Customer(name='Anna Nowak', city='Warsaw', age=30)
+            db.session.add_all([book, customer])
+            db.session.commit()
+            self.book_id, self.customer_id = book.id, customer.id
+
+        self.statements = []
+        with app.app_context():
+            self.engine = db.engine
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _count(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def book(self):
+        return self.client.get('/loans/books/details/Dune').get_json()['book']
+
+    def test_repeated_lookups_hit_the_cache(self):
+        self.assertEqual(self.book()['author'], 'Frank Herbert')
+        queries = len(self.statements)
+        self.assertEqual(self.book()['author'], 'Frank Herbert')
+        self.client.get(f'/books/{self.book_id}/edit-data')
+        self.assertEqual(len(self.statements), queries)
+
+        stats = self.client.get('/cache/stats').get_json()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['shared'], 'LocalBackend')
+
+    def test_edit_and_delete_invalidate_both_keys(self):
+        self.book()
+        self.client.get(f'/books/{self.book_id}/edit-data')
+        self.client.post(f'/books/{self.book_id}/edit', json={'author': 'F. Herbert'})
+        self.assertEqual(self.book()['author'], 'F. Herbert')
+        data = self.client.get(f'/books/{self.book_id}/edit-data').get_json()
+        self.assertEqual(data['book']['author'], 'F. Herbert')
+
+        self.client.post(f'/books/{self.book_id}/delete')
+        self.assertEqual(self.client.get('/loans/books/details/Dune').status_code, 404)
+        self.assertEqual(self.client.get(f'/books/{self.book_id}/edit-data').status_code, 404)
+
+    def test_loan_events_refresh_book_status(self):
+        self.assertEqual(self.book()['status'], 'available')
+        self.client.post('/loans/create', data={
+            'customer_name': 'Anna Nowak', 'book_name': 'Dune',
+            'loan_date': '2024-01-01', 'return_date': '2024-01-10'
+        })
+        self.assertEqual(self.book()['status'], 'on_loan')
+
+        with app.app_context():
+            loan_id = Loan.query.one().id
+        self.assertEqual(self.client.get(f'/loans/{loan_id}/details').get_json()['loan']['book_id'], self.book_id)
+        self.client.post(f'/loans/{loan_id}/delete')
+        self.assertEqual(self.book()['status'], 'available')
+        self.assertEqual(self.client.get(f'/loans/{loan_id}/details').status_code, 404)
+
+    def test_bulk_import_drops_the_table(self):
+        self.client.get('/loans/customers/details/Anna Nowak')
+        self.client.post('/customers/import', data='name,city,age\nAnna Nowak,Krakow,31\n', content_type='text/csv')
+        customer = self.client.get('/loans/customers/details/Anna Nowak').get_json()['customer']
+        self.assertEqual(customer['city'], 'Krakow')
+        data = self.client.get(f'/customers/{self.customer_id}/edit-data').get_json()
+        self.assertEqual(data['customer']['age'], 31)
+
+    def test_shared_backend_serves_other_processes(self):
+        self.book()
+        cache.init_app(app, shared=self.shared)
+        queries = len(self.statements)
+        self.assertEqual(self.book()['name'], 'Dune')
+        self.assertEqual(len(self.statements), queries)
+
+    def test_fill_racing_a_commit_is_not_stored(self):
+        entity_cache = app.extensions['entity_cache']
+        load = entity_cache._load
+
+        def load_then_commit(*args):
+            row = load(*args)
+            with app.app_context():
+                book = db.session.get(Book, self.book_id)
+                book.author = 'Someone Else'
+                db.session.commit()
+            return row
+
+        entity_cache._load = load_then_commit
+        try:
+            self.assertEqual(self.book()['author'], 'Frank Herbert')
+        finally:
+            entity_cache._load = load
+        self.assertEqual(self.book()['author'], 'Someone Else')
+
+
+class SharedBackendTestCase(unittest.TestCase):
+    """Test that an edit in one process reaches the local tier of another"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        shared = cache.LocalBackend()
+        self.apps = [create_app('testing', SQLALCHEMY_DATABASE_URI='sqlite:///' + self.path) for _ in range(2)]
+        for process in self.apps:
+            cache.init_app(process, shared=shared)
+        with self.apps[0].app_context():
+            db.create_all()
+            book = Book(name='Dune', author='Frank Herbert', year_published=1965, book_type='10days')
+            db.session.add(book)
+            db.session.commit()
+            self.book_id = book.id
+
+    def tearDown(self):
+        for process in self.apps:
+            with process.app_context():
+                db.engine.dispose()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def author(self, process):
+        data = process.test_client().get(f'/books/{self.book_id}/edit-data').get_json()
+        return data['book']['author']
+
+    def test_edit_in_one_process_reaches_the_other(self):
+        first, second = self.apps
+        self.assertEqual(self.author(second), 'Frank Herbert')
+        self.assertEqual(self.author(second), 'Frank Herbert')
+
+        first.test_client().post(f'/books/{self.book_id}/edit', json={'author': 'F. Herbert'})
+        self.assertEqual(self.author(second), 'F. Herbert')
+        self.assertEqual(second.extensions['entity_cache'].stats()['stale'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Tests for the streaming NDJSON / CSV export endpoints.
+"""
+
+import csv
+import io
+import json
+import unittest
+from datetime import datetime
+from project import create_app, db
+from project.books.models import Book
+from project.loans.models import Loan
+
+
+app = create_app('testing')
+
+
+class ExportTestCase(unittest.TestCase):
+    """Test /books/export, /customers/export and /loans/export"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['EXPORT_CHUNK_SIZE'] = 2
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            for i in range(5):
+                db.session.add(Book(name=f'Book {i}', author='Author',
+                                    year_published=2000 + i, book_type='5days'))
+            loaned = Book(name='Loaned', author='Author', year_published=2000,
+                          book_type='5days', status='on_loan')
+            db.session.add(Loan(customer_name='Jan', book_name='Loaned',
+                                loan_date=datetime(2024, 1, 1), return_date=datetime(2024, 1, 10),
+                                book=loaned))
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        app.config.pop('EXPORT_CHUNK_SIZE', None)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_books_ndjson_export(self):
+        """Every book is streamed as one JSON document per line"""
+        response = self.client.get('/books/export?format=ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertTrue(response.is_streamed)
+
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([row['name'] for row in rows], [f'Book {i}' for i in range(5)] + ['Loaned'])
+        self.assertEqual(rows[0]['status'], 'available')
+
+    def test_books_csv_export(self):
+        """CSV export has a header row followed by every book"""
+        response = self.client.get('/books/export?format=csv')
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertIn('attachment; filename=books.csv', response.headers['Content-Disposition'])
+
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(rows[0], ['id', 'name', 'author', 'year_published', 'book_type', 'status'])
+        self.assertEqual(len(rows), 7)
+
+    def test_empty_table_csv_export(self):
+        """An empty table still gets its header row"""
+        response = self.client.get('/customers/export?format=csv')
+        self.assertEqual(response.get_data(as_text=True).strip(), 'id,name,city,age')
+
+    def test_loan_dates_are_iso_formatted(self):
+        """Datetimes are exported as ISO-8601 strings"""
+        response = self.client.get('/loans/export')
+        row = json.loads(response.get_data(as_text=True))
+        self.assertEqual(row['loan_date'], '2024-01-01T00:00:00')
+
+    def test_invalid_format(self):
+        """Unknown formats are rejected"""
+        response = self.client.get('/books/export?format=xml')
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
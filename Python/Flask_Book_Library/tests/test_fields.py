@@ -0,0 +1,93 @@
+"""
+Tests for sparse fieldsets (?fields=) on the JSON read endpoints.
+"""
+
+import unittest
+from datetime import datetime
+from sqlalchemy import event
+from project import create_app, db
+from project.books.models import Book
+from project.customers.models import Customer
+from project.loans.models import Loan
+
+
+app = create_app('testing')
+
+
+class FieldsTestCase(unittest.TestCase):
+    """Test column projection and response trimming"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+        app.extensions['entity_cache'].local.clear()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([Book(name=f'Book {i}', author='Author', year_published=2000 + i, book_type='5days')
+                                for i in range(3)])
+            db.session.add(Customer(name='Anna', city='Warsaw', age=30))
+            db.session.add(Loan(customer_name='Anna', book_name='Book 0', book_id=1,
+                                loan_date=datetime(2024, 1, 1), return_date=datetime(2024, 1, 6)))
+            db.session.commit()
+            self.engine = db.engine
+
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute', self.capture)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        event.remove(self.engine, 'before_cursor_execute', self.capture)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def capture(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(' '.join(statement.split()))
+
+    def test_list_selects_only_requested_columns(self):
+        response = self.client.get('/books/json?fields=year_published&limit=2')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data['books'], [{'year_published': 2000}, {'year_published': 2001}])
+        self.assertIsNotNone(data['next_cursor'])
+        # The id and name are read for the cursor, nothing else
+        self.assertTrue(self.statements[-1].startswith(
+            'SELECT books.year_published, books.id, books.name FROM books'), self.statements[-1])
+
+        # The cursor still works with the projection
+        data = self.client.get(f"/books/json?fields=year_published&limit=2&after={data['next_cursor']}").get_json()
+        self.assertEqual(data['books'], [{'year_published': 2002}])
+
+    def test_default_fields_are_unchanged(self):
+        books = self.client.get('/books/json').get_json()['books']
+        self.assertEqual(set(books[0]), {'name', 'author', 'year_published', 'book_type'})
+        customers = self.client.get('/customers/json').get_json()['customers']
+        self.assertEqual(customers, [{'name': 'Anna', 'city': 'Warsaw', 'age': 30}])
+        loans = self.client.get('/loans/json?sort=-loan_date').get_json()['loans']
+        self.assertEqual(set(loans[0]), {'customer_id', 'book_id', 'customer_name', 'book_name',
+                                         'loan_date', 'return_date'})
+
+    def test_details_are_trimmed(self):
+        self.assertEqual(self.client.get('/books/details/Book 1?fields=author').get_json(),
+                         {'book': {'author': 'Author'}})
+        self.assertEqual(self.client.get('/loans/customers/details/Anna?fields=id,age').get_json(),
+                         {'customer': {'id': 1, 'age': 30}})
+        data = self.client.get('/loans/1/details?fields=book_name&expand=customer').get_json()
+        self.assertEqual(data['loan']['book_name'], 'Book 0')
+        self.assertEqual(set(data['loan']), {'book_name', 'customer'})
+        data = self.client.get('/loans/books/details?names=Book 2&fields=status').get_json()
+        self.assertEqual(data['books'], {'Book 2': {'status': 'available'}})
+
+    def test_unknown_fields(self):
+        for url in ('/books/json?fields=name,price', '/loans/json?fields=secret',
+                    '/loans/1/details?fields=nope', '/books/details/Book 1?fields=x'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 400, url)
+            self.assertIn('Invalid fields', response.get_json()['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
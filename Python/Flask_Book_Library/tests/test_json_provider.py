@@ -0,0 +1,104 @@
+"""
+Tests for the JSON provider behind jsonify.
+"""
+
+import json
+import unittest
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from flask import Flask
+from markupsafe import Markup
+
+from project import create_app, db, jsonprovider
+from project.books.models import Book
+from project.loans.models import Loan
+
+
+app = create_app('testing')
+
+PAYLOAD = {
+    'name': 'Żółw', 'count': 3, 'ratio': 0.1, 'missing': None, 'flags': [True, False],
+    'at': datetime(2024, 1, 2, 3, 4, 5), 'moment': datetime(2024, 1, 2, 3, 4, 5, 678, tzinfo=timezone.utc),
+    'day': date(2024, 1, 2), 'price': Decimal('9.99'), 'key': uuid.UUID(int=1), 'html': Markup('<b>x</b>'),
+}
+
+
+class JSONProviderTestCase(unittest.TestCase):
+    """Test the orjson and standard library providers"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            book = Book(name='Loaned', author='Author', year_published=2000, book_type='5days', status='on_loan')
+            db.session.add(Loan(customer_name='Jan', book_name='Loaned', loan_date=datetime(2024, 1, 1),
+                                return_date=datetime(2024, 1, 10, 12, 30), book=book))
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_loan_dates_are_iso_8601(self):
+        """Loan datetimes are sent as ISO 8601 instead of HTTP dates"""
+        loan = self.client.get('/loans/json').get_json()['loans'][0]
+        self.assertEqual(loan['loan_date'], '2024-01-01T00:00:00')
+        self.assertEqual(loan['return_date'], '2024-01-10T12:30:00')
+
+        details = self.client.get('/loans/1/details').get_json()['loan']
+        self.assertEqual(details['loan_date'], '2024-01-01T00:00:00')
+
+    def test_app_uses_orjson_when_installed(self):
+        """The default provider is orjson when it can be imported"""
+        expected = jsonprovider.OrjsonProvider if jsonprovider.orjson else jsonprovider.StdlibJSONProvider
+        self.assertIs(type(app.json), expected)
+
+    def test_unknown_provider_is_rejected(self):
+        """JSON_PROVIDER must name a known provider"""
+        with self.assertRaises(ValueError):
+            create_app('testing', JSON_PROVIDER='simplejson')
+
+    def test_stdlib_response(self):
+        """The fallback encodes every supported type and sends UTF-8 bytes"""
+        flask_app = Flask(__name__)
+        provider = jsonprovider.StdlibJSONProvider(flask_app)
+        response = provider.response(PAYLOAD)
+        self.assertEqual(response.mimetype, 'application/json')
+        body = response.get_data()
+        self.assertTrue(body.endswith(b'}\n'))
+        self.assertIn('"name":"Żółw"'.encode(), body)
+        self.assertEqual(json.loads(body), {
+            'name': 'Żółw', 'count': 3, 'ratio': 0.1, 'missing': None, 'flags': [True, False],
+            'at': '2024-01-02T03:04:05', 'moment': '2024-01-02T03:04:05.000678+00:00',
+            'day': '2024-01-02', 'price': '9.99', 'key': str(uuid.UUID(int=1)), 'html': '<b>x</b>',
+        })
+        # Keys keep their order
+        self.assertEqual(list(json.loads(body)), list(PAYLOAD))
+
+    @unittest.skipIf(jsonprovider.orjson is None, 'orjson is not installed')
+    def test_orjson_matches_stdlib(self):
+        """Both providers produce the same bytes"""
+        flask_app = Flask(__name__)
+        fast = jsonprovider.OrjsonProvider(flask_app)
+        slow = jsonprovider.StdlibJSONProvider(flask_app)
+        self.assertEqual(fast.response(PAYLOAD).get_data(), slow.response(PAYLOAD).get_data())
+        self.assertEqual(fast.dumps(PAYLOAD), slow.dumps(PAYLOAD))
+        self.assertEqual(fast.loads(fast.dumpb(PAYLOAD)), slow.loads(slow.dumpb(PAYLOAD)))
+
+    def test_invalid_json_body_is_a_bad_request(self):
+        """Request bodies are parsed by the provider; malformed JSON is a 400"""
+        response = self.client.post('/books/create', data='{"name": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
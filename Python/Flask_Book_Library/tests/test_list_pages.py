@@ -0,0 +1,84 @@
+"""
+Tests for the paginated and streamed HTML list pages.
+"""
+
+import re
+import unittest
+from datetime import datetime
+from project import create_app, db
+from project.books.models import Book
+from project.customers.models import Customer
+from project.loans.models import Loan
+
+
+app = create_app('testing')
+
+
+class ListPagesTestCase(unittest.TestCase):
+    """Test page size, page links and the streamed show-all mode"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LIST_CHUNK_SIZE'] = 7
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([Book(name=f'Book {i:03}', author='Author', year_published=2000, book_type='5days')
+                                for i in range(120)])
+            db.session.add_all([Customer(name=f'Customer {i}', city='Warsaw', age=30) for i in range(3)])
+            db.session.add(Loan(customer_name='Customer 0', book_name='Book 000', book_id=1,
+                                loan_date=datetime(2024, 1, 1), return_date=datetime(2024, 1, 6)))
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def book_names(self, html):
+        return re.findall(r'<td>(Book \d+)</td>', html)
+
+    def test_first_page_uses_default_size(self):
+        response = self.client.get('/books/')
+        self.assertEqual(response.status_code, 200)
+        html = response.get_data(as_text=True)
+        self.assertEqual(self.book_names(html), [f'Book {i:03}' for i in range(50)])
+        self.assertIn('<option value="50" selected>', html)
+        self.assertIn('Show all', html)
+
+    def test_next_link_continues_the_page_size(self):
+        html = self.client.get('/books/?limit=25').get_data(as_text=True)
+        next_url = re.search(r'href="([^"]*after=[^"]*)"', html).group(1).replace('&amp;', '&')
+        self.assertIn('limit=25', next_url)
+
+        html = self.client.get(next_url).get_data(as_text=True)
+        self.assertEqual(self.book_names(html), [f'Book {i:03}' for i in range(25, 50)])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/books/?after=nonsense').status_code, 400)
+
+    def test_show_all_is_streamed(self):
+        response = self.client.get('/books/?all=1')
+        self.assertTrue(response.is_streamed)
+        html = response.get_data(as_text=True)
+        self.assertEqual(self.book_names(html), [f'Book {i:03}' for i in range(120)])
+        self.assertIn('Show pages', html)
+        self.assertTrue(html.rstrip().endswith('</html>'))
+
+    def test_customer_and_loan_pages(self):
+        html = self.client.get('/customers/?limit=2').get_data(as_text=True)
+        self.assertIn('<td>Customer 1</td>', html)
+        self.assertNotIn('<td>Customer 2</td>', html)
+
+        html = self.client.get('/loans/?all=1').get_data(as_text=True)
+        self.assertIn('data-loan-id="1"', html)
+        # The loan form is still rendered around the rows
+        self.assertIn('id="addLoanForm"', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+"""
+Tests for the loan workflow and the loan -> book / customer links.
+"""
+
+import unittest
+from sqlalchemy import delete, text
+from sqlalchemy.exc import IntegrityError
+
+from project import create_app, db, typeahead
+from project.books.models import Book
+from project.customers.models import Customer
+from project.loans.models import Loan
+
+
+app = create_app('testing')
+
+
+class LoanTestCase(unittest.TestCase):
+    """Test creating, inspecting and ending loans"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+        typeahead.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            book = Book(name='Dune', author='Frank Herbert', year_published=1965, book_type='10days')
+            customer = Customer(name='Anna Nowak', city='Warsaw', age=30)
+            db.session.add_all([book, customer])
+            db.session.commit()
+            self.book_id = book.id
+            self.customer_id = customer.id
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def create_loan(self, customer_name='Anna Nowak', book_name='Dune'):
+        return self.client.post('/loans/create', data={
+            'customer_name': customer_name,
+            'book_name': book_name,
+            'loan_date': '2024-01-01',
+            'return_date': '2024-01-10'
+        })
+
+    def test_loan_links_book_and_customer(self):
+        """A new loan references the book and customer rows by id"""
+        response = self.create_loan()
+        self.assertEqual(response.status_code, 302)
+
+        with app.app_context():
+            loan = Loan.query.one()
+            self.assertEqual(loan.book_id, self.book_id)
+            self.assertEqual(loan.customer_id, self.customer_id)
+            self.assertEqual(db.session.get(Book, self.book_id).status, 'on_loan')
+
+    def test_loaned_book_is_not_offered_again(self):
+        """A loaned book disappears from the loan form and cannot be loaned twice"""
+        self.create_loan()
+        response = self.client.get('/loans/books/json')
+        self.assertEqual(response.get_json()['books'], [])
+
+        response = self.create_loan()
+        self.assertEqual(response.status_code, 409)
+        with app.app_context():
+            self.assertEqual(Loan.query.count(), 1)
+
+    def test_unknown_book_cannot_be_loaned(self):
+        """Loaning a book that does not exist is rejected"""
+        response = self.create_loan(book_name='Missing')
+        self.assertEqual(response.status_code, 400)
+
+    def test_failed_loan_leaves_book_available(self):
+        """The status flip is rolled back together with a failed loan insert"""
+        response = self.client.post('/loans/create', data={
+            'customer_name': 'Anna Nowak',
+            'book_name': 'Dune',
+            'loan_date': '2024-01-01'
+        })
+        self.assertEqual(response.status_code, 500)
+        with app.app_context():
+            self.assertEqual(Loan.query.count(), 0)
+            self.assertEqual(db.session.get(Book, self.book_id).status, 'available')
+
+    def test_book_details_for_loaned_book(self):
+        """Book details are served from the book row while it is on loan"""
+        self.create_loan()
+        response = self.client.get('/loans/books/details/Dune')
+        self.assertEqual(response.status_code, 200)
+        book = response.get_json()['book']
+        self.assertEqual(book['id'], self.book_id)
+        self.assertEqual(book['status'], 'on_loan')
+
+    def test_end_loan_keeps_book_id(self):
+        """Ending a loan makes the same book row available again"""
+        self.create_loan()
+        with app.app_context():
+            loan_id = Loan.query.one().id
+
+        response = self.client.post(f'/loans/{loan_id}/delete')
+        self.assertEqual(response.status_code, 302)
+        with app.app_context():
+            self.assertEqual(Loan.query.count(), 0)
+            self.assertEqual(Book.query.count(), 1)
+            self.assertEqual(db.session.get(Book, self.book_id).status, 'available')
+
+    def test_loaned_book_cannot_be_deleted(self):
+        """Deleting a book that is on loan is refused"""
+        self.create_loan()
+        response = self.client.post(f'/books/{self.book_id}/delete')
+        self.assertEqual(response.status_code, 409)
+
+    def test_foreign_keys_are_enforced_by_sqlite(self):
+        """Deleting a customer outside the ORM unlinks their loans; a loaned book cannot be deleted"""
+        self.create_loan()
+        with app.app_context():
+            self.assertEqual(db.session.execute(text('PRAGMA foreign_keys')).scalar(), 1)
+            db.session.execute(delete(Customer).where(Customer.id == self.customer_id))
+            db.session.commit()
+            self.assertIsNone(db.session.execute(text('SELECT customer_id FROM "Loans"')).scalar_one())
+
+            with self.assertRaises(IntegrityError):
+                db.session.execute(delete(Book).where(Book.id == self.book_id))
+            db.session.rollback()
+
+    def test_details_expand_book_and_customer(self):
+        """Expanded loan details embed the book and customer from one query"""
+        self.create_loan()
+        with app.app_context():
+            loan_id = Loan.query.one().id
+
+        response = self.client.get(f'/loans/{loan_id}/details?expand=book,customer')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="1 queries"', response.headers['Server-Timing'])
+        loan = response.get_json()['loan']
+        self.assertEqual(loan['book']['id'], self.book_id)
+        self.assertEqual(loan['book']['status'], 'on_loan')
+        self.assertEqual(loan['customer']['city'], 'Warsaw')
+
+        loan = self.client.get(f'/loans/{loan_id}/details?expand=book').get_json()['loan']
+        self.assertNotIn('customer', loan)
+        self.assertEqual(self.client.get(f'/loans/{loan_id}/details?expand=author').status_code, 400)
+        self.assertEqual(self.client.get('/loans/999/details?expand=book').status_code, 404)
+
+    def test_page_data(self):
+        """The loans page data comes in one response from one query (plus the table version lookup)"""
+        self.create_loan()
+        # A loan for a name without a customer record
+        with app.app_context():
+            db.session.add(Book(name='Solaris', author='Stanislaw Lem', year_published=1961, book_type='5days'))
+            db.session.commit()
+        self.create_loan(customer_name='Walk In', book_name='Solaris')
+
+        response = self.client.get('/loans/page-data')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="2 queries"', response.headers['Server-Timing'])
+        loans = response.get_json()['loans']
+        self.assertEqual([loan['book']['name'] for loan in loans], ['Dune', 'Solaris'])
+        self.assertEqual(loans[0]['customer']['name'], 'Anna Nowak')
+        self.assertIsNone(loans[1]['customer'])
+
+        # Revalidates like the other JSON lists
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get('/loans/page-data', headers={'If-None-Match': etag}).status_code, 304)
+        self.client.post(f'/customers/{self.customer_id}/edit', data={'name': 'Anna Nowak', 'city': 'Gdansk', 'age': 31})
+        self.assertEqual(self.client.get('/loans/page-data', headers={'If-None-Match': etag}).status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Tests for the structured, queued request logs.
+"""
+
+import io
+import json
+import logging
+import queue
+import sys
+import unittest
+from project import create_app, db, logs
+
+
+app = create_app('testing')
+
+
+class LogRecordTestCase(unittest.TestCase):
+    """Test formatting, sampling and dropping of single records"""
+
+    def make_record(self, msg, *args, **extra):
+        record = logging.LogRecord('project.test', logging.INFO, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_formatter(self):
+        line = logs.JsonFormatter().format(self.make_record('Found %d books', 3, request_id='abc'))
+        entry = json.loads(line)
+        self.assertEqual(entry['message'], 'Found 3 books')
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertEqual(entry['logger'], 'project.test')
+        self.assertEqual(entry['request_id'], 'abc')
+        self.assertTrue(entry['ts'].endswith('+00:00'))
+
+    def test_exception_is_rendered_before_queueing(self):
+        handler = logs.DroppingQueueHandler(queue.Queue())
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = logging.LogRecord('project.test', logging.ERROR, __file__, 1, 'Failed', (), sys.exc_info())
+        handler.emit(record)
+        queued = handler.queue.get_nowait()
+        self.assertIsNone(queued.exc_info)
+        self.assertIn('ValueError: boom', json.loads(logs.JsonFormatter().format(queued))['exc'])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = logs.DroppingQueueHandler(queue.Queue(2))
+        for i in range(5):
+            handler.emit(self.make_record('Record %d', i))
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.dropped, 3)
+
+    def test_sampling(self):
+        sampling = logs.SamplingFilter({'Noisy': 0.0, 'Kept': 1.0})
+        self.assertFalse(sampling.filter(self.make_record('Noisy')))
+        self.assertTrue(sampling.filter(self.make_record('Kept')))
+        self.assertTrue(sampling.filter(self.make_record('Not sampled')))
+
+
+class RequestLogTestCase(unittest.TestCase):
+    """Test the records written while serving requests"""
+
+    def setUp(self):
+        """Set up test client, database and a captured log stream"""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+
+        self.stream = io.StringIO()
+        self.output = logging.StreamHandler(self.stream)
+        self.output.setFormatter(logs.JsonFormatter())
+        logs._listener.handlers += (self.output,)
+
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        logs._listener.handlers = tuple(h for h in logs._listener.handlers if h is not self.output)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def entries(self):
+        # Wait for the listener thread to write everything queued so far
+        logs._handler.queue.join()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_request_id_is_echoed_and_attached(self):
+        response = self.client.get('/books/', headers={'X-Request-ID': 'req-42'})
+        self.assertEqual(response.headers['X-Request-ID'], 'req-42')
+
+        entries = self.entries()
+        accessed = [e for e in entries if e['message'] == 'Books page accessed']
+        self.assertEqual(len(accessed), 1)
+        self.assertEqual(accessed[0]['request_id'], 'req-42')
+        self.assertEqual(accessed[0]['endpoint'], 'books.list_books')
+        self.assertEqual(accessed[0]['logger'], 'project.books.views')
+
+        completed = [e for e in entries if e['message'] == 'Request completed']
+        self.assertEqual(completed[-1]['request_id'], 'req-42')
+        self.assertEqual(completed[-1]['status'], 200)
+        self.assertEqual(completed[-1]['path'], '/books/')
+        self.assertIsInstance(completed[-1]['latency_ms'], float)
+
+    def test_request_id_is_generated(self):
+        first = self.client.get('/books/json').headers['X-Request-ID']
+        second = self.client.get('/books/json').headers['X-Request-ID']
+        self.assertRegex(first, r'^[0-9a-f]{32}$')
+        self.assertNotEqual(first, second)
+
+    def test_errors_keep_the_traceback(self):
+        book = {'name': 'Dune', 'author': 'Herbert', 'year_published': 1965, 'book_type': '5days'}
+        self.client.post('/books/create', json=book)
+        # The name is unique, so the second insert fails
+        self.assertEqual(self.client.post('/books/create', json=book).status_code, 500)
+        errors = [e for e in self.entries() if e['message'] == 'Error creating book']
+        self.assertEqual(errors[0]['level'], 'ERROR')
+        self.assertIn('Traceback', errors[0]['exc'])
+
+    def test_dropped_records_are_exported(self):
+        self.assertIn('log_records_dropped_total', self.client.get('/metrics').get_data(as_text=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
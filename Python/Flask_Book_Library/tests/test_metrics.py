@@ -0,0 +1,97 @@
+"""
+Tests for request metrics and the Prometheus /metrics endpoint.
+"""
+
+import threading
+import unittest
+from project import create_app, db, metrics
+
+
+app = create_app('testing')
+
+
+class RegistryTestCase(unittest.TestCase):
+    """Test per-thread aggregation of the registry"""
+
+    def test_threads_add_up(self):
+        registry = metrics.Registry()
+        registry.counter('jobs_total', 'Jobs.')
+        registry.histogram('job_seconds', 'Job time.', (0.1, 1.0))
+
+        def work():
+            for _ in range(1000):
+                registry.inc('jobs_total', (('kind', 'a'),))
+                registry.observe('job_seconds', (), 0.5)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # A new thread folds the finished ones into the retired shard
+        registry.inc('jobs_total', (('kind', 'b'),))
+        self.assertEqual(len(registry._shards), 1)
+
+        text = registry.render()
+        self.assertIn('jobs_total{kind="a"} 8000', text)
+        self.assertIn('jobs_total{kind="b"} 1', text)
+        self.assertIn('job_seconds_bucket{le="0.1"} 0', text)
+        self.assertIn('job_seconds_bucket{le="1.0"} 8000', text)
+        self.assertIn('job_seconds_bucket{le="+Inf"} 8000', text)
+        self.assertIn('job_seconds_count 8000', text)
+
+    def test_label_values_are_escaped(self):
+        registry = metrics.Registry()
+        registry.counter('odd_total', 'Odd labels.')
+        registry.inc('odd_total', (('path', 'a"b\\c\n'),))
+        self.assertIn('odd_total{path="a\\"b\\\\c\\n"} 1', registry.render())
+
+
+class MetricsEndpointTestCase(unittest.TestCase):
+    """Test the request instrumentation"""
+
+    def setUp(self):
+        """Set up test client, database and a fresh registry"""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+        app.extensions['metrics'] = metrics.create_registry()
+
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        return response.get_data(as_text=True)
+
+    def test_requests_are_counted_per_endpoint(self):
+        self.client.get('/books/json')
+        self.client.get('/books/json')
+        self.client.get('/customers/json?limit=abc')
+        self.client.get('/no/such/page')
+
+        text = self.scrape()
+        self.assertIn('http_requests_total{endpoint="books.list_books_json",method="GET",status="200"} 2', text)
+        self.assertIn('http_requests_total{endpoint="customers.list_customers_json",method="GET",status="400"} 1', text)
+        self.assertIn('http_requests_total{endpoint="unmatched",method="GET",status="404"} 1', text)
+        self.assertIn('http_request_duration_seconds_count{endpoint="books.list_books_json"} 2', text)
+        self.assertIn('http_response_size_bytes_count{endpoint="books.list_books_json"} 2', text)
+        self.assertIn('http_requests_in_flight{endpoint="books.list_books_json"} 0', text)
+        # The scrape itself is still being served
+        self.assertIn('http_requests_in_flight{endpoint="core.metrics"} 1', text)
+
+    def test_cache_counters_are_exported(self):
+        self.assertIn('# TYPE entity_cache_hits_total counter', self.scrape())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Tests for keyset (cursor) pagination on the JSON list endpoints.
+"""
+
+import unittest
+from datetime import datetime, timedelta
+from project import create_app, db
+from project.books.models import Book
+from project.customers.models import Customer
+from project.loans.models import Loan
+
+
+app = create_app('testing')
+
+
+class PaginationTestCase(unittest.TestCase):
+    """Test cursor pagination of /books/json, /customers/json and /loans/json"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            for i in range(7):
+                book = Book(name=f'Book {6 - i}', author='Author',
+                            year_published=2000 + i, book_type='5days')
+                db.session.add(book)
+                db.session.add(Customer(name=f'Customer {i}', city='City', age=20 + i))
+                db.session.add(Loan(customer_name=f'Customer {i}', book_name=book.name,
+                                    loan_date=datetime(2024, 1, 1) + timedelta(days=i % 3),
+                                    return_date=datetime(2024, 2, 1), book=book))
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def walk(self, url):
+        """Follow next_cursor until the last page and collect every page"""
+        pages = []
+        response = self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.get_json()
+            pages.append(data)
+            if not data['next_cursor']:
+                return pages
+            sep = '&' if '?' in url else '?'
+            response = self.client.get(f"{url}{sep}after={data['next_cursor']}")
+
+    def test_books_pages_cover_all_rows_once(self):
+        """Walking next_cursor returns every book exactly once"""
+        pages = self.walk('/books/json?limit=3')
+        self.assertEqual([len(p['books']) for p in pages], [3, 3, 1])
+        names = [b['name'] for p in pages for b in p['books']]
+        self.assertEqual(len(set(names)), 7)
+
+    def test_books_sorted_by_name(self):
+        """sort=name orders the pages by name"""
+        pages = self.walk('/books/json?limit=2&sort=name')
+        names = [b['name'] for p in pages for b in p['books']]
+        self.assertEqual(names, sorted(names))
+
+    def test_before_returns_previous_page(self):
+        """before= walks back to the page preceding the cursor"""
+        first = self.client.get('/customers/json?limit=3').get_json()
+        second = self.client.get(f"/customers/json?limit=3&after={first['next_cursor']}").get_json()
+        self.assertIsNotNone(second['prev_cursor'])
+
+        back = self.client.get(f"/customers/json?limit=3&before={second['prev_cursor']}").get_json()
+        self.assertEqual(back['customers'], first['customers'])
+        self.assertIsNone(back['prev_cursor'])
+
+    def test_loans_sorted_by_date_with_duplicates(self):
+        """Duplicate loan dates are broken by id so no row is skipped"""
+        pages = self.walk('/loans/json?limit=2&sort=-loan_date')
+        loans = [loan for p in pages for loan in p['loans']]
+        self.assertEqual(len(loans), 7)
+        self.assertEqual(len({loan['book_name'] for loan in loans}), 7)
+
+    def test_invalid_parameters(self):
+        """Bad limit, sort or cursor values return 400"""
+        self.assertEqual(self.client.get('/books/json?limit=abc').status_code, 400)
+        self.assertEqual(self.client.get('/books/json?sort=author').status_code, 400)
+        self.assertEqual(self.client.get('/books/json?after=not-a-cursor').status_code, 400)
+
+        first = self.client.get('/books/json?limit=2').get_json()
+        response = self.client.get(f"/books/json?limit=2&sort=name&after={first['next_cursor']}")
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
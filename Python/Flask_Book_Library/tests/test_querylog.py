@@ -0,0 +1,96 @@
+"""
+Tests for per-request SQL accounting, the slow-query log and N+1 detection.
+"""
+
+import unittest
+from flask import jsonify
+from project import create_app, db, querylog
+from project.books.models import Book
+
+
+app = create_app('testing')
+
+
+# A deliberately N+1 view: one lookup per name
+@app.route('/test/books-one-by-one')
+def books_one_by_one():
+    names = [f'Book {i}' for i in range(6)]
+    return jsonify([Book.query.filter_by(name=name).first().id for name in names])
+
+
+class QueryLogTestCase(unittest.TestCase):
+    """Test SQL statements charged to the request that issued them"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['SQL_SLOW_QUERY_MS'] = 100
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([Book(name=f'Book {i}', author='Author', year_published=2000, book_type='5days')
+                                for i in range(6)])
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_server_timing_header(self):
+        # The table version lookup and the page
+        response = self.client.get('/books/json')
+        self.assertRegex(response.headers['Server-Timing'], r'^db;dur=\d+\.\d\d;desc="2 queries"$')
+
+        response = self.client.get('/books/json', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('desc="1 queries"', response.headers['Server-Timing'])
+
+    def test_n_plus_one_is_reported(self):
+        with self.assertLogs('project.sql', 'WARNING') as logs:
+            response = self.client.get('/test/books-one-by-one')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="6 queries"', response.headers['Server-Timing'])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('Possible N+1 query in books_one_by_one', logs.output[0])
+
+        metrics = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('sql_n_plus_one_total{endpoint="books_one_by_one"} 1', metrics)
+        self.assertIn('sql_queries_total{endpoint="books_one_by_one"} 6', metrics)
+
+    def test_failed_statements_leave_no_start_time(self):
+        """A statement that raises is not left on the connection's timing stack"""
+        book = {'name': 'Book 0', 'author': 'Author', 'year_published': 2000, 'book_type': '5days'}
+        for _ in range(3):
+            response = self.client.post('/books/create', json=book)
+            self.assertNotEqual(response.status_code, 200)
+        with app.app_context():
+            with db.engine.connect() as connection:
+                self.assertEqual(connection.info.get('query_started'), [])
+
+    def test_same_parameters_are_not_n_plus_one(self):
+        with self.assertNoLogs('project.sql', 'WARNING'):
+            for _ in range(3):
+                self.client.get('/loans/books/details/Book 1')
+                self.client.get('/books/json')
+
+    def test_slow_queries_are_logged_with_parameter_shapes(self):
+        app.config['SQL_SLOW_QUERY_MS'] = 0
+        with self.assertLogs('project.sql', 'WARNING') as logs:
+            self.client.get('/books/json?limit=2')
+        # The page query comes after the table version lookup
+        self.assertIn('Slow query', logs.output[-1])
+        self.assertIn('books.list_books_json', logs.output[-1])
+        self.assertIn('parameters: (int, int)', logs.output[-1])
+
+    def test_parameter_shape(self):
+        self.assertEqual(querylog.parameter_shape(('Dune', 1965)), '(str, int)')
+        self.assertEqual(querylog.parameter_shape([('a', 1), ('b', 2)]), '2 x (str, int)')
+        self.assertEqual(querylog.parameter_shape({'name': 'Dune'}), '{name: str}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,11 +4,14 @@ Tests real-world attack scenarios and defense mechanisms.
 """
 
 import unittest
-from project import app, db
+from project import create_app, db
 from project.books.models import Book
 from project.customers.models import Customer
 
 
+app = create_app('testing')
+
+
 class SecurityIntegrationTestCase(unittest.TestCase):
     """Integration tests for security features"""
 
@@ -0,0 +1,119 @@
+"""
+Tests for the template bytecode cache and the cached table-row fragments.
+"""
+
+import os
+import tempfile
+import unittest
+from jinja2 import FileSystemBytecodeCache
+from project import create_app, db, templating
+from project.books.models import Book
+from project.cache import LRUCache
+
+
+app = create_app('testing')
+
+
+class FragmentCacheTestCase(unittest.TestCase):
+    """Test row fragments rendered through the list pages"""
+
+    def setUp(self):
+        """Set up test client, database and an empty fragment cache"""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+        self.fragments = app.extensions['fragment_cache'] = templating.FragmentCache(LRUCache())
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([Book(name=f'Book {i}', author='Author', year_published=2000, book_type='5days')
+                                for i in range(10)])
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_rows_are_rendered_once(self):
+        first = self.client.get('/books/').get_data(as_text=True)
+        self.assertEqual(self.fragments.stats()['misses'], 10)
+        second = self.client.get('/books/?all=1').get_data(as_text=True)
+        self.assertEqual(self.fragments.stats()['hits'], 10)
+        self.assertIn('onclick="editBook(7)"', second)
+        self.assertEqual(first.count('<tr>'), second.count('<tr>'))
+
+    def test_edited_row_is_rendered_again(self):
+        self.client.get('/books/')
+        response = self.client.post('/books/3/edit', json={'name': 'Renamed', 'author': 'Someone Else',
+                                                           'year_published': 1999, 'book_type': '2days'})
+        self.assertEqual(response.status_code, 200)
+
+        html = self.client.get('/books/').get_data(as_text=True)
+        self.assertIn('<td>Renamed</td>', html)
+        self.assertNotIn('<td>Book 2</td>', html)
+        stats = self.fragments.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (9, 11))
+
+    def test_rows_are_escaped(self):
+        with app.app_context():
+            db.session.add(Book(name='<script>x</script>', author='Author', year_published=2000, book_type='5days'))
+            db.session.commit()
+        html = self.client.get('/books/?all=1').get_data(as_text=True)
+        self.assertIn('&lt;script&gt;x&lt;/script&gt;', html)
+
+    def test_changes_from_another_process_are_rendered(self):
+        """Fragments are keyed by the row values, so a write this process never saw is not missed"""
+        fd, path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        try:
+            first, second = [create_app('testing', SQLALCHEMY_DATABASE_URI='sqlite:///' + path) for _ in range(2)]
+            with first.app_context():
+                db.create_all()
+                db.session.add(Book(name='Alpha', author='Author', year_published=2000, book_type='5days'))
+                db.session.commit()
+            self.assertIn('<td>Alpha</td>', second.test_client().get('/books/').get_data(as_text=True))
+
+            first.test_client().post('/books/1/edit', json={'name': 'Omega'})
+            html = second.test_client().get('/books/').get_data(as_text=True)
+            self.assertIn('<td>Omega</td>', html)
+            self.assertNotIn('<td>Alpha</td>', html)
+            for process in (first, second):
+                with process.app_context():
+                    db.engine.dispose()
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    def test_page_and_stream_share_fragments(self):
+        """ORM objects and plain result rows with the same values get the same key"""
+        with app.test_request_context():
+            book = db.session.get(Book, 1)
+            row = db.session.execute(db.select(*Book.__table__.columns).where(Book.id == 1)).one()
+            self.assertEqual(self.fragments.key('_book_row.html', 'books', book),
+                             self.fragments.key('_book_row.html', 'books', row))
+
+
+class BytecodeCacheTestCase(unittest.TestCase):
+    """Test the production template settings"""
+
+    def test_production_caches_compiled_templates(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Logging is process-wide: keep the sampling of the other tests
+            production = create_app('production', SQLALCHEMY_DATABASE_URI='sqlite://',
+                                    JINJA_BYTECODE_CACHE_DIR=directory, LOG_SAMPLE_RATES={})
+            self.assertFalse(production.jinja_env.auto_reload)
+            self.assertIsInstance(production.jinja_env.bytecode_cache, FileSystemBytecodeCache)
+
+            production.jinja_env.get_template('_book_row.html')
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_development_reloads_templates(self):
+        self.assertTrue(app.jinja_env.auto_reload)
+        self.assertIsNone(app.jinja_env.bytecode_cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+"""
+Tests for the in-memory name index behind the loan form autocomplete.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from project import create_app, db, typeahead
+from project.books.models import Book
+from project.customers.models import Customer
+
+
+app = create_app('testing')
+
+
+class NameIndexTestCase(unittest.TestCase):
+    """Test the sorted prefix index on its own"""
+
+    def test_prefix_search_is_case_insensitive_and_sorted(self):
+        index = typeahead.NameIndex(lambda: ['banana', 'Apple', 'apricot', 'Cherry'])
+        self.assertEqual(index.search('ap'), ['Apple', 'apricot'])
+        self.assertEqual(index.search('AP', limit=1), ['Apple'])
+        self.assertEqual(index.search('x'), [])
+
+    def test_add_discard_and_invalidate(self):
+        names = ['Alpha']
+        index = typeahead.NameIndex(lambda: list(names))
+        index.add('Ignored while not loaded')
+        self.assertEqual(index.all(), ['Alpha'])
+
+        index.add('Beta')
+        index.add('Beta')
+        index.discard('Alpha')
+        self.assertEqual(index.all(), ['Beta'])
+
+        names.append('Gamma')
+        index.invalidate()
+        self.assertEqual(index.all(), ['Alpha', 'Gamma'])
+
+
+class TypeaheadEndpointTestCase(unittest.TestCase):
+    """Test that the loan form endpoints follow committed changes"""
+
+    def setUp(self):
+        """Set up test client, database and a fresh index"""
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+        typeahead.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                Book(name='Dune', author='Frank Herbert', year_published=1965, book_type='10days'),
+                Book(name='Dracula', author='Bram Stoker', year_published=1897, book_type='5days'),
+                Customer(name='Anna Nowak', city='Warsaw', age=30),
+            ])
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def books(self, prefix):
+        response = self.client.get('/loans/books/search', query_string={'q': prefix})
+        return [book['name'] for book in response.get_json()['books']]
+
+    def customers(self, prefix):
+        response = self.client.get('/loans/customers/search', query_string={'q': prefix})
+        return [customer['name'] for customer in response.get_json()['customers']]
+
+    def test_books_follow_create_edit_delete(self):
+        self.assertEqual(self.books('d'), ['Dracula', 'Dune'])
+
+        self.client.post('/books/create', json={
+            'name': 'Dubliners', 'author': 'James Joyce', 'year_published': 1914, 'book_type': '5days'
+        })
+        self.assertEqual(self.books('du'), ['Dubliners', 'Dune'])
+
+        with app.app_context():
+            book_id = Book.query.filter_by(name='Dune').one().id
+        self.client.post(f'/books/{book_id}/edit', json={'name': 'Dune Messiah'})
+        self.assertEqual(self.books('dune'), ['Dune Messiah'])
+
+        self.client.post(f'/books/{book_id}/delete')
+        self.assertEqual(self.books('dune'), [])
+
+    def test_loaned_books_leave_and_return(self):
+        self.books('d')
+        self.client.post('/loans/create', data={
+            'customer_name': 'Anna Nowak', 'book_name': 'Dune',
+            'loan_date': '2024-01-01', 'return_date': '2024-01-10'
+        })
+        self.assertEqual(self.books('d'), ['Dracula'])
+
+        with app.app_context():
+            from project.loans.models import Loan
+            loan_id = Loan.query.one().id
+        self.client.post(f'/loans/{loan_id}/delete')
+        self.assertEqual(self.books('d'), ['Dracula', 'Dune'])
+
+    def test_customers_follow_changes_and_bulk_import(self):
+        self.assertEqual(self.customers('a'), ['Anna Nowak'])
+
+        self.client.post('/customers/create', data={'name': 'Adam Lis', 'city': 'Lodz', 'age': 20})
+        self.assertEqual(self.customers('a'), ['Adam Lis', 'Anna Nowak'])
+
+        self.client.post('/customers/import', data='name,city,age\nAgata Kot,Gdansk,41\n', content_type='text/csv')
+        self.assertEqual(self.customers('ag'), ['Agata Kot'])
+
+    def test_rolled_back_changes_are_ignored(self):
+        self.books('d')
+        with app.app_context():
+            db.session.add(Book(name='Doomed', author='Nobody', year_published=2000, book_type='5days'))
+            db.session.flush()
+            db.session.rollback()
+        self.assertEqual(self.books('do'), [])
+
+    def test_own_commits_do_not_reload(self):
+        """Changes committed here are applied in place; the version check agrees with them"""
+        self.books('d')
+        index = app.extensions['typeahead']['books']
+        with mock.patch.object(index, '_loader', wraps=index._loader) as loader:
+            self.client.post('/books/create', json={
+                'name': 'Dubliners', 'author': 'James Joyce', 'year_published': 1914, 'book_type': '5days'
+            })
+            self.client.post('/loans/create', data={
+                'customer_name': 'Anna Nowak', 'book_name': 'Dune',
+                'loan_date': '2024-01-01', 'return_date': '2024-01-10'
+            })
+            self.assertEqual(self.books('d'), ['Dracula', 'Dubliners'])
+        loader.assert_not_called()
+
+
+class SharedDatabaseTestCase(unittest.TestCase):
+    """Test that the index follows writes made outside this process"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        self.app = create_app('testing', SQLALCHEMY_DATABASE_URI='sqlite:///' + self.path)
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(Book(name='Alpha', author='Author', year_published=2000, book_type='5days'))
+            db.session.commit()
+        typeahead.warm_up(self.app)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def books(self):
+        response = self.client.get('/loans/books/search', query_string={'q': ''})
+        return [book['name'] for book in response.get_json()['books']]
+
+    def test_warm_up_builds_the_index(self):
+        """The first search is served from the index built at startup"""
+        index = self.app.extensions['typeahead']['books']
+        with mock.patch.object(index, '_loader') as loader:
+            self.assertEqual(self.books(), ['Alpha'])
+        loader.assert_not_called()
+
+    def test_writes_from_another_process_reload_the_index(self):
+        self.assertEqual(self.books(), ['Alpha'])
+
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute("UPDATE books SET name = 'Omega' WHERE name = 'Alpha'")
+            connection.execute("INSERT INTO books (name, author, year_published, book_type, status) "
+                               "VALUES ('Gamma', 'Author', 2001, '5days', 'available')")
+        connection.close()
+
+        self.assertEqual(self.books(), ['Gamma', 'Omega'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Tests for the single-writer queue and its group commits.
+"""
+
+import threading
+import unittest
+from sqlalchemy.exc import IntegrityError
+from project import create_app, db, changes, writer
+from project.books.models import Book
+from project.customers.models import Customer
+from project.loans.models import Loan
+
+
+app = create_app('testing')
+
+
+def add_book(name):
+    def job(session):
+        session.add(Book(name=name, author='Author', year_published=2000, book_type='5days'))
+        session.flush()
+        return name
+    return job
+
+
+class WriteQueueTestCase(unittest.TestCase):
+    """Test mutations committed through the writer thread"""
+
+    def setUp(self):
+        """Set up test client, database and a running write queue"""
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['WRITE_QUEUE_ENABLED'] = True
+        writer.init_app(app)
+        self.queue = app.extensions['write_queue']
+        self.client = app.test_client()
+
+        self.committed = []
+        changes.subscribe(self.committed.extend)
+
+        with app.app_context():
+            db.create_all()
+            db.session.add(Customer(name='Anna Nowak', city='Warsaw', age=30))
+            db.session.commit()
+
+    def tearDown(self):
+        """Stop the writer and clean up after tests"""
+        app.config['WRITE_QUEUE_ENABLED'] = False
+        writer.init_app(app)
+        changes._subscribers.remove(self.committed.extend)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_views_write_through_the_queue(self):
+        response = self.client.post('/books/create', json={
+            'name': 'Dune', 'author': 'Frank Herbert', 'year_published': 1965, 'book_type': '10days'
+        })
+        self.assertEqual(response.status_code, 201)
+        with app.app_context():
+            book_id = Book.query.filter_by(name='Dune').one().id
+
+        self.assertEqual(self.client.post(f'/books/{book_id}/edit', json={'author': 'F. Herbert'}).status_code, 200)
+        self.assertEqual(self.client.post('/books/999/edit', json={'author': 'Nobody'}).status_code, 404)
+
+        response = self.client.post('/loans/create', data={
+            'customer_name': 'Anna Nowak', 'book_name': 'Dune',
+            'loan_date': '2024-01-01', 'return_date': '2024-01-10'
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.post(f'/books/{book_id}/delete').status_code, 409)
+
+        with app.app_context():
+            loan = Loan.query.one()
+            self.assertEqual(loan.customer.name, 'Anna Nowak')
+            loan_id = loan.id
+        self.assertEqual(self.client.post(f'/loans/{loan_id}/delete').status_code, 302)
+        self.assertEqual(self.client.post(f'/books/{book_id}/delete').status_code, 302)
+
+        with app.app_context():
+            self.assertEqual(Book.query.count(), 0)
+        self.assertGreaterEqual(self.queue.batches, 5)
+
+    def test_queued_writes_share_one_commit(self):
+        started, release = threading.Event(), threading.Event()
+
+        def blocking(session):
+            started.set()
+            release.wait(5)
+
+        first = self.queue.submit(blocking)
+        started.wait(5)
+        futures = [self.queue.submit(add_book(f'Book {i}')) for i in range(10)]
+        release.set()
+
+        self.assertEqual([future.result(5) for future in futures], [f'Book {i}' for i in range(10)])
+        first.result(5)
+        self.assertEqual(self.queue.batches, 2)
+        self.assertEqual(self.queue.jobs, 11)
+
+    def test_failed_write_does_not_affect_its_group(self):
+        with app.app_context():
+            writer.write(add_book('Taken'))
+        del self.committed[:]
+
+        started, release = threading.Event(), threading.Event()
+        self.queue.submit(lambda session: started.set() or release.wait(5))
+        started.wait(5)
+        before = self.queue.submit(add_book('Before'))
+        duplicate = self.queue.submit(add_book('Taken'))
+        after = self.queue.submit(add_book('After'))
+        release.set()
+
+        self.assertEqual(before.result(5), 'Before')
+        self.assertEqual(after.result(5), 'After')
+        with self.assertRaises(IntegrityError):
+            duplicate.result(5)
+
+        with app.app_context():
+            self.assertEqual(Book.query.count(), 3)
+        self.assertEqual(sorted(change.values['name'] for change in self.committed), ['After', 'Before'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,13 +5,16 @@ Tests input sanitization, output encoding, and security measures.
 
 import unittest
 import json
-from project import app, db
+from project import create_app, db
 from project.books.models import Book
 from project.customers.models import Customer
 from project.loans.models import Loan
 from markupsafe import escape
 
 
+app = create_app('testing')
+
+
 class XSSProtectionTestCase(unittest.TestCase):
     """Test XSS protection mechanisms"""
 